@@ -0,0 +1,227 @@
+import os
+import json
+import time
+import argparse
+import platform
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from Otolits_identyfication_program.model_yolo import YOLOModel
+from Otolits_identyfication_program.YOLO.dataset_cache import IMAGE_EXTENSIONS
+
+try:
+    import resource  # Not available on Windows
+except ImportError:
+    resource = None
+
+IOU_THRESHOLD = 0.5
+REPORT_CONF = 0.25  # Threshold at which precision/recall are reported; mAP uses all detections
+
+
+def load_labels(label_path, width, height):
+    """Reads a YOLO label file (class cx cy w h, normalised) into an (N, 4) xyxy array in pixels"""
+    if not os.path.exists(label_path):
+        return np.zeros((0, 4), dtype=np.float32)
+    values = np.loadtxt(label_path, ndmin=2, dtype=np.float32)
+    if values.size == 0:
+        return np.zeros((0, 4), dtype=np.float32)
+    cx, cy, w, h = values[:, 1] * width, values[:, 2] * height, values[:, 3] * width, values[:, 4] * height
+    return np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+
+
+def box_iou(a, b):
+    """IoU matrix (len(a), len(b)) for xyxy boxes"""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def match_detections(detections, truth, iou_threshold=IOU_THRESHOLD):
+    """Greedy matching in score order; returns (scores, is_true_positive) for one image"""
+    order = np.argsort(-detections[:, 4])
+    detections = detections[order]
+    tp = np.zeros(len(detections), dtype=bool)
+    if len(truth) and len(detections):
+        iou = box_iou(detections[:, :4], truth)
+        taken = np.zeros(len(truth), dtype=bool)
+        for i in range(len(detections)):
+            candidates = np.where(~taken & (iou[i] >= iou_threshold))[0]
+            if len(candidates):
+                best = candidates[np.argmax(iou[i, candidates])]
+                taken[best] = True
+                tp[i] = True
+    return detections[:, 4], tp
+
+
+def detection_metrics(scores, tp, n_truth, report_conf=REPORT_CONF):
+    """Precision and recall at report_conf plus AP@0.5 (all-point interpolation)"""
+    order = np.argsort(-scores)
+    scores, tp = scores[order], tp[order]
+    tp_cum = np.cumsum(tp)
+    fp_cum = np.cumsum(~tp)
+    recall = tp_cum / max(n_truth, 1)
+    precision = tp_cum / np.maximum(tp_cum + fp_cum, 1)
+
+    # Monotonic precision envelope, then area under the PR curve
+    mrec = np.concatenate([[0.0], recall, [recall[-1] if len(recall) else 0.0]])
+    mpre = np.concatenate([[1.0], precision, [0.0]])
+    mpre = np.maximum.accumulate(mpre[::-1])[::-1]
+    ap = float(np.sum((mrec[1:] - mrec[:-1]) * mpre[1:]))
+
+    kept = scores >= report_conf
+    kept_tp = int(tp[kept].sum())
+    return {
+        "precision": kept_tp / max(int(kept.sum()), 1),
+        "recall": kept_tp / max(n_truth, 1),
+        "map50": ap,
+    }
+
+
+def list_eval_images(image_dir):
+    return sorted(os.path.join(image_dir, f) for f in os.listdir(image_dir) if f.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def load_eval_images(image_dir):
+    """Decodes the evaluation images, skipping unreadable files; fails when none are left"""
+    images = []
+    for path in list_eval_images(image_dir):
+        image = cv2.imread(path)
+        if image is None:
+            print(f"Warning: skipping unreadable image {path}")
+            continue
+        images.append((path, image))
+    if not images:
+        raise ValueError(f"No readable images in {image_dir}")
+    return images
+
+
+def _label_path(image_path, label_dir):
+    return os.path.join(label_dir, os.path.splitext(os.path.basename(image_path))[0] + ".txt")
+
+
+def benchmark_candidate(weights, image_dir, label_dir, imgsz=640, device="cpu", warmup=2):
+    """Runs in a fresh process so load time and peak RSS belong to this candidate only"""
+    images = load_eval_images(image_dir)
+
+    # conf=0.001 keeps low-score detections needed for the PR curve
+    model = YOLOModel(weights, imgsz=imgsz, conf=0.001, device=device)
+    start = time.perf_counter()
+    model._load_model()
+    load_time = time.perf_counter() - start
+
+    for _, image in images[:warmup]:
+        model.detect_objects(image)
+
+    latencies = []
+    all_scores, all_tp, n_truth = [], [], 0
+    for path, image in images:
+        start = time.perf_counter()
+        detections = model.detect_objects(image)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        truth = load_labels(_label_path(path, label_dir), image.shape[1], image.shape[0])
+        scores, tp = match_detections(detections, truth)
+        all_scores.append(scores)
+        all_tp.append(tp)
+        n_truth += len(truth)
+
+    latencies = np.asarray(latencies)
+    metrics = detection_metrics(np.concatenate(all_scores), np.concatenate(all_tp), n_truth)
+    report = {
+        "weights": weights,
+        "backend": os.path.splitext(weights)[1].lstrip(".") or "directory",
+        "images": len(images),
+        "load_time_s": round(load_time, 3),
+        "latency_ms": {f"p{p}": round(float(np.percentile(latencies, p)), 2) for p in (50, 90, 95, 99)},
+        "throughput_ips": round(len(images) / (latencies.sum() / 1000), 2),
+        "peak_rss_mb": None,
+        **{key: round(value, 4) for key, value in metrics.items()},
+    }
+    if resource is not None:
+        # ru_maxrss is in KB on Linux and in bytes on macOS
+        divisor = 1024 * 1024 if platform.system() == "Darwin" else 1024
+        report["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor, 1)
+    return report
+
+
+def mark_pareto(reports):
+    """A candidate is Pareto-optimal if no other one is both at least as accurate and at least as fast"""
+    for report in reports:
+        report["pareto"] = not any(
+            other is not report
+            and other["map50"] >= report["map50"] and other["latency_ms"]["p50"] <= report["latency_ms"]["p50"]
+            and (other["map50"] > report["map50"] or other["latency_ms"]["p50"] < report["latency_ms"]["p50"])
+            for other in reports
+        )
+    return reports
+
+
+def export_candidates(weights, formats, imgsz):
+    """Exports .pt weights to the requested backends (onnx, openvino, ...) and returns the new paths"""
+    from ultralytics import YOLO
+    exported = []
+    for path in weights:
+        if not path.endswith(".pt"):
+            continue
+        for fmt in formats:
+            exported.append(str(YOLO(path).export(format=fmt, imgsz=imgsz)))
+    return exported
+
+
+def run_benchmark(weights, image_dir, label_dir, imgsz=640, device="cpu", export=(), output="benchmark_report.json"):
+    # Checked before exporting and spawning candidate processes, which would all fail the same way
+    if not os.path.isdir(image_dir) or not list_eval_images(image_dir):
+        raise ValueError(f"No evaluation images ({', '.join(IMAGE_EXTENSIONS)}) found in {image_dir}")
+    candidates = list(weights) + export_candidates(weights, export, imgsz)
+    reports = []
+    for candidate in candidates:
+        # One short-lived process per candidate (spawn: nothing inherited from the parent)
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            try:
+                report = executor.submit(benchmark_candidate, candidate, image_dir, label_dir, imgsz, device).result()
+            except Exception as e:
+                print(f"{candidate}: benchmark failed: {e}")
+                continue
+        reports.append(report)
+        print(f"{candidate}: mAP50 {report['map50']:.3f}, P {report['precision']:.3f}, R {report['recall']:.3f}, "
+              f"p50 {report['latency_ms']['p50']} ms, {report['throughput_ips']} img/s, "
+              f"load {report['load_time_s']} s, RSS {report['peak_rss_mb']} MB")
+
+    mark_pareto(reports)
+    result = {
+        "machine": {"platform": platform.platform(), "processor": platform.processor(), "cpu_count": os.cpu_count()},
+        "imgsz": imgsz,
+        "device": device,
+        "image_dir": image_dir,
+        "candidates": reports,
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"Pareto-optimal: {[r['weights'] for r in reports if r['pareto']]}")
+    print(f"Report saved to {output}")
+    return result
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Speed/accuracy benchmark of detector weights")
+    parser.add_argument("--weights", nargs="+", required=True, help="Weight files (.pt, .onnx, *_openvino_model)")
+    parser.add_argument("--images", type=str, default="datasets/turbot_dataset/images/test", help="Held-out images")
+    parser.add_argument("--labels", type=str, default="datasets/turbot_dataset/labels/test", help="YOLO labels")
+    parser.add_argument("--imgsz", type=int, default=640, help="Inference image size")
+    parser.add_argument("--device", type=str, default="cpu", help="Inference device")
+    parser.add_argument("--export", nargs="*", default=[], help="Also benchmark .pt weights exported to these formats")
+    parser.add_argument("--output", type=str, default="benchmark_report.json", help="JSON report path")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    run_benchmark(args.weights, args.images, args.labels, args.imgsz, args.device, args.export, args.output)
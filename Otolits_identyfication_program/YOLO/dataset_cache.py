@@ -0,0 +1,108 @@
+import os
+import shutil
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import yaml
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+SPLIT_KEYS = ("train", "val", "test")
+
+
+def split_dirs_from_yaml(data):
+    """Returns {split: absolute image dir} for the splits defined in a dataset yaml"""
+    root = data.get("path", "")
+    dirs = {}
+    for split in SPLIT_KEYS:
+        if isinstance(data.get(split), str):
+            dirs[split] = os.path.join(root, data[split])
+    return dirs
+
+
+def _label_dir(image_dir):
+    """YOLO convention: labels live next to images, with 'images' replaced by 'labels'"""
+    head, tail = os.path.split(os.path.normpath(image_dir))
+    parent, images = os.path.split(head)
+    return os.path.join(parent, "labels" if images == "images" else images, tail)
+
+
+def source_hash(split_dirs, imgsz):
+    """Hash of the file list, sizes and mtimes of all images and labels plus imgsz"""
+    digest = hashlib.blake2b(f"imgsz={imgsz}".encode("utf-8"), digest_size=12)
+    for split, image_dir in sorted(split_dirs.items()):
+        for directory in (image_dir, _label_dir(image_dir)):
+            if not os.path.isdir(directory):
+                continue
+            for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+                stat = entry.stat()
+                digest.update(f"{split}/{entry.name}:{stat.st_size}:{stat.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _resize_one(source, destination, imgsz):
+    image = cv2.imread(source, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise ValueError(f"Cannot read image: {source}")
+
+    scale = imgsz / max(image.shape[:2])
+    if scale >= 1.0:
+        # Already small enough - YOLO labels are normalised, so nothing else changes
+        shutil.copy2(source, destination)
+        return
+    size = (max(1, round(image.shape[1] * scale)), max(1, round(image.shape[0] * scale)))
+    resized = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    params = [cv2.IMWRITE_JPEG_QUALITY, 95] if destination.lower().endswith((".jpg", ".jpeg")) else []
+    if not cv2.imwrite(destination, resized, params):
+        raise ValueError(f"Cannot write image: {destination}")
+
+
+def prepare_resized_dataset(data_yaml, imgsz, cache_root="dataset_cache", workers=None):
+    """Builds (or reuses) a copy of the dataset with the long image side reduced to imgsz.
+
+    The copy lives in cache_root/<source hash>/ and gets its own data.yaml, which is returned.
+    Aspect ratio is preserved, so the normalised YOLO labels are copied unchanged. Any change
+    to the source images, labels or imgsz produces a new hash and therefore a new copy.
+    """
+    with open(data_yaml, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f)
+
+    split_dirs = split_dirs_from_yaml(data)
+    cache_dir = os.path.abspath(os.path.join(cache_root, source_hash(split_dirs, imgsz)))
+    cached_yaml = os.path.join(cache_dir, "data.yaml")
+    if os.path.exists(cached_yaml):
+        print(f"Using cached dataset: {cache_dir}")
+        return cached_yaml
+
+    tmp_dir = cache_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    jobs = []
+    for split, image_dir in split_dirs.items():
+        image_out = os.path.join(tmp_dir, "images", split)
+        label_out = os.path.join(tmp_dir, "labels", split)
+        os.makedirs(image_out)
+        os.makedirs(label_out)
+
+        label_dir = _label_dir(image_dir)
+        if os.path.isdir(label_dir):
+            for file in os.listdir(label_dir):
+                if file.endswith(".txt"):
+                    shutil.copy2(os.path.join(label_dir, file), os.path.join(label_out, file))
+        for file in os.listdir(image_dir):
+            if file.lower().endswith(IMAGE_EXTENSIONS):
+                jobs.append((os.path.join(image_dir, file), os.path.join(image_out, file)))
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        list(executor.map(lambda job: _resize_one(job[0], job[1], imgsz), jobs))
+
+    cached = dict(data, path=cache_dir)
+    for split in split_dirs:
+        cached[split] = f"images/{split}"
+    with open(os.path.join(tmp_dir, "data.yaml"), "w", encoding="utf-8") as f:
+        yaml.safe_dump(cached, f, sort_keys=False)
+
+    # The directory appears under its final name only once complete
+    os.replace(tmp_dir, cache_dir)
+    print(f"Resized {len(jobs)} images to {imgsz}px: {cache_dir}")
+    return cached_yaml
@@ -1,132 +1,207 @@
 import argparse
+import hashlib
 import os
 import shutil
-from random import seed
-from random import sample
+from concurrent.futures import ThreadPoolExecutor
+
+SPLITS = ["train", "val", "test"]
+IMAGE_EXTENSIONS = (".jpg", ".png")
+MODES = ["copy", "hardlink", "symlink", "reflink"]
+FICLONE = 0x40049409  # Linux ioctl: share file extents (btrfs, xfs, ...)
 
 # Add Parser
 parser = argparse.ArgumentParser()
-   
+
 parser.add_argument("--train", type=int, default=80, help="Percentage of train set")
 parser.add_argument("--validation", type=int, default=10, help="Percentage of validation set")
 parser.add_argument("--test", type=int, default=10, help="Percentage of test set")
 parser.add_argument("--folder", type=str, default="turbot_images", help="Folder that contain image")
 parser.add_argument("--dest", type=str, default="turbot_dataset", help="Destination")
-
-
-args = parser.parse_args()
-
-def get_difference_from_2_list(list1, list2):
-	set_list1 = set(list1)
-	set_list2 = set(list2)
-
-	diff = list(set_list1.difference(set_list2))
-
-	return diff
-
-def get_split_data(list_id):
-	# Train Set
-	# Count number of training data
-	n_train = (count * args.train) / 100
-	# Random
-	train = sample(list_id, int(n_train))
-
-	list_id = get_difference_from_2_list(list_id, train)
-
-	# Validation Set
-	# Count number of validation data
-	n_valid = (count * args.validation) / 100
-
-	# Random
-	valid = sample(list_id, int(n_valid))
-
-	# Test Set
-    # Count number of testing data
-	test = get_difference_from_2_list(list_id, valid)
-
-	return train, valid, test
-
-def make_folder():
-    folders = ["images", "labels"]
-    inner_folders = ["train", "val", "test"]
-
-    if(not os.path.isdir(args.dest)):
-        os.mkdir(args.dest)
-
-    for folder in folders:
-        path = os.path.join(args.dest, folder)
-        # Check existing folder
-        if(not os.path.isdir(path)):
-            os.mkdir(path)
-        
-        for in_folder in inner_folders:
-            inner_path = os.path.join(path, in_folder)
-            # Check existing inner folder
-            if(not os.path.isdir(inner_path)):
-                os.mkdir(inner_path)     
-
-def copy_image(file, id_folder):
-    inner_folders = ["train", "val", "test"]
-
-    # Image
-    source = os.path.join(args.folder, file)
-    out_dest = os.path.join(args.dest, 'images')
-    destination = os.path.join(out_dest, inner_folders[id_folder])    
-
-    try:
-        shutil.copy(source, destination)
-        # print("File copied successfully.")
-
-    # If source and destination are same
-    except shutil.SameFileError:
-        print("Source and destination represents the same file.")
-
-    # labels   
-    separator = file.find(".")
-    filename = file[0:separator]+".txt" 
-
-    source = os.path.join(args.folder, filename)
-    out_dest = os.path.join(args.dest, 'labels')
-    destination = os.path.join(out_dest, inner_folders[id_folder])
-
+parser.add_argument("--salt", type=str, default="", help="Salt for the filename hash (changes the whole split)")
+parser.add_argument("--mode", type=str, default="copy", choices=MODES,
+                    help="How files are materialised; links/reflinks fall back to copy when unsupported")
+parser.add_argument("--workers", type=int, default=8, help="Number of threads used to materialise files")
+parser.add_argument("--db", type=str, default=None, help="Project database: records the split of every plate")
+parser.add_argument("--year", type=int, default=None, help="Only plates recorded in --db from this year")
+parser.add_argument("--quarter", type=int, default=None, help="Only plates recorded in --db from this quarter")
+
+
+def hash_bucket(filename, salt=""):
+    """Maps a filename to a stable bucket in [0, 100) with 0.01 resolution"""
+    digest = hashlib.blake2b(f"{salt}{filename}".encode("utf-8"), digest_size=8).digest()
+    return (int.from_bytes(digest, "big") % 10000) / 100
+
+
+def assign_split(filename, train_pct, valid_pct, salt=""):
+    """Returns the split index (0 train, 1 val, 2 test) determined only by the filename.
+
+    Adding or removing other images never moves an existing image between splits.
+    """
+    bucket = hash_bucket(filename, salt)
+    if bucket < train_pct:
+        return 0
+    if bucket < train_pct + valid_pct:
+        return 1
+    return 2
+
+
+def get_split_data(files, train_pct, valid_pct, salt=""):
+    """Splits files in a single pass into train, val and test lists"""
+    splits = ([], [], [])
+    for file in files:
+        splits[assign_split(file, train_pct, valid_pct, salt)].append(file)
+    return splits
+
+
+def list_images(folder):
+    return sorted(file for file in os.listdir(folder) if file.endswith(IMAGE_EXTENSIONS))
+
+
+def make_folder(dest):
+    for folder in ["images", "labels"]:
+        for in_folder in SPLITS:
+            os.makedirs(os.path.join(dest, folder, in_folder), exist_ok=True)
+
+
+def _reflink(source, destination):
+    import fcntl  # Not available on Windows - caller falls back to copy
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            os.remove(destination)
+            raise
+
+
+def _is_current(source, destination, mode):
+    """True if destination already represents source and does not need to be rewritten"""
+    if not os.path.lexists(destination):
+        return False
+    if mode == "symlink":
+        return os.path.islink(destination) and os.readlink(destination) == os.path.abspath(source)
+    if os.path.islink(destination):
+        return False
+    if os.path.samefile(source, destination):
+        return True
+    src_stat, dst_stat = os.stat(source), os.stat(destination)
+    return src_stat.st_size == dst_stat.st_size and int(src_stat.st_mtime) == int(dst_stat.st_mtime)
+
+
+def _relink(source, destination):
+    """Replaces an up-to-date copy with a hardlink; keeps the copy when the filesystem refuses the link"""
+    tmp_path = destination + ".link.tmp"
     try:
-        shutil.copy(source, destination)
-        # print("File copied successfully.")
-
-    # If source and destination are same
-    except shutil.SameFileError:
-        print("Source and destination represents the same file.") 
-
-# Check train set
-if((args.train < args.validation) or (args.train < args.test) ):
-	print("Train set must has a biggest Percentage")
-	exit()
-
-# Check total percentage
-total = args.train + args.validation + args.test
-if(total > 100):
-	print("Total Percentage must 100%")
-	exit()
-
-# Count number of data
-count = 0
-list_id = []
-for file in os.listdir(args.folder):
-    if ((file.endswith(".jpg")) or (file.endswith(".png"))):       
-        list_id.append(count)
-        count+=1
-
-train, valid, test = get_split_data(list_id)
-make_folder()
-
-count = 0
-for file in os.listdir(args.folder):
-	if ((file.endswith(".jpg")) or (file.endswith(".png"))):
-		if(count in train):			
-			copy_image(file, 0)
-		elif(count in valid):			
-			copy_image(file, 1)
-		else:			
-			copy_image(file, 2)			
-
-		count+=1
\ No newline at end of file
+        os.link(source, tmp_path)
+    except OSError:
+        return False
+    os.replace(tmp_path, destination)
+    return True
+
+
+def materialize(source, destination, mode="copy"):
+    """Places source at destination using the requested mode. Returns True if anything was written."""
+    if _is_current(source, destination, mode):
+        if mode == "hardlink" and not os.path.samefile(source, destination):
+            # A copy from a copy-mode run or from an earlier failed link: link once, or keep the copy
+            return _relink(source, destination)
+        return False
+    if os.path.lexists(destination):
+        os.remove(destination)
+
+    if mode == "symlink":
+        os.symlink(os.path.abspath(source), destination)
+        return True
+    if mode == "hardlink":
+        try:
+            os.link(source, destination)
+            return True
+        except OSError:
+            pass
+    elif mode == "reflink":
+        try:
+            _reflink(source, destination)
+            shutil.copystat(source, destination)
+            return True
+        except (OSError, ImportError):
+            pass
+
+    # copy2 keeps mtime, so an unchanged file is recognised on the next run
+    shutil.copy2(source, destination)
+    return True
+
+
+def split_jobs(splits, folder, dest):
+    """Yields (source, destination) pairs for images and their labels"""
+    for id_folder, split_files in enumerate(splits):
+        for file in split_files:
+            yield os.path.join(folder, file), os.path.join(dest, "images", SPLITS[id_folder], file)
+
+            # labels
+            label = os.path.splitext(file)[0] + ".txt"
+            label_source = os.path.join(folder, label)
+            if os.path.exists(label_source):
+                yield label_source, os.path.join(dest, "labels", SPLITS[id_folder], label)
+
+
+def remove_stale(dest, expected):
+    """Removes files left in the dataset by a previous split that are no longer expected"""
+    removed = 0
+    for folder in ["images", "labels"]:
+        for in_folder in SPLITS:
+            path = os.path.join(dest, folder, in_folder)
+            for file in os.listdir(path):
+                file_path = os.path.join(path, file)
+                if file_path not in expected:
+                    os.remove(file_path)
+                    removed += 1
+    return removed
+
+
+def main(args):
+    # Check train set
+    if (args.train < args.validation) or (args.train < args.test):
+        print("Train set must has a biggest Percentage")
+        exit()
+
+    # Check total percentage
+    total = args.train + args.validation + args.test
+    if total > 100:
+        print("Total Percentage must 100%")
+        exit()
+
+    store = None
+    if args.db:
+        # Imported only when used, so the script also runs without the application package
+        from Otolits_identyfication_program.project_store import ProjectStore
+        store = ProjectStore(args.db)
+    elif args.year is not None or args.quarter is not None:
+        print("--year and --quarter require --db")
+        exit()
+
+    files = list_images(args.folder)
+    if store is not None and (args.year is not None or args.quarter is not None):
+        plates = set(store.plate_names(args.year, args.quarter))
+        files = [file for file in files if os.path.splitext(file)[0] in plates]
+    splits = get_split_data(files, args.train, args.validation, args.salt)
+    make_folder(args.dest)
+
+    jobs = list(split_jobs(splits, args.folder, args.dest))
+    removed = remove_stale(args.dest, {destination for _, destination in jobs})
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        written = sum(executor.map(lambda job: materialize(job[0], job[1], args.mode), jobs))
+
+    print(", ".join(f"{name}: {len(split_files)}" for name, split_files in zip(SPLITS, splits)))
+    print(f"Files written: {written}, unchanged: {len(jobs) - written}, stale removed: {removed} (mode: {args.mode})")
+
+    if store is not None:
+        names = {os.path.splitext(file)[0]: (SPLITS[index], os.path.abspath(os.path.join(args.folder, file)))
+                 for index, split_files in enumerate(splits) for file in split_files}
+        store.record_splits(args.dest, {name: split for name, (split, _) in names.items()},
+                            {name: path for name, (_, path) in names.items()})
+        store.close()
+        print(f"Split recorded in {args.db} as dataset '{args.dest}'")
+
+
+if __name__ == "__main__":
+    main(parser.parse_args())
@@ -0,0 +1,229 @@
+import os
+import csv
+import time
+import random
+import argparse
+import itertools
+import statistics
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import yaml
+
+from Otolits_identyfication_program.YOLO.yolo_trainer import YoloTrainer
+from Otolits_identyfication_program.YOLO.dataset_cache import (IMAGE_EXTENSIONS, prepare_resized_dataset,
+                                                               split_dirs_from_yaml)
+from Otolits_identyfication_program.model_yolo import YOLOModel
+
+MAP_KEY = "metrics/mAP50-95(B)"
+MAP50_KEY = "metrics/mAP50(B)"
+RESULT_FIELDS = ["trial", "status", "map50", "map50_95", "epochs_run", "wall_time_s", "latency_ms"]
+
+
+LITERALS = {"true": True, "false": False, "none": None}
+
+
+def parse_value(text):
+    """'8' -> 8, '0.5' -> 0.5, 'False' -> False, 'none' -> None, anything else stays a string"""
+    if text.lower() in LITERALS:
+        return LITERALS[text.lower()]
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+
+def parse_grid(items):
+    """['imgsz=480,640', 'batch=4'] -> {'imgsz': [480, 640], 'batch': [4]}"""
+    grid = {}
+    for item in items:
+        key, _, values = item.partition("=")
+        grid[key] = [parse_value(value) for value in values.split(",")]
+    return grid
+
+
+def make_trials(grid, samples=None, seed=0):
+    """Full grid, or `samples` random points from it when random search is requested"""
+    keys = list(grid)
+    combinations = [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+    if samples is not None and samples < len(combinations):
+        combinations = random.Random(seed).sample(combinations, samples)
+    return combinations
+
+
+class MedianPruner:
+    """Stops a trial whose mAP after an epoch is below the median of other trials at that epoch.
+
+    The history is a Manager dict shared by all worker processes.
+    """
+
+    def __init__(self, history, lock, warmup_epochs=5, min_trials=3):
+        self.history = history
+        self.lock = lock
+        self.warmup_epochs = warmup_epochs
+        self.min_trials = min_trials
+        self.pruned = False
+
+    def on_fit_epoch_end(self, trainer):
+        value = trainer.metrics.get(MAP_KEY)
+        if value is None:
+            return
+        epoch = trainer.epoch
+        with self.lock:
+            previous = self.history.get(epoch, [])
+            self.history[epoch] = previous + [value]
+
+        if epoch < self.warmup_epochs or len(previous) < self.min_trials:
+            return
+        if value < statistics.median(previous):
+            print(f"Pruning trial at epoch {epoch + 1}: mAP50-95 {value:.3f} < median {statistics.median(previous):.3f}")
+            self.pruned = True
+            trainer.stop = True
+
+
+def measure_latency(weights, image, imgsz, repeats=10):
+    """Median single-image inference time in ms (first call, which loads the model, is excluded)"""
+    model = YOLOModel(weights, imgsz=imgsz)
+    model.detect_objects(image)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.detect_objects(image)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def _latency_image(data_yaml):
+    with open(data_yaml, "r", encoding="utf-8") as f:
+        split_dirs = split_dirs_from_yaml(yaml.safe_load(f))
+    image_dir = split_dirs.get("val") or split_dirs.get("train")
+    for file in sorted(os.listdir(image_dir)):
+        if file.lower().endswith(IMAGE_EXTENSIONS):
+            return cv2.imread(os.path.join(image_dir, file))
+    return None
+
+
+def run_trial(trial_id, params, data, threads, workers, history, lock, warmup_epochs):
+    """Runs in a worker process: trains one configuration and returns a row of the results table"""
+    import torch
+    torch.set_num_threads(threads)
+
+    options = dict(params)
+    # Parallel trials share the dataset: an ultralytics disk cache would have them all writing the same
+    # .npy files next to the images at once. RAM caching is per process and stays allowed.
+    if options.get("cache", "disk") == "disk":
+        options["cache"] = False
+    # A grid may set dataloader workers explicitly; run_sweep counts them in the CPU budget
+    workers = options.pop("workers", workers)
+    # Pre-resized copies are built once in run_sweep, before the pool starts
+    options["preresize"] = False
+
+    pruner = MedianPruner(history, lock, warmup_epochs=warmup_epochs)
+    trainer = YoloTrainer(data=data, workers=workers, name=f"sweep_{trial_id:03d}",
+                          callbacks={"on_fit_epoch_end": pruner.on_fit_epoch_end}, **options)
+    start = time.perf_counter()
+    results = trainer.train()
+    wall_time = time.perf_counter() - start
+
+    row = dict(params, trial=trial_id, wall_time_s=round(wall_time, 1), epochs_run=len(trainer.epoch_timer.history))
+    if results is None:
+        return dict(row, status="failed")
+
+    metrics = results.results_dict
+    row.update(status="pruned" if pruner.pruned else "done",
+               map50=round(metrics.get(MAP50_KEY, 0.0), 4), map50_95=round(metrics.get(MAP_KEY, 0.0), 4))
+    image = _latency_image(data)
+    if image is not None and trainer.best_weights:
+        row["latency_ms"] = round(measure_latency(trainer.best_weights, image, trainer.imgsz), 1)
+    return row
+
+
+def trial_cpus(params, threads_per_trial, workers_per_trial):
+    """Cores one trial keeps busy: torch threads plus dataloader worker processes"""
+    return threads_per_trial + params.get("workers", workers_per_trial)
+
+
+def run_sweep(data, grid, samples=None, cpu_budget=None, threads_per_trial=2, warmup_epochs=5,
+              results_path="sweep_results.csv", seed=0, workers_per_trial=None):
+    """Runs all trials in a process pool so that parallel trials * (threads + workers) stay within cpu_budget.
+
+    Dataloader workers default to half of threads_per_trial (at least one).
+    """
+    trials = make_trials(grid, samples, seed)
+    cpu_budget = cpu_budget or os.cpu_count() or 1
+    if workers_per_trial is None:
+        workers_per_trial = max(1, threads_per_trial // 2)
+    per_trial = max((trial_cpus(params, threads_per_trial, workers_per_trial) for params in trials), default=1)
+    parallel = max(1, cpu_budget // per_trial)
+    print(f"{len(trials)} trials, {parallel} in parallel, {threads_per_trial} threads + "
+          f"{workers_per_trial} dataloader workers each")
+
+    # Trials asking for preresize get a shared copy per imgsz, built here so that they do not
+    # race each other writing the same dataset_cache directory
+    prepared = {}
+    trial_data = []
+    for params in trials:
+        if params.get("preresize"):
+            imgsz = params.get("imgsz", 640)
+            if imgsz not in prepared:
+                prepared[imgsz] = prepare_resized_dataset(data, imgsz, params.get("dataset_cache_dir", "dataset_cache"))
+            trial_data.append(prepared[imgsz])
+        else:
+            trial_data.append(data)
+
+    fields = list(grid) + RESULT_FIELDS
+    rows = []
+    with multiprocessing.Manager() as manager, \
+            ProcessPoolExecutor(max_workers=parallel, mp_context=multiprocessing.get_context("spawn")) as executor:
+        history, lock = manager.dict(), manager.Lock()
+        futures = {executor.submit(run_trial, trial_id, params, trial_data[trial_id], threads_per_trial,
+                                   workers_per_trial, history, lock, warmup_epochs): trial_id
+                   for trial_id, params in enumerate(trials)}
+
+        with open(results_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fields, restval="")
+            writer.writeheader()
+            for future in as_completed(futures):
+                try:
+                    row = future.result()
+                except Exception as e:
+                    row = dict(trials[futures[future]], trial=futures[future], status=f"error: {e}")
+                rows.append(row)
+                # Results are written as trials finish, so an interrupted sweep keeps what it has
+                writer.writerow(row)
+                f.flush()
+                print(f"Trial {row['trial']}: {row['status']}, mAP50-95 {row.get('map50_95', '-')}")
+
+    rows.sort(key=lambda r: r.get("map50_95", -1), reverse=True)
+    finished = [row for row in rows if "map50_95" in row]
+    if finished:
+        print(f"Best trial: {finished[0]}")
+    else:
+        print("No trial finished successfully")
+    return rows
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter sweep for YoloTrainer")
+    parser.add_argument("--data", type=str, default="datasets/turbot.yaml", help="Dataset yaml")
+    parser.add_argument("--grid", nargs="+", default=["model=yolo11n.pt,yolo11s.pt", "imgsz=480,640", "batch=4,8",
+                                                      "epochs=50", "patience=20"],
+                        help="Parameter grid as key=value1,value2 ...")
+    parser.add_argument("--random", type=int, default=None, help="Random search: number of sampled trials")
+    parser.add_argument("--cpu-budget", type=int, default=None, help="Total cores for all trials")
+    parser.add_argument("--threads", type=int, default=2, help="Threads per trial")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Dataloader workers per trial (default: half of --threads, at least 1)")
+    parser.add_argument("--warmup", type=int, default=5, help="Epochs before median pruning kicks in")
+    parser.add_argument("--results", type=str, default="sweep_results.csv", help="Output CSV")
+    parser.add_argument("--seed", type=int, default=0, help="Random search seed")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    run_sweep(args.data, parse_grid(args.grid), args.random, args.cpu_budget, args.threads, args.warmup,
+              args.results, args.seed, args.workers)
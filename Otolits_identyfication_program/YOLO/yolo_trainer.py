@@ -1,16 +1,61 @@
 import os
+import time
 import cv2
-from ultralytics import YOLO
+from Otolits_identyfication_program.bounding_box import BoundingBox
 from Otolits_identyfication_program.bounding_box_manager import BoundingBoxManager
+from Otolits_identyfication_program.model_yolo import YOLOModel
+from Otolits_identyfication_program.detection_cache import DetectionCache
+from Otolits_identyfication_program.YOLO.dataset_cache import prepare_resized_dataset
+
+
+class EpochTimer:
+    """Splits each epoch's wall time into data loading and compute using trainer callbacks"""
+
+    def __init__(self):
+        self.history = []
+        self._epoch_start = 0.0
+        self._last_mark = 0.0
+        self._data_time = 0.0
+        self._compute_time = 0.0
+
+    def attach(self, model):
+        model.add_callback("on_train_epoch_start", self._on_epoch_start)
+        model.add_callback("on_train_batch_start", self._on_batch_start)
+        model.add_callback("on_train_batch_end", self._on_batch_end)
+        model.add_callback("on_train_epoch_end", self._on_epoch_end)
+
+    def _on_epoch_start(self, trainer):
+        self._epoch_start = self._last_mark = time.perf_counter()
+        self._data_time = self._compute_time = 0.0
+
+    def _on_batch_start(self, trainer):
+        # Time since the previous batch ended was spent waiting for the dataloader
+        now = time.perf_counter()
+        self._data_time += now - self._last_mark
+        self._last_mark = now
+
+    def _on_batch_end(self, trainer):
+        now = time.perf_counter()
+        self._compute_time += now - self._last_mark
+        self._last_mark = now
+
+    def _on_epoch_end(self, trainer):
+        total = time.perf_counter() - self._epoch_start
+        self.history.append((trainer.epoch, self._data_time, self._compute_time, total))
+        print(f"Epoch {trainer.epoch + 1}: data {self._data_time:.1f} s ({self._data_time / max(total, 1e-9):.0%}), "
+              f"compute {self._compute_time:.1f} s, total {total:.1f} s")
+
 
 class YoloTrainer:
-    def __init__(self, model, data, imgsz=640, device='cpu', workers=0, batch=4, epochs=200, patience=50,
-                 name='turbot_results', amp=False, single_cls=True, bounding_box_manager=None):
+    def __init__(self, model, data, imgsz=640, device='cpu', workers=None, batch=4, epochs=200, patience=50,
+                 name='turbot_results', amp=False, single_cls=True, bounding_box_manager=None, detection_cache=None,
+                 preresize=False, dataset_cache_dir='dataset_cache', cache=None, callbacks=None, project_store=None):
         self.model = model
         self.data = data
         self.imgsz = imgsz
         self.device = device
-        self.workers = workers
+        # None = one dataloader worker per core (capped like ultralytics does)
+        self.workers = workers if workers is not None else min(os.cpu_count() or 1, 8)
         self.batch = batch
         self.epochs = epochs
         self.patience = patience
@@ -18,12 +63,35 @@ class YoloTrainer:
         self.amp = amp
         self.single_cls = single_cls
         self.bounding_box_manager = bounding_box_manager
+        self.detection_cache = detection_cache
+        self.preresize = preresize
+        self.dataset_cache_dir = dataset_cache_dir
+        # None = no ultralytics image cache, except for the pre-resized copy: there the .npy files are
+        # small and land under dataset_cache_dir instead of next to the source plates
+        self.cache = cache if cache is not None else ('disk' if preresize else False)
+        self.callbacks = callbacks or {}
+        # Optional ProjectStore - detect_objects records the detected boxes of every plate
+        self.project_store = project_store
+        self.epoch_timer = EpochTimer()
+        self.best_weights = None
+        self._yolo_model = None
 
     def train(self):
         try:
+            data = self.data
+            if self.preresize:
+                # Full-resolution plates are decoded and resized once instead of every epoch
+                data = prepare_resized_dataset(self.data, self.imgsz, self.dataset_cache_dir, self.workers)
+
+            # Imported here so that importing this module (and torch) stays cheap
+            from ultralytics import YOLO
             model = YOLO(self.model)
-            model.train(
-                data=self.data,
+            self.epoch_timer.attach(model)
+            for event, callback in self.callbacks.items():
+                model.add_callback(event, callback)
+            results = model.train(
+                data=data,
+                cache=self.cache,
                 imgsz=self.imgsz,
                 device=self.device,
                 workers=self.workers,
@@ -36,48 +104,65 @@ class YoloTrainer:
                 save_conf=False,
                 save_txt=False
             )
+            self.best_weights = str(model.trainer.best)
             print("Training completed successfully.")
+            return results
         except Exception as e:
             print(f"Training failed: {e}")
+            return None
 
     def detect_objects(self, image_path):
         try:
-            model = YOLO(self.model)
-            results = model(image_path)
+            image = cv2.imread(image_path)
+            if image is None:
+                raise ValueError(f"Cannot read image: {image_path}")
+
+            if self._yolo_model is None:
+                self._yolo_model = YOLOModel(self.model, imgsz=self.imgsz, device=self.device,
+                                             cache=self.detection_cache)
+            detections = self._yolo_model.detect_objects(image)
             result_dir = os.path.join(os.getcwd(), self.name)
 
             # Sprawdź, czy katalog istnieje, jeśli nie, utwórz go
             if not os.path.exists(result_dir):
                 os.makedirs(result_dir)
 
-            for r in results:
-                im = r.plot(labels=False)
-
-                # Sprawdzanie formatu obrazu
-                print(f"Image type: {type(im)}")
+            im = image.copy()
+            boxes = []
+            for box in detections:
+                x1, y1, x2, y2 = map(int, box[:4])
+                cv2.rectangle(im, (x1, y1), (x2, y2), (0, 0, 255), 2)
+                if self.bounding_box_manager:
+                    boxes.append(self.bounding_box_manager.add_box(x1, y1, x2, y2))
+                elif self.project_store is not None and x2 > x1 and y2 > y1:
+                    boxes.append(BoundingBox(x1, y1, x2, y2))
 
-                # Ścieżka do zapisu obrazu
-                output_image_path = os.path.join(result_dir, "no_labels_pred.jpg")
+            if self.project_store is not None:
+                # Detections are in original image coordinates; rows are assigned later in the GUI
+                plate = os.path.splitext(os.path.basename(image_path))[0]
+                self.project_store.save_annotations(plate, boxes, [], scale=1.0, path=os.path.abspath(image_path),
+                                                    size=(image.shape[1], image.shape[0]))
 
-                # Zapisz obraz
-                if cv2.imwrite(output_image_path, im):
-                    print(f"Image saved successfully at: {output_image_path}")
-                else:
-                    print(f"Failed to save the image at: {output_image_path}")
+            # Ścieżka do zapisu obrazu
+            output_image_path = os.path.join(result_dir, "no_labels_pred.jpg")
 
-                for box in r.boxes.xyxy.cpu().numpy():
-                    x1, y1, x2, y2 = map(int, box[:4])
-                    if self.bounding_box_manager:
-                        self.bounding_box_manager.add_box(x1, y1, x2, y2)
+            # Zapisz obraz
+            if cv2.imwrite(output_image_path, im):
+                print(f"Image saved successfully at: {output_image_path}")
+            else:
+                print(f"Failed to save the image at: {output_image_path}")
 
-            print(f"Detected {len(results[0].boxes)} objects.")
+            print(f"Detected {len(detections)} objects.")
+            if self.detection_cache is not None:
+                print(f"Detection cache hit rate: {self.detection_cache.hit_rate:.0%}")
         except Exception as e:
             print(f"Detection failed: {e}")
 
 
 if __name__ == "__main__":
     bounding_box_manager = BoundingBoxManager()
-    trainer = YoloTrainer(model='yolo11l.pt', data='datasets/turbot.yaml', bounding_box_manager=bounding_box_manager)
+    trainer = YoloTrainer(model='yolo11l.pt', data='datasets/turbot.yaml', bounding_box_manager=bounding_box_manager,
+                          detection_cache=DetectionCache('detection_cache.sqlite'), preresize=True)
 
     # Trenuj model
     trainer.train()
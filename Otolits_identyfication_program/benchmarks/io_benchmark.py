@@ -0,0 +1,222 @@
+"""Benchmark ścieżki wejścia/wyjścia obrazów: od naciśnięcia N do wyświetlenia klatki i zapisu wycinków.
+
+Uruchamianie z katalogu Otolits_identyfication_program:
+    python -m benchmarks.io_benchmark [--images katalog_z_tabliczkami] [--resolutions 2000x1500 4000x3000]
+
+Dla każdego obrazu mierzone są etapy: dekodowanie, _resize_to_screen, pełne load_image,
+get_original_image (z kopią i bez) oraz kodowanie i zapis wycinków przez ImageCropper.
+Dodatkowo porównywane są strategie dekodowania + skalowania do podglądu.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_loader import ImageLoader
+from image_cropper import ImageCropper
+from bounding_box_manager import BoundingBoxManager
+from row_detector import RowDetector
+from benchmarks.synthetic import make_plate, make_image, quiet
+
+try:
+    import resource  # Brak w systemie Windows
+except ImportError:
+    resource = None
+
+DEFAULT_RESOLUTIONS = ["2000x1500", "4000x3000", "8000x6000"]
+DEFAULT_CODECS = ["jpg", "png"]
+SCREEN_SIZE = (1920, 1080)
+MB = 1024 * 1024
+
+# IMREAD_REDUCED_* dekoduje JPEG od razu w 1/2, 1/4 lub 1/8 rozdzielczości (DCT scaling)
+REDUCED_FLAGS = [(8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2)]
+
+
+def _preview_size(w, h, screen=SCREEN_SIZE):
+    scale = min(screen[0] / w, screen[1] / h) * 0.9
+    return int(w * scale), int(h * scale), scale
+
+
+def decode_full_area(path):
+    """Obecna ścieżka ImageLoader: pełne dekodowanie + INTER_AREA"""
+    image = cv2.imread(path)
+    w, h, _ = _preview_size(image.shape[1], image.shape[0])
+    return cv2.resize(image, (w, h), interpolation=cv2.INTER_AREA)
+
+
+def decode_full_linear(path):
+    image = cv2.imread(path)
+    w, h, _ = _preview_size(image.shape[1], image.shape[0])
+    return cv2.resize(image, (w, h), interpolation=cv2.INTER_LINEAR)
+
+
+def decode_reduced_area(path, original_size):
+    """Zredukowane dekodowanie (największy czynnik nie mniejszy niż podgląd) + INTER_AREA na resztę"""
+    w, h, scale = _preview_size(*original_size)
+    flag = cv2.IMREAD_COLOR
+    for factor, reduced_flag in REDUCED_FLAGS:
+        if scale <= 1 / factor:
+            flag = reduced_flag
+            break
+    image = cv2.imread(path, flag)
+    return cv2.resize(image, (w, h), interpolation=cv2.INTER_AREA)
+
+
+def _measure(func, repeats):
+    """Zwraca (najlepszy czas, szczyt pamięci tracemalloc w MB, wynik ostatniego wywołania)"""
+    best = float("inf")
+    result = None
+    tracemalloc.start()
+    for _ in range(repeats):
+        result = None
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    peak = tracemalloc.get_traced_memory()[1] / MB
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def _row(stage, image_name, seconds, megabytes, peak, images=1):
+    return {
+        "stage": stage,
+        "image": image_name,
+        "ms": round(seconds * 1000, 2),
+        "mb_per_s": round(megabytes / max(seconds, 1e-9), 1),
+        "images_per_s": round(images / max(seconds, 1e-9), 2),
+        "peak_mb": round(peak, 1),
+    }
+
+
+def make_synthetic_plates(directory, resolutions, codecs, n_boxes=200):
+    """Zapisuje syntetyczne tabliczki w zadanych rozdzielczościach i kodekach"""
+    paths = []
+    for resolution in resolutions:
+        w, h = map(int, resolution.split("x"))
+        boxes, (plate_h, plate_w) = make_plate(n_boxes, max(1, n_boxes // 25))
+        image = cv2.resize(make_image((plate_h, plate_w), boxes), (w, h), interpolation=cv2.INTER_LINEAR)
+        for codec in codecs:
+            path = os.path.join(directory, f"synthetic_{resolution}.{codec}")
+            cv2.imwrite(path, image)
+            paths.append(path)
+    return paths
+
+
+def _crop_rows(image, n_boxes=200):
+    """Syntetyczne wiersze boxów rozciągnięte na cały obraz"""
+    boxes, (plate_h, plate_w) = make_plate(n_boxes, max(1, n_boxes // 25))
+    sx, sy = image.shape[1] / plate_w, image.shape[0] / plate_h
+    manager = BoundingBoxManager(None)
+    with quiet():
+        for x1, y1, x2, y2 in boxes:
+            manager.add_box(x1 * sx, y1 * sy, x2 * sx, y2 * sy)
+    return RowDetector(manager).detect_rows()
+
+
+def benchmark_image(path, repeats, output_dir):
+    name = os.path.basename(path)
+    file_mb = os.path.getsize(path) / MB
+    rows = []
+
+    decode_time, decode_peak, image = _measure(lambda: cv2.imread(path), repeats)
+    pixel_mb = image.nbytes / MB
+    h, w = image.shape[:2]
+    rows.append(_row("decode", name, decode_time, file_mb, decode_peak))
+
+    # cache_size=0 - każde load_image() dekoduje obraz od nowa
+    loader = ImageLoader(os.path.dirname(path), screen_size=SCREEN_SIZE, cache_size=0)
+    loader.current_index = loader.image_files.index(name)
+    resize_time, resize_peak, _ = _measure(lambda: loader._resize_to_screen(image), repeats)
+    rows.append(_row("resize_to_screen", name, resize_time, pixel_mb, resize_peak))
+
+    load_time, load_peak, _ = _measure(loader.load_image, repeats)
+    rows.append(_row("load_image", name, load_time, file_mb, load_peak))
+
+    copy_time, copy_peak, _ = _measure(lambda: loader.get_original_image(), repeats)
+    rows.append(_row("get_original_image(copy)", name, copy_time, pixel_mb, copy_peak))
+    view_time, view_peak, _ = _measure(lambda: loader.get_original_image(copy=False), repeats)
+    rows.append(_row("get_original_image(view)", name, view_time, pixel_mb, view_peak))
+
+    crop_rows = _crop_rows(image)
+    n_crops = sum(len(row.boxes) for row in crop_rows)
+    cropper = ImageCropper(output_dir, incremental=False)
+    crop_time, crop_peak, results = _measure(
+        lambda: cropper.crop_and_save(image, crop_rows, [], plate_name=os.path.splitext(name)[0]), repeats)
+    cropper.shutdown()
+    crop_mb = sum(r.image.nbytes for r in results) / MB
+    rows.append(_row("crop_encode_write", name, crop_time, crop_mb, crop_peak, images=n_crops))
+
+    # Strategie dekodowania + skalowania do podglądu
+    strategies = {
+        "full+INTER_AREA": lambda: decode_full_area(path),
+        "full+INTER_LINEAR": lambda: decode_full_linear(path),
+        "reduced+INTER_AREA": lambda: decode_reduced_area(path, (w, h)),
+    }
+    reference = None
+    for strategy, func in strategies.items():
+        seconds, peak, preview = _measure(func, repeats)
+        row = _row(f"preview[{strategy}]", name, seconds, file_mb, peak)
+        if reference is None:
+            reference = preview.astype(np.float32)
+        else:
+            # Średni błąd bezwzględny względem obecnej ścieżki (jakość podglądu)
+            row["mae_vs_current"] = round(float(np.abs(preview.astype(np.float32) - reference).mean()), 2)
+        rows.append(row)
+    return rows
+
+
+def run(image_paths, repeats=3, output=None):
+    output_dir = tempfile.mkdtemp(prefix="bench_io_crops_")
+    results = []
+    try:
+        for path in image_paths:
+            results.extend(benchmark_image(path, repeats, output_dir))
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    print(f"{'etap':<30}{'obraz':<28}{'ms':>10}{'MB/s':>13}{'obr/s':>13}{'szczyt MB':>11}")
+    for row in results:
+        print(f"{row['stage']:<30}{row['image'][:27]:<28}{row['ms']:>10}{row['mb_per_s']:>13}"
+              f"{row['images_per_s']:>13}{row['peak_mb']:>11}")
+
+    peak_rss = None
+    if resource is not None:
+        peak_rss = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        print(f"Szczytowe RSS procesu: {peak_rss} MB")
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump({"screen_size": SCREEN_SIZE, "peak_rss_mb": peak_rss, "results": results}, f, indent=2)
+        print(f"Zapisano raport: {output}")
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark ścieżki wczytywania, skalowania i zapisu obrazów")
+    parser.add_argument("--images", type=str, default=None, help="Katalog z przykładowymi tabliczkami")
+    parser.add_argument("--resolutions", nargs="+", default=DEFAULT_RESOLUTIONS, help="Rozdzielczości syntetyczne")
+    parser.add_argument("--codecs", nargs="+", default=DEFAULT_CODECS, help="Kodeki syntetycznych obrazów")
+    parser.add_argument("--repeats", type=int, default=3, help="Liczba powtórzeń (brany najlepszy czas)")
+    parser.add_argument("--output", type=str, default=None, help="Raport JSON")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    synthetic_dir = tempfile.mkdtemp(prefix="bench_io_plates_")
+    try:
+        paths = make_synthetic_plates(synthetic_dir, args.resolutions, args.codecs)
+        if args.images:
+            paths += [os.path.join(args.images, f) for f in sorted(os.listdir(args.images))
+                      if f.lower().endswith((".png", ".jpg", ".jpeg"))]
+        run(paths, args.repeats, args.output)
+    finally:
+        shutil.rmtree(synthetic_dir, ignore_errors=True)
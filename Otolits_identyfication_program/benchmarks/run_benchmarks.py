@@ -0,0 +1,258 @@
+"""Mikrobenchmarki gorących ścieżek geometrii i wykrywania wierszy.
+
+Uruchamianie z katalogu Otolits_identyfication_program:
+    python -m benchmarks.run_benchmarks [--sizes 10 100 1000 10000] [--save-baseline]
+
+Wyniki porównywane są z .benchmarks/baselines.json (poza repozytorium, wpis w .gitignore).
+Czas bazowy przeliczany jest do bieżącej szybkości maszyny (calibration_run), a najlepszy
+z co najmniej MIN_REPEATS pomiarów dłuższy od bazowego o więcej niż --threshold i o więcej
+niż MIN_DELTA oznaczany jest jako regresja (kod wyjścia 1) po potwierdzeniu dłuższą serią.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bounding_box_manager import BoundingBoxManager
+from row_detector import RowDetector
+from image_cropper import ImageCropper
+from benchmarks.synthetic import make_plate, make_image, quiet
+
+# Wyniki bazowe zależą od maszyny - trzymane są lokalnie, poza repozytorium (.gitignore)
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".benchmarks",
+                             "baselines.json")
+MIN_REPEATS = 5
+MIN_DELTA = 0.0005  # Różnice poniżej 0.5 ms to szum pomiaru, nie regresja
+CALIBRATION = "calibration"
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+BOXES_PER_ROW = 25
+QUERIES = 1000
+
+
+def _rows_for(n_boxes):
+    return max(1, n_boxes // BOXES_PER_ROW)
+
+
+def _manager(boxes):
+    manager = BoundingBoxManager(None)
+    with quiet():
+        for box in boxes:
+            manager.add_box(*box)
+    return manager
+
+
+def bench_detect_rows(n):
+    boxes, _ = make_plate(n, _rows_for(n))
+    manager = _manager(boxes)
+
+    def run():
+        RowDetector(manager).detect_rows()
+    return run
+
+
+def bench_assign_remaining_boxes(n):
+    boxes, _ = make_plate(n, _rows_for(n))
+    manager = _manager(boxes)
+    # Wiersze z 90% boxów, pozostałe 10% do przypisania
+    random.Random(0).shuffle(manager.boxes)
+    keep = max(1, int(n * 0.9))
+    all_boxes = manager.boxes
+    manager.boxes = all_boxes[:keep]
+    detector = RowDetector(manager)
+    detector.detect_rows()
+    manager.boxes = all_boxes
+    snapshot = [(row, list(row.boxes), row.p1, row.p2) for row in detector.rows]
+    used = set(all_boxes[:keep])
+
+    def run():
+        for row, row_boxes, p1, p2 in snapshot:
+            row.boxes[:] = row_boxes
+            row.p1, row.p2 = p1, p2
+        detector._assign_remaining_boxes(used)
+    return run
+
+
+def bench_check_line_intersections(n):
+    boxes, _ = make_plate(n, _rows_for(n))
+    detector = RowDetector(_manager(boxes))
+    rows = detector.detect_rows()
+    probe = rows[len(rows) // 2]
+
+    def run():
+        for _ in range(100):
+            detector._check_line_intersections(probe, rows)
+    return run
+
+
+def bench_get_box_at(n):
+    boxes, (h, w) = make_plate(n, _rows_for(n))
+    manager = _manager(boxes)
+    rng = random.Random(0)
+    points = [(rng.uniform(0, w), rng.uniform(0, h)) for _ in range(QUERIES)]
+
+    def run():
+        for x, y in points:
+            manager.get_box_at(x, y)
+    return run
+
+
+def bench_remove_box(n):
+    boxes, _ = make_plate(n, _rows_for(n))
+    manager = _manager(boxes)
+    original = list(manager.boxes)
+    victims = random.Random(0).sample(original, min(n, 100))
+
+    def run():
+        manager.boxes = list(original)
+        with quiet():
+            for box in victims:
+                manager.remove_box(box)
+    return run
+
+
+def bench_from_list(n):
+    boxes, _ = make_plate(n, _rows_for(n))
+    data = _manager(boxes).to_list()
+    manager = BoundingBoxManager(None)
+
+    def run():
+        manager.from_list(data)
+    return run
+
+
+def bench_crop_and_save(n):
+    boxes, shape = make_plate(n, _rows_for(n))
+    image = make_image(shape, boxes)
+    detector = RowDetector(_manager(boxes))
+    rows = detector.detect_rows()
+    output_dir = tempfile.mkdtemp(prefix="bench_crops_")
+    cropper = ImageCropper(output_dir, incremental=False)
+
+    def run():
+        cropper.crop_and_save(image, rows, [], plate_name="bench")
+
+    def cleanup():
+        cropper.shutdown()
+        shutil.rmtree(output_dir, ignore_errors=True)
+    run.cleanup = cleanup
+    # Zapis na dysk - rozrzut czasów zależy od opróżniania bufora zapisu, a nie od kodu
+    run.tolerance = 1.0
+    return run
+
+
+BENCHMARKS = {
+    "detect_rows": bench_detect_rows,
+    "assign_remaining_boxes": bench_assign_remaining_boxes,
+    "check_line_intersections": bench_check_line_intersections,
+    "get_box_at": bench_get_box_at,
+    "remove_box": bench_remove_box,
+    "from_list": bench_from_list,
+    "crop_and_save": bench_crop_and_save,
+}
+
+
+def measure(run, min_time=0.5, min_repeats=MIN_REPEATS, max_repeats=50):
+    """Najlepszy czas z powtórzeń: co najmniej min_repeats, dalej aż do min_time łącznie lub max_repeats.
+
+    Minimum z wielu pomiarów jest odporne na chwilowe obciążenie maszyny (pojedynczy pomiar nie jest).
+    """
+    timings = []
+    total = 0.0
+    while len(timings) < max_repeats and (total < min_time or len(timings) < min_repeats):
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        timings.append(elapsed)
+        total += elapsed
+    return min(timings)
+
+
+def calibration_run():
+    """Stałe obciążenie w czystym Pythonie - mierzy bieżącą szybkość maszyny (zapisywane jako CALIBRATION)"""
+    data = [random.Random(0).random() for _ in range(20000)]
+
+    def run():
+        sorted(data)
+        sum(x * x for x in data)
+    return run
+
+
+def load_baselines(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("results", {})
+
+
+def save_baselines(results, path=BASELINE_PATH):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"machine": platform.platform(), "python": platform.python_version(), "results": results},
+                  f, indent=2, sort_keys=True)
+
+
+def run_suite(names, sizes, threshold=0.5, baseline_path=BASELINE_PATH, save_baseline=False):
+    """Uruchamia benchmarki; zwraca (wyniki, lista regresji)"""
+    baselines = load_baselines(baseline_path)
+    # Czasy bazowe przeliczane są do bieżącej szybkości maszyny (częstotliwość CPU, obciążenie)
+    results = {CALIBRATION: measure(calibration_run())}
+    speed = results[CALIBRATION] / baselines[CALIBRATION] if baselines.get(CALIBRATION) else 1.0
+    regressions = []
+
+    print(f"Szybkość maszyny względem pomiaru bazowego: x{1 / speed:.2f}")
+    print(f"{'benchmark':<28}{'n':>7}{'czas [ms]':>14}{'bazowy [ms]':>14}{'zmiana':>10}")
+    for name in names:
+        for n in sizes:
+            key = f"{name}@{n}"
+            run = BENCHMARKS[name](n)
+            elapsed = measure(run)
+            baseline = baselines[key] * speed if baselines.get(key) else None
+            limit = max(threshold, getattr(run, "tolerance", 0.0))
+            if baseline and elapsed / baseline > 1 + limit:
+                # Podejrzenie regresji - potwierdzenie dłuższą serią, zanim zostanie zgłoszona
+                elapsed = min(elapsed, measure(run, min_time=2.0, min_repeats=2 * MIN_REPEATS))
+            getattr(run, "cleanup", lambda: None)()
+            results[key] = elapsed
+
+            change = ""
+            if baseline:
+                ratio = elapsed / baseline
+                change = f"{ratio - 1:+.0%}"
+                if ratio > 1 + limit and elapsed - baseline > MIN_DELTA:
+                    regressions.append(key)
+                    change += " REGRESJA"
+            base_text = f"{baseline * 1000:.3f}" if baseline else "-"
+            print(f"{name:<28}{n:>7}{elapsed * 1000:>14.3f}{base_text:>14}{change:>10}")
+
+    if save_baseline or not baselines:
+        # Pierwsze uruchomienie zapisuje wyniki jako bazowe; pozostałe wyniki bazowe
+        # przeliczane są do nowej kalibracji
+        save_baselines({**{key: value * speed for key, value in baselines.items()}, **results}, baseline_path)
+        print(f"Zapisano wyniki bazowe: {baseline_path}")
+    return results, regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Mikrobenchmarki wykrywania wierszy i geometrii boxów")
+    parser.add_argument("--benchmarks", nargs="+", default=list(BENCHMARKS), choices=list(BENCHMARKS),
+                        help="Benchmarki do uruchomienia")
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES, help="Liczby boxów")
+    parser.add_argument("--threshold", type=float, default=0.5, help="Dopuszczalny wzrost czasu (0.5 = 50%%)")
+    parser.add_argument("--baseline", type=str, default=BASELINE_PATH, help="Plik z wynikami bazowymi")
+    parser.add_argument("--save-baseline", action="store_true", help="Zapisz bieżące wyniki jako bazowe")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    _, regressions = run_suite(args.benchmarks, args.sizes, args.threshold, args.baseline, args.save_baseline)
+    if regressions:
+        print(f"Regresje: {', '.join(regressions)}")
+        sys.exit(1)
@@ -0,0 +1,55 @@
+import os
+import contextlib
+import cv2
+import numpy as np
+from typing import List, Tuple
+
+
+def make_plate(n_boxes: int, n_rows: int, box_size: Tuple[int, int] = (40, 30), spacing: float = 1.5,
+               tilt: float = 0.03, noise: float = 3.0, seed: int = 0) -> Tuple[List[Tuple[float, float, float, float]],
+                                                                               Tuple[int, int]]:
+    """Generuje n_boxes boxów ułożonych w n_rows zaszumionych, pochylonych wierszy.
+
+    Zwraca (lista (x1, y1, x2, y2), kształt obrazu (h, w)). Każdy wiersz ma własne
+    nachylenie z zakresu [-tilt, tilt], a środki boxów są zaburzone szumem o odchyleniu noise.
+    """
+    rng = np.random.default_rng(seed)
+    box_w, box_h = box_size
+    per_row = -(-n_boxes // n_rows)
+    step_x = box_w * spacing
+    step_y = box_h * spacing * 2
+    margin = box_h + per_row * step_x * tilt + 4 * noise
+
+    boxes = []
+    for row in range(n_rows):
+        slope = rng.uniform(-tilt, tilt)
+        base_y = margin + row * step_y
+        count = min(per_row, n_boxes - len(boxes))
+        cx = box_w + np.arange(count) * step_x + rng.normal(0, noise, count)
+        cy = base_y + slope * (cx - cx[0] if count else 0) + rng.normal(0, noise, count)
+        w = box_w + rng.normal(0, noise, count)
+        h = box_h + rng.normal(0, noise, count)
+        for x, y, bw, bh in zip(cx, cy, w, h):
+            boxes.append((float(x - bw / 2), float(y - bh / 2), float(x + bw / 2), float(y + bh / 2)))
+
+    width = int(box_w * 2 + per_row * step_x)
+    height = int(margin * 2 + n_rows * step_y)
+    return boxes, (height, width)
+
+
+def make_image(shape: Tuple[int, int], boxes, seed: int = 0) -> np.ndarray:
+    """Obraz tabliczki: szum tła i jasne elipsy w miejscach boxów"""
+    rng = np.random.default_rng(seed)
+    image = rng.integers(0, 60, (*shape, 3), dtype=np.uint8)
+    for x1, y1, x2, y2 in boxes:
+        center = (int((x1 + x2) / 2), int((y1 + y2) / 2))
+        axes = (max(1, int((x2 - x1) / 2)), max(1, int((y2 - y1) / 2)))
+        cv2.ellipse(image, center, axes, 0, 0, 360, (220, 220, 220), -1)
+    return image
+
+
+@contextlib.contextmanager
+def quiet():
+    """Kieruje stdout do devnull (BoundingBoxManager wypisuje komunikat przy każdej operacji)"""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
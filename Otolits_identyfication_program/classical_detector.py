@@ -0,0 +1,106 @@
+import cv2
+import numpy as np
+from typing import Optional, Tuple
+
+
+class ClassicalDetector:
+    """Szybki detektor otolitów bez sieci (progowanie adaptacyjne + składowe spójne) dla stanowisk z samym CPU.
+
+    Ma ten sam interfejs co YOLOModel (detect_objects zwraca tablicę (N, 5) [x1, y1, x2, y2, conf]
+    we współrzędnych obrazu), więc może zastąpić model w DetectionWorker albo posłużyć YOLOModel
+    jako wstępny filtr obszaru z otolitami (roi_detector). Obraz jest zmniejszany do work_size,
+    a filtrowanie składowych po polu, proporcjach i wypełnieniu odbywa się wektorowo na tablicy
+    statystyk z connectedComponentsWithStats. Pewność to stopień wypełnienia prostokąta składową.
+    """
+
+    def __init__(self, work_size: int = 1024, block_fraction: float = 0.08, offset: float = 12.0,
+                 min_area: float = 0.00005, max_area: float = 0.05, max_aspect: float = 4.0,
+                 min_fill: float = 0.35, padding: float = 0.08, bright_objects: Optional[bool] = None,
+                 cache=None):
+        self.work_size = work_size
+        self.block_fraction = block_fraction  # Okno progowania jako ułamek dłuższego boku
+        self.offset = offset  # O ile piksel musi być jaśniejszy od średniej otoczenia
+        self.min_area = min_area  # Pole składowej jako ułamek pola obrazu
+        self.max_area = max_area
+        self.max_aspect = max_aspect
+        self.min_fill = min_fill
+        self.padding = padding  # Margines boxa jako ułamek jego rozmiaru
+        self.bright_objects = bright_objects  # None - wykrywane z jasności tła
+        self.cache = cache
+        self.model_path = "classical"  # Nazwa w kluczu DetectionCache
+
+    def inference_params(self):
+        """Parametry wpływające na wynik detekcji (klucz DetectionCache)"""
+        return {'work_size': self.work_size, 'block_fraction': self.block_fraction, 'offset': self.offset,
+                'min_area': self.min_area, 'max_area': self.max_area, 'max_aspect': self.max_aspect,
+                'min_fill': self.min_fill, 'padding': self.padding, 'bright_objects': self.bright_objects}
+
+    def _prepare(self, image: np.ndarray) -> Tuple[np.ndarray, float]:
+        """Zmniejszony obraz w skali szarości z obiektami jaśniejszymi od tła"""
+        h, w = image.shape[:2]
+        scale = min(1.0, self.work_size / max(h, w))
+        if scale < 1.0:
+            # INTER_LINEAR zamiast INTER_AREA: kilka ms zamiast ~150 ms dla 24 Mpx,
+            # a aliasing tłumi rozmycie Gaussa przed progowaniem
+            image = cv2.resize(image, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_LINEAR)
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        bright = self.bright_objects
+        if bright is None:
+            # Otolity zajmują niewielką część tabliczki - mediana to jasność tła
+            bright = np.median(gray[::4, ::4]) < 128
+        return (gray if bright else 255 - gray), scale
+
+    def _components(self, gray: np.ndarray) -> np.ndarray:
+        """Statystyki składowych (N, 5) [x, y, w, h, pole] po progowaniu i morfologii"""
+        block = max(3, int(max(gray.shape) * self.block_fraction) | 1)
+        mask = cv2.adaptiveThreshold(cv2.GaussianBlur(gray, (5, 5), 0), 255, cv2.ADAPTIVE_THRESH_MEAN_C,
+                                     cv2.THRESH_BINARY, block, -self.offset)
+        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, iterations=2)
+        _, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        return stats[1:]  # Bez tła
+
+    def detect_objects(self, image: np.ndarray) -> np.ndarray:
+        """Zwraca tablicę (N, 5) z boxami [x1, y1, x2, y2, conf] we współrzędnych obrazu"""
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(image, self.model_path, self.inference_params())
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        gray, scale = self._prepare(image)
+        stats = self._components(gray).astype(np.float32)
+        x, y, w, h, area = stats.T
+        image_area = float(gray.shape[0] * gray.shape[1])
+        aspect = np.maximum(w, h) / np.maximum(np.minimum(w, h), 1)
+        fill = area / np.maximum(w * h, 1)
+        keep = ((area >= self.min_area * image_area) & (area <= self.max_area * image_area) &
+                (aspect <= self.max_aspect) & (fill >= self.min_fill))
+
+        x, y, w, h, fill = x[keep], y[keep], w[keep], h[keep], fill[keep]
+        pad_x, pad_y = w * self.padding, h * self.padding
+        full_h, full_w = image.shape[:2]
+        detections = np.stack([
+            np.clip((x - pad_x) / scale, 0, full_w),
+            np.clip((y - pad_y) / scale, 0, full_h),
+            np.clip((x + w + pad_x) / scale, 0, full_w),
+            np.clip((y + h + pad_y) / scale, 0, full_h),
+            np.minimum(fill / (np.pi / 4), 1.0),  # Elipsa wypełnia pi/4 prostokąta
+        ], axis=1).astype(np.float32).reshape(-1, 5)
+
+        if key is not None:
+            self.cache.put(key, detections)
+        return detections
+
+    def region_of_interest(self, image: np.ndarray, margin: float = 0.05) -> Optional[Tuple[int, int, int, int]]:
+        """Prostokąt (x1, y1, x2, y2) obejmujący wszystkie kandydujące otolity z marginesem; None - brak"""
+        detections = self.detect_objects(image)
+        if len(detections) == 0:
+            return None
+        h, w = image.shape[:2]
+        x1, y1 = detections[:, 0].min(), detections[:, 1].min()
+        x2, y2 = detections[:, 2].max(), detections[:, 3].max()
+        mx, my = (x2 - x1) * margin, (y2 - y1) * margin
+        return (int(max(0, x1 - mx)), int(max(0, y1 - my)), int(min(w, x2 + mx)), int(min(h, y2 + my)))
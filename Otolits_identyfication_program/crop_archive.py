@@ -0,0 +1,217 @@
+import io
+import os
+import glob
+import time
+import sqlite3
+import tarfile
+import threading
+import cv2
+import numpy as np
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from image_cropper import CropResult
+
+INDEX_FILENAME = "index.sqlite"
+
+
+@dataclass
+class CropRecord:
+    key: str
+    plate: str
+    row_index: int
+    box_index: int
+    original_coords: Tuple[int, int, int, int]
+    shard: str
+    offset: int
+    size: int
+
+
+def _open_index(archive_dir: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(os.path.join(archive_dir, INDEX_FILENAME), timeout=30, check_same_thread=False)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS crops (
+            key TEXT PRIMARY KEY,
+            plate TEXT NOT NULL,
+            row_index INTEGER NOT NULL,
+            box_index INTEGER NOT NULL,
+            x1 INTEGER, y1 INTEGER, x2 INTEGER, y2 INTEGER,
+            shard TEXT NOT NULL,
+            offset INTEGER NOT NULL,
+            size INTEGER NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_crops_plate ON crops(plate, row_index, box_index)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_crops_location ON crops(shard, offset)")
+    conn.commit()
+    return conn
+
+
+def _record_from_row(row) -> CropRecord:
+    key, plate, row_index, box_index, x1, y1, x2, y2, shard, offset, size = row
+    return CropRecord(key, plate, row_index, box_index, (x1, y1, x2, y2), shard, offset, size)
+
+
+class CropArchiveWriter:
+    """Zapis wycinków do archiwów tar dzielonych na shardy (w stylu WebDataset).
+
+    Zamiast tysięcy małych plików powstaje kilka dużych shardów oraz indeks SQLite
+    (tabliczka, wiersz, box, współrzędne, shard, offset). Archiwum jest tylko dopisywane -
+    ponowny zapis tego samego klucza wskazuje w indeksie na nową kopię danych.
+    Obiekt spełnia interfejs "sink" używany przez ImageCropper.
+    """
+
+    def __init__(self, archive_dir: str, shard_size: int = 256 * 1024 * 1024,
+                 shard_prefix: str = "crops", commit_every: int = 256):
+        self.archive_dir = archive_dir
+        self.shard_size = shard_size
+        self.shard_prefix = shard_prefix
+        self.commit_every = commit_every
+        os.makedirs(archive_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = _open_index(archive_dir)
+        self._uncommitted = 0
+
+        shards = sorted(glob.glob(os.path.join(archive_dir, f"{shard_prefix}-*.tar")))
+        self._shard_number = len(shards) - 1 if shards else 0
+        self._tar = None
+        self._open_shard()
+
+    def _shard_name(self, number: int) -> str:
+        return f"{self.shard_prefix}-{number:06d}.tar"
+
+    def _open_shard(self) -> None:
+        path = os.path.join(self.archive_dir, self._shard_name(self._shard_number))
+        self._tar = tarfile.open(path, "a" if os.path.exists(path) else "w")
+
+    def _rollover_if_needed(self) -> None:
+        if self._tar.fileobj.tell() >= self.shard_size:
+            self._tar.close()
+            self._shard_number += 1
+            self._open_shard()
+
+    def write(self, plate: Optional[str], crop: 'CropResult', data) -> str:
+        """Dopisuje zakodowany wycinek do bieżącego sharda; zwraca klucz w archiwum"""
+        key = self._key(plate, crop.filename)
+        extension = os.path.splitext(crop.filename)[1]
+        payload = bytes(data)
+
+        info = tarfile.TarInfo(name=f"{key}{extension}")
+        info.size = len(payload)
+        info.mtime = int(time.time())
+
+        with self._lock:
+            self._rollover_if_needed()
+            self._tar.addfile(info, io.BytesIO(payload))
+            # Dane pliku kończą się (z dopełnieniem do bloku) na bieżącej pozycji archiwum
+            padded_size = -(-info.size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+            offset_data = self._tar.offset - padded_size
+            self._conn.execute(
+                "INSERT OR REPLACE INTO crops VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, plate or 'plate', crop.row_index, crop.box_index, *crop.original_coords,
+                 self._shard_name(self._shard_number), offset_data, info.size)
+            )
+            self._uncommitted += 1
+            if self._uncommitted >= self.commit_every:
+                self._flush_locked()
+        return key
+
+    def _key(self, plate: Optional[str], filename: str) -> str:
+        return f"{plate or 'plate'}/{os.path.splitext(filename)[0]}"
+
+    def location(self, plate: Optional[str], filename: str) -> str:
+        return self._key(plate, filename)
+
+    def exists(self, plate: Optional[str], filename: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM crops WHERE key = ?", (self._key(plate, filename),)).fetchone()
+        return row is not None
+
+    def remove(self, plate: Optional[str], filename: str) -> None:
+        """Usuwa wpis z indeksu (dane w shardzie zostają, archiwum jest tylko dopisywane)"""
+        with self._lock:
+            self._conn.execute("DELETE FROM crops WHERE key = ?", (self._key(plate, filename),))
+
+    def manifest_path(self, plate: Optional[str]) -> str:
+        return os.path.join(self.archive_dir, "manifests", f"{plate or 'plate'}.json")
+
+    def _flush_locked(self) -> None:
+        self._tar.fileobj.flush()
+        self._conn.commit()
+        self._uncommitted = 0
+
+    def flush(self) -> None:
+        """Utrwala dopisane dane i indeks (wywoływane po każdej tabliczce)"""
+        with self._lock:
+            self._flush_locked()
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_locked()
+            self._tar.close()
+            self._conn.close()
+
+
+class CropArchive:
+    """Odczyt archiwum wycinków: dostęp swobodny po kluczu i szybka iteracja sekwencyjna"""
+
+    def __init__(self, archive_dir: str):
+        self.archive_dir = archive_dir
+        self._conn = _open_index(archive_dir)
+        self._files: Dict[str, io.BufferedReader] = {}
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM crops").fetchone()[0]
+
+    def keys(self) -> List[str]:
+        return [row[0] for row in self._conn.execute("SELECT key FROM crops ORDER BY key")]
+
+    def record(self, key: str) -> Optional[CropRecord]:
+        row = self._conn.execute("SELECT * FROM crops WHERE key = ?", (key,)).fetchone()
+        return _record_from_row(row) if row else None
+
+    def records(self, plate: Optional[str] = None) -> List[CropRecord]:
+        """Rekordy indeksu w kolejności fizycznej (shard, offset), opcjonalnie dla jednej tabliczki"""
+        if plate is None:
+            rows = self._conn.execute("SELECT * FROM crops ORDER BY shard, offset")
+        else:
+            rows = self._conn.execute("SELECT * FROM crops WHERE plate = ? ORDER BY shard, offset", (plate,))
+        return [_record_from_row(row) for row in rows]
+
+    def _shard_file(self, shard: str):
+        if shard not in self._files:
+            self._files[shard] = open(os.path.join(self.archive_dir, shard), "rb")
+        return self._files[shard]
+
+    def read_bytes(self, key: str) -> bytes:
+        record = self.record(key)
+        if record is None:
+            raise KeyError(key)
+        f = self._shard_file(record.shard)
+        f.seek(record.offset)
+        return f.read(record.size)
+
+    def get(self, key: str) -> np.ndarray:
+        """Zwraca zdekodowany wycinek o danym kluczu"""
+        data = np.frombuffer(self.read_bytes(key), dtype=np.uint8)
+        return cv2.imdecode(data, cv2.IMREAD_UNCHANGED)
+
+    def iter_bytes(self, plate: Optional[str] = None) -> Iterator[Tuple[CropRecord, bytes]]:
+        """Iteruje po wycinkach w kolejności zapisu - każdy shard czytany jest sekwencyjnie"""
+        for record in self.records(plate):
+            f = self._shard_file(record.shard)
+            if f.tell() != record.offset:
+                f.seek(record.offset)
+            yield record, f.read(record.size)
+
+    def __iter__(self) -> Iterator[Tuple[CropRecord, np.ndarray]]:
+        for record, data in self.iter_bytes():
+            yield record, cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+
+    def close(self) -> None:
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+        self._conn.close()
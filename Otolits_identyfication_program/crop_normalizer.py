@@ -0,0 +1,116 @@
+import os
+import csv
+import bisect
+import cv2
+import numpy as np
+from typing import List, Optional, Sequence, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from image_cropper import CropResult
+
+METADATA_FIELDS = ['index', 'plate', 'row_index', 'box_index', 'x1', 'y1', 'x2', 'y2', 'filename']
+
+
+class CropNormalizer:
+    """Etap po wycinaniu: letterbox do stałego rozmiaru, normalizacja i zapis do tablicy .npy.
+
+    Dla każdej tabliczki powstaje <plate>.npy o kształcie (N, size, size, 3) oraz
+    <plate>.csv z metadanymi w tej samej kolejności. Wycinki brane są prosto z pamięci,
+    więc odpada osobny przebieg dekodowania i skalowania zapisanych plików PNG.
+    """
+
+    def __init__(self, output_dir: str = "normalized_crops", size: int = 224, dtype: str = "uint8",
+                 mean: Sequence[float] = (0.0, 0.0, 0.0), std: Sequence[float] = (1.0, 1.0, 1.0),
+                 pad_value: int = 0):
+        if dtype not in ("uint8", "float16"):
+            raise ValueError(f"Nieobsługiwany typ danych: {dtype}")
+
+        self.output_dir = output_dir
+        self.size = size
+        self.dtype = dtype
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.std = np.asarray(std, dtype=np.float32)
+        self.pad_value = pad_value
+        os.makedirs(output_dir, exist_ok=True)
+
+    def letterbox(self, image: np.ndarray) -> np.ndarray:
+        """Skaluje z zachowaniem proporcji i dopełnia do kwadratu size x size"""
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        elif image.shape[2] == 4:
+            image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+
+        h, w = image.shape[:2]
+        scale = self.size / max(h, w)
+        new_w, new_h = max(1, round(w * scale)), max(1, round(h * scale))
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+        resized = cv2.resize(image, (new_w, new_h), interpolation=interpolation)
+
+        top = (self.size - new_h) // 2
+        left = (self.size - new_w) // 2
+        return cv2.copyMakeBorder(resized, top, self.size - new_h - top, left, self.size - new_w - left,
+                                  cv2.BORDER_CONSTANT, value=(self.pad_value,) * 3)
+
+    def _normalize_into(self, target: np.ndarray, image: np.ndarray) -> None:
+        boxed = self.letterbox(image)
+        if self.dtype == "uint8":
+            target[...] = boxed
+        else:
+            target[...] = (boxed.astype(np.float32) / 255.0 - self.mean) / self.std
+
+    def array_path(self, plate_name: Optional[str]) -> str:
+        return os.path.join(self.output_dir, f"{plate_name or 'plate'}.npy")
+
+    def write(self, plate_name: Optional[str], crops: List['CropResult']) -> str:
+        """Zapisuje znormalizowane wycinki tabliczki; zwraca ścieżkę do pliku .npy"""
+        plate = plate_name or "plate"
+        array_path = self.array_path(plate_name)
+        tmp_path = os.path.join(self.output_dir, f"{plate}.tmp.npy")
+
+        array = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=self.dtype,
+                                          shape=(len(crops), self.size, self.size, 3))
+        for i, crop in enumerate(crops):
+            self._normalize_into(array[i], crop.image)
+        array.flush()
+        del array
+        os.replace(tmp_path, array_path)
+
+        with open(os.path.join(self.output_dir, f"{plate}.csv"), "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(METADATA_FIELDS)
+            for i, crop in enumerate(crops):
+                writer.writerow([i, plate, crop.row_index, crop.box_index, *crop.original_coords, crop.filename])
+        return array_path
+
+
+class NormalizedCropDataset:
+    """Odczyt znormalizowanych wycinków wszystkich tabliczek przez mmap (bez kopiowania do RAM)"""
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.arrays = []
+        self.metadata = []
+        self._offsets = [0]
+
+        for filename in sorted(os.listdir(output_dir)):
+            if not filename.endswith(".npy") or filename.endswith(".tmp.npy"):
+                continue
+            plate = filename[:-len(".npy")]
+            array = np.load(os.path.join(output_dir, filename), mmap_mode="r")
+            with open(os.path.join(output_dir, f"{plate}.csv"), newline="", encoding="utf-8") as f:
+                rows = list(csv.DictReader(f))
+            if len(rows) != len(array):
+                raise ValueError(f"Metadane nie zgadzają się z tablicą: {filename}")
+
+            self.arrays.append(array)
+            self.metadata.extend(rows)
+            self._offsets.append(self._offsets[-1] + len(array))
+
+    def __len__(self) -> int:
+        return self._offsets[-1]
+
+    def __getitem__(self, index: int) -> Tuple[np.ndarray, dict]:
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        array_idx = bisect.bisect_right(self._offsets, index) - 1
+        return self.arrays[array_idx][index - self._offsets[array_idx]], self.metadata[index]
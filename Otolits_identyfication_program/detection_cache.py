@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+import numpy as np
+from typing import Optional
+from image_hash import image_hash
+
+
+class DetectionCache:
+    """Trwały cache wyników detekcji zapisany w jednym pliku SQLite.
+
+    Kluczem jest skrót zawartości obrazu, skrót wag modelu oraz parametry inferencji.
+    Boxy przechowywane są jako surowe bajty tablicy float32 o kształcie (N, 5).
+    """
+
+    def __init__(self, db_path: str = "detection_cache.sqlite", max_bytes: int = 256 * 1024 * 1024):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._weights_hashes = {}
+        self._last_stamp = 0.0
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS detections (
+                key TEXT PRIMARY KEY,
+                boxes BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_detections_access ON detections(last_access)")
+        self._conn.commit()
+
+    image_hash = staticmethod(image_hash)  # Wspólny z ImageCropper (moduł image_hash)
+
+    def weights_hash(self, weights_path: str) -> str:
+        """Zwraca skrót pliku wag (zapamiętany dla ścieżki i mtime)"""
+        if not os.path.exists(weights_path):
+            # Wagi pobierane przez ultralytics po nazwie (np. 'yolo11l.pt')
+            return f"name:{weights_path}"
+
+        stat = os.stat(weights_path)
+        memo_key = (os.path.abspath(weights_path), stat.st_mtime_ns, stat.st_size)
+        if memo_key not in self._weights_hashes:
+            digest = hashlib.blake2b(digest_size=20)
+            with open(weights_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            self._weights_hashes[memo_key] = digest.hexdigest()
+        return self._weights_hashes[memo_key]
+
+    def make_key(self, image: np.ndarray, weights_path: str, params: dict) -> str:
+        """Buduje klucz cache z obrazu, wag modelu i parametrów inferencji"""
+        params_text = json.dumps(params, sort_keys=True)
+        raw = f"{self.image_hash(image)}|{self.weights_hash(weights_path)}|{params_text}"
+        return hashlib.blake2b(raw.encode(), digest_size=20).hexdigest()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Zwraca zapisane boxy (N, 5) lub None, jeśli brak wpisu"""
+        with self._lock:
+            row = self._conn.execute("SELECT boxes FROM detections WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._conn.execute("UPDATE detections SET last_access = ? WHERE key = ?", (self._stamp(), key))
+            self._conn.commit()
+
+        return np.frombuffer(row[0], dtype=np.float32).reshape(-1, 5).copy()
+
+    def put(self, key: str, boxes: np.ndarray) -> None:
+        """Zapisuje boxy w cache i w razie potrzeby usuwa najdawniej używane wpisy"""
+        data = np.ascontiguousarray(boxes, dtype=np.float32).reshape(-1, 5).tobytes()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO detections (key, boxes, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, data, len(data), self._stamp())
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _stamp(self) -> float:
+        """Znacznik czasu dostępu, ściśle rosnący w obrębie procesu"""
+        self._last_stamp = max(time.time(), self._last_stamp + 1e-6)
+        return self._last_stamp
+
+    def _evict(self) -> None:
+        """Usuwa najdawniej używane wpisy, dopóki cache przekracza max_bytes"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM detections").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute("SELECT key, size FROM detections ORDER BY last_access").fetchall()
+        to_delete = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            to_delete.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM detections WHERE key = ?", to_delete)
+
+    @property
+    def hit_rate(self) -> float:
+        """Odsetek zapytań obsłużonych z cache"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        """Zwraca statystyki cache"""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM detections").fetchone()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate,
+            'entries': entries,
+            'bytes': size
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,73 @@
+import os
+import cv2
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Optional
+
+
+class DetectionWorker:
+    """Wykonuje detekcję w tle, aby pętla OpenCV nigdy nie czekała na inferencję.
+
+    Jeden wątek roboczy - model nie jest współdzielony między wątkami. Zadania dla
+    pominiętych zdjęć są anulowane, a kolejne zdjęcia z katalogu wykrywane z wyprzedzeniem.
+    """
+
+    def __init__(self, yolo_model, image_loader, prefetch_count: int = 2):
+        self.yolo_model = yolo_model
+        self.image_loader = image_loader
+        self.prefetch_count = prefetch_count
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="detekcja")
+        self._futures: Dict[int, Future] = {}
+
+    def request(self, index: int, image: Optional[np.ndarray] = None) -> Future:
+        """Zleca detekcję dla zdjęcia o danym indeksie (jeśli nie jest już zlecona)"""
+        future = self._futures.get(index)
+        if future is None or future.cancelled():
+            future = self._executor.submit(self._detect, index, image)
+            self._futures[index] = future
+        return future
+
+    def prefetch(self, current_index: int) -> None:
+        """Zleca detekcję kolejnych zdjęć, podczas gdy bieżące jest opisywane"""
+        last_index = min(current_index + self.prefetch_count, len(self.image_loader.image_files) - 1)
+        for index in range(current_index + 1, last_index + 1):
+            self.request(index)
+
+    def cancel_stale(self, current_index: int) -> None:
+        """Anuluje zadania dla zdjęć pominiętych przez operatora"""
+        keep = range(current_index, current_index + self.prefetch_count + 1)
+        for index in list(self._futures):
+            if index not in keep:
+                # Zadanie już uruchomione dokończy się, ale jego wynik zostanie odrzucony
+                self._futures.pop(index).cancel()
+
+    def poll(self, index: int) -> Optional[np.ndarray]:
+        """Zwraca wynik detekcji (N, 5), jeśli jest gotowy; w przeciwnym razie None"""
+        future = self._futures.get(index)
+        if future is None or not future.done():
+            return None
+
+        del self._futures[index]
+        if future.cancelled():
+            return None
+        return future.result()
+
+    def is_pending(self, index: int) -> bool:
+        return index in self._futures
+
+    def queued_count(self) -> int:
+        """Liczba zadań oczekujących lub w toku"""
+        return sum(1 for future in self._futures.values() if not future.done())
+
+    def _detect(self, index: int, image: Optional[np.ndarray]) -> np.ndarray:
+        if image is None:
+            image_path = os.path.join(self.image_loader.image_dir, self.image_loader.image_files[index])
+            image = cv2.imread(image_path)
+            if image is None:
+                raise ValueError(f"Nie udało się załadować obrazu: {image_path}")
+        return self.yolo_model.detect_objects(image)
+
+    def shutdown(self):
+        for future in self._futures.values():
+            future.cancel()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,240 @@
+from collections import deque
+from typing import Callable, List, Optional, Sequence, Tuple
+
+
+def row_state(row) -> tuple:
+    """Stan linii wiersza zapamiętywany przy edycji (bez kopiowania boxów - tylko referencje)"""
+    return row.slope, row.intercept, row.p1, row.p2, row.locked, tuple(row.boxes)
+
+
+def apply_row_state(row, state: tuple) -> None:
+    row.slope, row.intercept, row.p1, row.p2, row.locked, boxes = state
+    row.boxes[:] = boxes
+
+
+def line_state(row) -> tuple:
+    """Położenie linii wiersza bez listy boxów (przeciągnięcie końca lub dodanie linii nie zmienia boxów)"""
+    return row.slope, row.intercept, row.p1, row.p2, row.locked
+
+
+def apply_line_state(row, state: tuple) -> None:
+    row.slope, row.intercept, row.p1, row.p2, row.locked = state
+
+
+def _box_record(box) -> list:
+    return [box.id, box.x1, box.y1, box.x2, box.y2, box.label]
+
+
+class BoxesAdded:
+    """Dodanie boxów (ręcznie lub wynik detekcji)"""
+    __slots__ = ('boxes',)
+
+    def __init__(self, boxes: Sequence):
+        self.boxes = list(boxes)
+
+    def undo(self, target) -> None:
+        added = {id(box) for box in self.boxes}
+        target.bbox_manager.boxes[:] = [b for b in target.bbox_manager.boxes if id(b) not in added]
+
+    def redo(self, target) -> None:
+        target.bbox_manager.boxes.extend(self.boxes)
+
+    def records(self, forward: bool) -> Optional[List[dict]]:
+        if forward:
+            return [{'op': 'add', 'boxes': [_box_record(box) for box in self.boxes]}]
+        return [{'op': 'del', 'id': box.id} for box in self.boxes]
+
+
+class BoxRemoved:
+    """Usunięcie boxa - zapamiętuje jego pozycję na liście boxów i w wierszu (jeśli do niego należał)"""
+    __slots__ = ('box', 'index', 'row', 'row_index')
+
+    def __init__(self, box, index: int, row=None, row_index: Optional[int] = None):
+        self.box = box
+        self.index = index
+        self.row = row
+        self.row_index = row_index
+
+    @classmethod
+    def capture(cls, target, box) -> 'BoxRemoved':
+        """Zmiana dla boxa, który ma zostać usunięty (wywoływane przed redo())"""
+        index = next(i for i, b in enumerate(target.bbox_manager.boxes) if b is box)
+        row, row_index = target.row_detector.rows.find_box(box) or (None, None)
+        return cls(box, index, row, row_index)
+
+    def undo(self, target) -> None:
+        target.bbox_manager.boxes.insert(self.index, self.box)
+        if self.row is not None:
+            self.row.boxes.insert(self.row_index, self.box)
+            target.row_detector.rows.update_row(self.row)
+
+    def redo(self, target) -> None:
+        target.bbox_manager.boxes.remove(self.box)
+        if self.row is not None:
+            self.row.boxes[:] = [b for b in self.row.boxes if b is not self.box]
+            target.row_detector.rows.update_row(self.row)
+
+    def records(self, forward: bool) -> Optional[List[dict]]:
+        if forward:
+            return [{'op': 'del', 'id': self.box.id}]
+        record = {'op': 'add', 'boxes': [_box_record(self.box)], 'at': self.index}
+        if self.row is not None:
+            record.update(row=self.row.id, row_at=self.row_index)
+        return [record]
+
+
+class BoxChanged:
+    """Przesunięcie lub zmiana rozmiaru - tylko id boxa i stare/nowe współrzędne"""
+    __slots__ = ('box', 'old', 'new')
+
+    def __init__(self, box, old: Tuple[float, float, float, float], new: Tuple[float, float, float, float]):
+        self.box = box
+        self.old = old
+        self.new = new
+
+    def undo(self, target) -> None:
+        self.box.update(*self.old)
+        target.row_detector.rows.update_box(self.box)
+
+    def redo(self, target) -> None:
+        self.box.update(*self.new)
+        target.row_detector.rows.update_box(self.box)
+
+    def records(self, forward: bool) -> Optional[List[dict]]:
+        return [{'op': 'set', 'id': self.box.id, 'c': list(self.new if forward else self.old)}]
+
+
+class RowEdited:
+    """Przeciągnięcie linii lub jej końca albo dodanie nowej linii - tylko id wiersza i stary/nowy stan linii.
+
+    Stan None oznacza, że wiersza nie było (dodana linia).
+    """
+    __slots__ = ('row', 'old', 'new')
+
+    def __init__(self, row, old: Optional[tuple], new: Optional[tuple]):
+        self.row = row
+        self.old = old
+        self.new = new
+
+    def changed(self) -> bool:
+        return self.old != self.new
+
+    def _apply(self, target, state: Optional[tuple]) -> None:
+        rows = target.row_detector.rows
+        if state is None:
+            rows.remove_row(self.row)
+            return
+        apply_line_state(self.row, state)
+        if self.row in rows:
+            rows.update_row(self.row)
+        else:
+            rows.add_row(self.row)
+
+    def undo(self, target) -> None:
+        self._apply(target, self.old)
+
+    def redo(self, target) -> None:
+        self._apply(target, self.new)
+
+    def records(self, forward: bool) -> Optional[List[dict]]:
+        state = self.new if forward else self.old
+        if state is None:
+            return [{'op': 'row_del', 'id': self.row.id}]
+        slope, intercept, p1, p2, locked = state
+        return [{'op': 'row', 'id': self.row.id, 'line': [slope, intercept, p1, p2, locked],
+                 'color': list(self.row.color)}]
+
+
+class RowsChanged:
+    """Ponowne wykrycie wierszy - zmienia przynależność boxów w wielu wierszach naraz.
+
+    Pamięta listę wierszy i ich stan przed i po edycji. Nie ma zwartego zapisu przyrostowego -
+    zmiana wymusza pełny zapis sesji.
+    """
+    __slots__ = ('before', 'after')
+
+    def __init__(self, before: List[tuple], after: List[tuple]):
+        self.before = before
+        self.after = after
+
+    @staticmethod
+    def capture(rows) -> List[tuple]:
+        return [(row, row_state(row)) for row in rows]
+
+    def changed(self) -> bool:
+        # RowLine to dataclass (porównanie po wartościach) - listy wierszy porównywane po tożsamości
+        if [id(row) for row, _ in self.before] != [id(row) for row, _ in self.after]:
+            return True
+        for (_, old), (_, new) in zip(self.before, self.after):
+            old_boxes, new_boxes = old[5], new[5]
+            if old[:5] != new[:5] or [id(b) for b in old_boxes] != [id(b) for b in new_boxes]:
+                return True
+        return False
+
+    @staticmethod
+    def _apply(target, states: List[tuple]) -> None:
+        for row, state in states:
+            apply_row_state(row, state)
+        # Przypisanie (a nie modyfikacja w miejscu) - RowManager ustala kolejność od nowa
+        target.row_detector.rows = [row for row, _ in states]
+
+    def undo(self, target) -> None:
+        self._apply(target, self.before)
+
+    def redo(self, target) -> None:
+        self._apply(target, self.after)
+
+    def records(self, forward: bool) -> Optional[List[dict]]:
+        return None
+
+
+class EditJournal:
+    """Historia edycji z cofaniem i ponawianiem w O(1).
+
+    Zapisywane są tylko zmiany (id i współrzędne), a historia ograniczona jest do max_entries -
+    najstarsze wpisy wypadają z kolejki. on_change otrzymuje rekordy zmiany (lub None, gdy
+    zmiana wymaga pełnego zapisu) i zasila autozapis sesji.
+    """
+
+    def __init__(self, max_entries: int = 500, on_change: Optional[Callable[[Optional[List[dict]]], None]] = None):
+        self._undo = deque(maxlen=max_entries)
+        self._redo = deque(maxlen=max_entries)
+        self.on_change = on_change
+
+    def record(self, delta) -> None:
+        """Zapisuje wykonaną już zmianę"""
+        self._undo.append(delta)
+        self._redo.clear()
+        self._notify(delta.records(True))
+
+    def undo(self, target) -> bool:
+        if not self._undo:
+            return False
+        delta = self._undo.pop()
+        delta.undo(target)
+        self._redo.append(delta)
+        self._notify(delta.records(False))
+        return True
+
+    def redo(self, target) -> bool:
+        if not self._redo:
+            return False
+        delta = self._redo.pop()
+        delta.redo(target)
+        self._undo.append(delta)
+        self._notify(delta.records(True))
+        return True
+
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def clear(self) -> None:
+        self._undo.clear()
+        self._redo.clear()
+
+    def _notify(self, records: Optional[List[dict]]) -> None:
+        if self.on_change is not None:
+            self.on_change(records)
@@ -0,0 +1,129 @@
+import os
+import cv2
+import numpy as np
+from typing import Optional
+
+
+class Filmstrip:
+    """Siatka miniatur tabliczek w osobnym oknie (klawisz g) do skakania między zdjęciami.
+
+    Miniatury zlecane są tylko dla widocznej strony i następnej; kółko myszy oraz klawisze
+    ',' i '.' przewijają wiersze, kliknięcie wybiera zdjęcie, a najechanie na miniaturę
+    zleca dekodowanie zdjęcia w tle (ImageLoader.prefetch), więc skok jest natychmiastowy.
+    """
+
+    def __init__(self, image_loader, thumbnail_cache, window_name: str = "Tabliczki",
+                 columns: int = 6, visible_rows: int = 4, padding: int = 8):
+        self.image_loader = image_loader
+        self.thumbnail_cache = thumbnail_cache
+        self.window_name = window_name
+        self.columns = columns
+        self.visible_rows = visible_rows
+        self.padding = padding
+        self.is_open = False
+        self.first_row = 0
+        self.selected: Optional[int] = None  # Indeks wybrany kliknięciem, odbierany przez take_selection()
+        self._hover: Optional[int] = None
+        self._missing = set()  # Widoczne indeksy czekające na miniaturę
+
+    @property
+    def cell(self) -> int:
+        return self.thumbnail_cache.size + 2 * self.padding
+
+    def open(self) -> None:
+        # Widok zaczyna się od wiersza z bieżącym zdjęciem
+        self.first_row = max(0, self.image_loader.current_index // self.columns - 1)
+        cv2.namedWindow(self.window_name, cv2.WINDOW_AUTOSIZE)
+        cv2.setMouseCallback(self.window_name, self._handle_mouse_event)
+        self.is_open = True
+        self.render()
+
+    def close(self) -> None:
+        if self.is_open:
+            cv2.destroyWindow(self.window_name)
+        self.is_open = False
+        self.thumbnail_cache.cancel_except([])
+
+    def toggle(self) -> None:
+        if self.is_open:
+            self.close()
+        else:
+            self.open()
+
+    def scroll(self, rows: int) -> None:
+        total_rows = (len(self.image_loader.image_files) + self.columns - 1) // self.columns
+        self.first_row = int(np.clip(self.first_row + rows, 0, max(0, total_rows - self.visible_rows)))
+        self.render()
+
+    def take_selection(self) -> Optional[int]:
+        selected, self.selected = self.selected, None
+        return selected
+
+    def poll(self) -> None:
+        """Wywoływane w pętli głównej - dorysowuje miniatury, które właśnie się przygotowały"""
+        if not self.is_open:
+            return
+        if cv2.getWindowProperty(self.window_name, cv2.WND_PROP_VISIBLE) < 1:
+            self.is_open = False
+            return
+        if any(self.thumbnail_cache.get(self._path(i)) is not None for i in list(self._missing)):
+            self.render()
+
+    def render(self) -> None:
+        files = self.image_loader.image_files
+        first = self.first_row * self.columns
+        visible = range(first, min(len(files), first + self.columns * self.visible_rows))
+        # Zlecenie widocznej strony i następnej (płynne przewijanie); pozostałe zadania są anulowane
+        ahead = range(first, min(len(files), first + 2 * self.columns * self.visible_rows))
+        paths = [self._path(i) for i in ahead]
+        self.thumbnail_cache.cancel_except(paths)
+        self.thumbnail_cache.request(paths)
+
+        cell = self.cell
+        canvas = np.full((cell * self.visible_rows, cell * self.columns, 3), 40, dtype=np.uint8)
+        self._missing = set()
+        for index in visible:
+            row, col = divmod(index - first, self.columns)
+            x, y = col * cell, row * cell
+            thumbnail = self.thumbnail_cache.get(self._path(index))
+            if thumbnail is None:
+                self._missing.add(index)
+                cv2.rectangle(canvas, (x + self.padding, y + self.padding),
+                              (x + cell - self.padding, y + cell - self.padding), (70, 70, 70), 1)
+            else:
+                h, w = thumbnail.shape[:2]
+                ox, oy = x + (cell - w) // 2, y + (cell - h) // 2
+                canvas[oy:oy + h, ox:ox + w] = thumbnail
+
+            if index == self.image_loader.current_index:
+                cv2.rectangle(canvas, (x + 2, y + 2), (x + cell - 3, y + cell - 3), (0, 255, 0), 2)
+            elif index == self._hover:
+                cv2.rectangle(canvas, (x + 2, y + 2), (x + cell - 3, y + cell - 3), (255, 200, 0), 1)
+            label = os.path.splitext(files[index])[0][-22:]
+            cv2.putText(canvas, label, (x + 4, y + cell - 4), cv2.FONT_HERSHEY_SIMPLEX, 0.35,
+                        (255, 255, 255), 1, cv2.LINE_AA)
+
+        cv2.imshow(self.window_name, canvas)
+
+    def _path(self, index: int) -> str:
+        return os.path.join(self.image_loader.image_dir, self.image_loader.image_files[index])
+
+    def _index_at(self, x: int, y: int) -> Optional[int]:
+        col, row = x // self.cell, y // self.cell
+        if not (0 <= col < self.columns and 0 <= row < self.visible_rows):
+            return None
+        index = (self.first_row + row) * self.columns + col
+        return index if index < len(self.image_loader.image_files) else None
+
+    def _handle_mouse_event(self, event, x, y, flags, param):
+        if event == cv2.EVENT_MOUSEWHEEL:
+            self.scroll(-1 if flags > 0 else 1)
+        elif event == cv2.EVENT_LBUTTONDOWN:
+            self.selected = self._index_at(x, y)
+        elif event == cv2.EVENT_MOUSEMOVE:
+            index = self._index_at(x, y)
+            if index != self._hover:
+                self._hover = index
+                if index is not None:
+                    self.image_loader.prefetch(index)
+                self.render()
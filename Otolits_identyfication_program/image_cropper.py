@@ -1,14 +1,22 @@
 import os
+import json
 import cv2
 import numpy as np
-from typing import List, Tuple, Optional, TYPE_CHECKING
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed
+from typing import Callable, Iterator, List, Tuple, Optional, TYPE_CHECKING
 from dataclasses import dataclass
+from row_manager import RowManager, row_sort_key, box_sort_key
+from image_hash import image_hash
 
 if TYPE_CHECKING:
     from image_loader import ImageLoader
     from row_detector import RowLine
     from bounding_box_manager import BoundingBox
 
+# Rozszerzenia plików dla obsługiwanych formatów zapisu
+IMAGE_FORMATS = {'png': '.png', 'jpeg': '.jpg', 'webp': '.webp'}
+
 @dataclass
 class CropResult:
     image: np.ndarray
@@ -16,65 +24,390 @@ class CropResult:
     row_index: int
     original_coords: Tuple[int, int, int, int]
     filename: str
+    skipped: bool = False  # True - wycinek aktualny wg manifestu, nie był ponownie kodowany
+
+MANIFEST_FILENAME = "manifest.json"
+
+class DirectorySink:
+    """Zapis każdego wycinka jako osobny plik, w podkatalogu tabliczki"""
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+
+    def path_for(self, plate: Optional[str], filename: str) -> str:
+        if plate:
+            return os.path.join(self.output_dir, plate, filename)
+        return os.path.join(self.output_dir, filename)
+
+    def write(self, plate: Optional[str], crop: CropResult, data) -> str:
+        filepath = self.path_for(plate, crop.filename)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, "wb") as f:
+            f.write(data)
+        return filepath
+
+    def location(self, plate: Optional[str], filename: str) -> str:
+        return self.path_for(plate, filename)
+
+    def exists(self, plate: Optional[str], filename: str) -> bool:
+        return os.path.exists(self.path_for(plate, filename))
+
+    def remove(self, plate: Optional[str], filename: str) -> None:
+        try:
+            os.remove(self.path_for(plate, filename))
+        except FileNotFoundError:
+            pass
+
+    def manifest_path(self, plate: Optional[str]) -> str:
+        return self.path_for(plate, MANIFEST_FILENAME)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
 
 class ImageCropper:
-    def __init__(self, output_dir: str = "output_crops", image_loader: 'ImageLoader' = None):
+    def __init__(self, output_dir: str = "output_crops", image_loader: 'ImageLoader' = None,
+                 image_format: str = "png", png_compression: int = 3, jpeg_quality: int = 95,
+                 webp_quality: int = 90, max_workers: Optional[int] = None, sink=None,
+                 incremental: bool = True, deskew: bool = False, normalizer=None, project_store=None):
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Nieobsługiwany format zapisu: {image_format}")
+
         self.output_dir = output_dir
         self.image_loader = image_loader
+        # Sink przyjmuje zakodowane wycinki: DirectorySink (pliki) lub CropArchiveWriter (shardy tar)
+        self.sink = sink if sink is not None else DirectorySink(output_dir)
+        self.image_format = image_format
+        self.png_compression = png_compression
+        self.jpeg_quality = jpeg_quality
+        self.webp_quality = webp_quality
+        # Manifest tabliczki pozwala pominąć wycinki, których wejście się nie zmieniło
+        self.incremental = incremental
+        # Prostowanie wycinków wg nachylenia wiersza (RowLine.slope)
+        self.deskew = deskew
+        # Opcjonalny CropNormalizer - tablice gotowe do treningu zapisywane razem z wycinkami
+        self.normalizer = normalizer
+        # Opcjonalny ProjectStore - lista wycinków każdej tabliczki trafia do bazy projektu
+        self.project_store = project_store
         os.makedirs(output_dir, exist_ok=True)
 
-    def crop_and_save(self,
-                     original_image: np.ndarray,
-                     rows: List['RowLine'],
-                     boxes: List['BoundingBox']) -> List[CropResult]:
+        # OpenCV zwalnia GIL podczas kodowania, więc wątki kodują równolegle
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or min(8, os.cpu_count() or 1),
+                                            thread_name_prefix="zapis_wycinkow")
+        self._coordinator = ThreadPoolExecutor(max_workers=1, thread_name_prefix="wycinanie")
 
-        if original_image is None:
-            print("Brak obrazu do wycięcia")
-            return []
+    def _encode_params(self) -> List[int]:
+        """Parametry cv2.imwrite dla wybranego formatu"""
+        if self.image_format == "png":
+            return [cv2.IMWRITE_PNG_COMPRESSION, self.png_compression]
+        if self.image_format == "jpeg":
+            return [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]
+        return [cv2.IMWRITE_WEBP_QUALITY, self.webp_quality]
 
-        results = []
+    def _layout(self,
+                original_image: np.ndarray,
+                rows: List['RowLine']) -> List[Tuple[int, float, List[Tuple[int, Tuple[int, int, int, int]]]]]:
+        """Wyznacza kolejność wierszy i boxów oraz współrzędne w oryginale (bez wycinania).
 
-        # Sortowanie wierszy od góry do dołu
-        sorted_rows = sorted(rows,
-                             key=lambda row: row.intercept if abs(row.slope) < 0.01 else min(b.y1 for b in row.boxes))
+        Zwraca listę (indeks wiersza, nachylenie, [(indeks boxa, (x1, y1, x2, y2)), ...]).
+        """
+        layout = []
+        h, w = original_image.shape[:2]
 
-        for row_idx, row in enumerate(sorted_rows):
-            # Sortowanie boxów w wierszu od lewej do prawej
-            sorted_boxes = sorted(row.boxes, key=lambda b: (b.x1 + b.x2) / 2)
+        if isinstance(rows, RowManager):
+            # RowManager trzyma wiersze od góry do dołu i boxy od lewej do prawej - bez ponownego sortowania
+            ordered = [(row, row.boxes) for row in rows]
+        else:
+            # Zwykła lista wierszy (skrypty, testy) - sortowane są kopie, kolejność u wywołującego bez zmian
+            ordered = [(row, sorted(row.boxes, key=box_sort_key)) for row in sorted(rows, key=row_sort_key)]
 
-            for box_idx, box in enumerate(sorted_boxes):
+        for row_idx, (row, row_boxes) in enumerate(ordered):
+            row_coords = []
+            for box_idx, box in enumerate(row_boxes):
                 # Przelicz współrzędne boxa na oryginalną rozdzielczość
                 if self.image_loader:
                     x1, y1, x2, y2 = self.image_loader.scale_coords_to_original(box.x1, box.y1, box.x2, box.y2)
                 else:
-                    x1, y1, x2, y2 = box.x1, box.y1, box.x2, box.y2
+                    x1, y1, x2, y2 = int(box.x1), int(box.y1), int(box.x2), int(box.y2)
 
                 # Zabezpieczenie przed przekroczeniem wymiarów
-                h, w = original_image.shape[:2]
                 x1, x2 = sorted([max(0, min(w, x1)), max(0, min(w, x2))])
                 y1, y2 = sorted([max(0, min(h, y1)), max(0, min(h, y2))])
 
                 if x1 >= x2 or y1 >= y2:
                     continue
+                row_coords.append((box_idx, (x1, y1, x2, y2)))
+
+            layout.append((row_idx, row.slope, row_coords))
+
+        return layout
+
+    def _iter_layout_crops(self, original_image: np.ndarray, layout) -> Iterator[CropResult]:
+        """Leniwie wycina boxy wiersz po wierszu (widoki na oryginał lub na obrócony pas wiersza)"""
+        extension = IMAGE_FORMATS[self.image_format]
+
+        for row_idx, slope, row_coords in layout:
+            if self.deskew and row_coords and np.isfinite(slope) and abs(slope) > 1e-3:
+                images = self._deskew_row(original_image, [coords for _, coords in row_coords], slope)
+            else:
+                images = (original_image[y1:y2, x1:x2] for _, (x1, y1, x2, y2) in row_coords)
+
+            for (box_idx, coords), image in zip(row_coords, images):
+                yield CropResult(
+                    image=image,
+                    box_index=box_idx,
+                    row_index=row_idx,
+                    original_coords=coords,
+                    filename=f"row_{row_idx:02d}_box_{box_idx:02d}{extension}"
+                )
+
+    def iter_crops(self,
+                   original_image: np.ndarray,
+                   rows: List['RowLine'],
+                   plate_name: Optional[str] = None,
+                   write: bool = False,
+                   max_in_flight: int = 16) -> Iterator[CropResult]:
+        """Strumieniowe API: zwraca wycinki leniwie, w kolejności wierszy i boxów.
+
+        Nic nie jest trzymane w pamięci poza bieżącym wierszem, więc odbiorca (np. klasyfikator
+        w tym samym procesie) może przetwarzać ogromne tabliczki bez zapisu na dysk.
+        Przy write=True każdy wycinek jest dodatkowo kodowany i przekazywany do sinka w puli
+        wątków (co najwyżej max_in_flight naraz); manifest nie jest wtedy aktualizowany.
+        Wycinki są widokami tylko do odczytu - odbiorca, który chce je modyfikować, robi kopię.
+        """
+        if original_image is None:
+            print("Brak obrazu do wycięcia")
+            return
+
+        crops = self._iter_layout_crops(original_image, self._layout(original_image, rows))
+        if not write:
+            yield from crops
+            return
+
+        params = self._encode_params()
+        in_flight = deque()
+        try:
+            for crop in crops:
+                in_flight.append(self._executor.submit(self._write_crop, plate_name, crop, params))
+                if len(in_flight) >= max_in_flight:
+                    self._wait_for_write(in_flight.popleft())
+                yield crop
+        finally:
+            while in_flight:
+                self._wait_for_write(in_flight.popleft())
+            self.sink.flush()
+
+    def _wait_for_write(self, future: Future) -> None:
+        try:
+            if not future.result():
+                print("Nie udało się zapisać wycinka")
+        except Exception as e:
+            print(f"Błąd podczas wycinania boxu: {e}")
+
+    def _deskew_row(self,
+                    original_image: np.ndarray,
+                    coords: List[Tuple[int, int, int, int]],
+                    slope: float) -> List[np.ndarray]:
+        """Obraca pas wiersza raz (wg nachylenia linii) i wycina z niego wszystkie boxy.
+
+        Nachylenie jest takie samo w podglądzie i w oryginale (skalowanie jednorodne).
+        Boxy osiowe obejmują pochylone otolity, więc po obrocie wycinek jest zawężany
+        do prostokąta, którego obrys po pochyleniu daje pierwotny box.
+        """
+        h, w = original_image.shape[:2]
+        angle = np.arctan(slope)
+        cos_a, sin_a = abs(np.cos(angle)), abs(np.sin(angle))
+
+        # Pas wiersza z zapasem na obrót
+        bx1 = min(c[0] for c in coords)
+        bx2 = max(c[2] for c in coords)
+        margin = int(np.ceil((bx2 - bx1) * sin_a / 2)) + 1
+        by1 = max(0, min(c[1] for c in coords) - margin)
+        by2 = min(h, max(c[3] for c in coords) + margin)
+        band = original_image[by1:by2, bx1:bx2]
+        band_h, band_w = band.shape[:2]
 
-                try:
-                    cropped = original_image[y1:y2, x1:x2].copy()
-                    if cropped.size == 0:
-                        continue
-
-                    filename = f"row_{row_idx:02d}_box_{box_idx:02d}.png"
-                    filepath = os.path.join(self.output_dir, filename)
-                    cv2.imwrite(filepath, cropped)
-
-                    results.append(CropResult(
-                        image=cropped,
-                        box_index=box_idx,
-                        row_index=row_idx,
-                        original_coords=(x1, y1, x2, y2),
-                        filename=filename
-                    ))
-                except Exception as e:
-                    print(f"Błąd podczas wycinania boxu: {e}")
+        matrix = cv2.getRotationMatrix2D((band_w / 2, band_h / 2), np.degrees(angle), 1.0)
+        rotated = cv2.warpAffine(band, matrix, (band_w, band_h), flags=cv2.INTER_LINEAR,
+                                 borderMode=cv2.BORDER_REPLICATE)
 
+        denominator = cos_a ** 2 - sin_a ** 2
+        images = []
+        for x1, y1, x2, y2 in coords:
+            box_w, box_h = x2 - x1, y2 - y1
+            cx, cy = matrix @ np.array([(x1 + x2) / 2 - bx1, (y1 + y2) / 2 - by1, 1.0])
+
+            # Wymiary otolitu przed pochyleniem (odwrócenie obrysu obróconego prostokąta)
+            new_w = (box_w * cos_a - box_h * sin_a) / denominator if denominator > 0 else box_w
+            new_h = (box_h * cos_a - box_w * sin_a) / denominator if denominator > 0 else box_h
+            new_w = min(box_w, new_w) if new_w > box_w / 2 else box_w
+            new_h = min(box_h, new_h) if new_h > box_h / 2 else box_h
+
+            nx1 = int(max(0, round(cx - new_w / 2)))
+            ny1 = int(max(0, round(cy - new_h / 2)))
+            nx2 = int(min(band_w, round(cx + new_w / 2)))
+            ny2 = int(min(band_h, round(cy + new_h / 2)))
+            images.append(rotated[ny1:ny2, nx1:nx2])
+        return images
+
+    def _write_crop(self, plate_name: Optional[str], crop: CropResult, params: List[int]) -> bool:
+        ok, encoded = cv2.imencode(IMAGE_FORMATS[self.image_format], crop.image, params)
+        if not ok:
+            return False
+        self.sink.write(plate_name, crop, encoded)
+        return True
+
+    def _load_manifest(self, plate_name: Optional[str]) -> dict:
+        try:
+            with open(self.sink.manifest_path(plate_name), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_manifest(self, plate_name: Optional[str], manifest: dict) -> None:
+        """Zapis atomowy - przerwany zapis nie zostawia uszkodzonego manifestu"""
+        path = self.sink.manifest_path(plate_name)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp_path, path)
+
+    def _find_unchanged(self, planned: List[CropResult], plate_name: Optional[str],
+                        previous: dict, source_hash: str, settings: dict) -> set:
+        """Nazwy wycinków, które mają identyczne wejście jak w poprzednim manifeście"""
+        if previous.get('source_hash') != source_hash or previous.get('encode') != settings:
+            return set()
+
+        old_crops = previous.get('crops', {})
+        unchanged = set()
+        for crop in planned:
+            entry = old_crops.get(crop.filename)
+            if (entry and tuple(entry['coords']) == crop.original_coords and
+                    self.sink.exists(plate_name, crop.filename)):
+                unchanged.add(crop.filename)
+        return unchanged
+
+    def _write_crops(self,
+                     original_image: np.ndarray,
+                     layout,
+                     plate_name: Optional[str] = None,
+                     progress_callback: Optional[Callable[[int, int], None]] = None) -> List[CropResult]:
+        """Koduje i zapisuje wycinki w puli wątków; zwraca zapisane w kolejności wierszy"""
+        planned = list(self._iter_layout_crops(original_image, layout))
+        params = self._encode_params()
+        settings = {'format': self.image_format, 'params': params, 'deskew': self.deskew}
+
+        unchanged = set()
+        previous = {}
+        source_hash = None
+        if self.incremental:
+            previous = self._load_manifest(plate_name)
+            source_hash = image_hash(original_image)  # Ten sam klucz obrazu co w DetectionCache
+            unchanged = self._find_unchanged(planned, plate_name, previous, source_hash, settings)
+
+        for crop in planned:
+            crop.skipped = crop.filename in unchanged
+
+        futures = {self._executor.submit(self._write_crop, plate_name, crop, params): i
+                   for i, crop in enumerate(planned) if not crop.skipped}
+        written = [crop.skipped for crop in planned]
+
+        for done, future in enumerate(as_completed(futures), start=len(unchanged) + 1):
+            crop = planned[futures[future]]
+            try:
+                written[futures[future]] = future.result()
+                if not written[futures[future]]:
+                    print(f"Nie udało się zapisać: {crop.filename}")
+            except Exception as e:
+                print(f"Błąd podczas wycinania boxu: {e}")
+            if progress_callback:
+                progress_callback(done, len(planned))
+
+        results = [crop for crop, ok in zip(planned, written) if ok]
+
+        stale = set()
+        if self.incremental:
+            # Usuń wycinki z poprzedniego przebiegu, których już nie ma (np. usunięty box)
+            stale = set(previous.get('crops', {})) - {crop.filename for crop in planned}
+            for filename in stale:
+                self.sink.remove(plate_name, filename)
+
+            self._save_manifest(plate_name, {
+                'source_hash': source_hash,
+                'encode': settings,
+                'crops': {
+                    crop.filename: {
+                        'row': crop.row_index,
+                        'box': crop.box_index,
+                        'coords': list(crop.original_coords),
+                        'path': self.sink.location(plate_name, crop.filename)
+                    } for crop in results
+                }
+            })
+
+        self.sink.flush()
+
+        if self.project_store is not None:
+            try:
+                self.project_store.record_crops(plate_name, results, self.sink)
+            except Exception as e:
+                print(f"Błąd zapisu wycinków do bazy projektu: {e}")
+
+        # Bez nowych ani usuniętych wycinków istniejąca tablica .npy tabliczki jest aktualna
+        normalize = self.normalizer is not None and results and (
+            stale or not all(crop.skipped for crop in results)
+            or not os.path.exists(self.normalizer.array_path(plate_name)))
+        if normalize:
+            try:
+                self.normalizer.write(plate_name, results)
+            except Exception as e:
+                print(f"Błąd podczas normalizacji wycinków: {e}")
         return results
 
+    def crop_and_save(self,
+                     original_image: np.ndarray,
+                     rows: List['RowLine'],
+                     boxes: List['BoundingBox'],
+                     progress_callback: Optional[Callable[[int, int], None]] = None,
+                     plate_name: Optional[str] = None) -> List[CropResult]:
+
+        if original_image is None:
+            print("Brak obrazu do wycięcia")
+            return []
+
+        return self._write_crops(original_image, self._layout(original_image, rows), plate_name,
+                                 progress_callback)
+
+    def crop_and_save_async(self,
+                            original_image: np.ndarray,
+                            rows: List['RowLine'],
+                            boxes: List['BoundingBox'],
+                            progress_callback: Optional[Callable[[int, int], None]] = None,
+                            plate_name: Optional[str] = None) -> Future:
+        """Jak crop_and_save, ale kodowanie i zapis odbywają się w tle.
+
+        Współrzędne są wyznaczane od razu w wątku wywołującym, więc późniejsze edycje
+        boxów nie wpływają na zlecone wycinanie. Future zwraca List[CropResult].
+        """
+        if original_image is None:
+            print("Brak obrazu do wycięcia")
+            future = Future()
+            future.set_result([])
+            return future
+
+        layout = self._layout(original_image, rows)
+        return self._coordinator.submit(self._write_crops, original_image, layout, plate_name, progress_callback)
+
+    def output_location(self, plate_name: Optional[str] = None) -> str:
+        """Miejsce zapisu wycinków danej tabliczki (katalog lub archiwum)"""
+        if isinstance(self.sink, DirectorySink):
+            return os.path.dirname(self.sink.path_for(plate_name, "x"))
+        return getattr(self.sink, "archive_dir", self.output_dir)
+
+    def shutdown(self):
+        self._coordinator.shutdown(wait=True)
+        self._executor.shutdown(wait=True)
+        self.sink.close()
@@ -0,0 +1,11 @@
+import hashlib
+import numpy as np
+
+
+def image_hash(image: np.ndarray) -> str:
+    """Zwraca skrót zawartości obrazu (piksele, kształt i typ) - wspólny klucz DetectionCache i manifestu wycinków"""
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(str(image.shape).encode())
+    digest.update(str(image.dtype).encode())
+    digest.update(np.ascontiguousarray(image).data)
+    return digest.hexdigest()
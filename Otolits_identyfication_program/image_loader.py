@@ -1,16 +1,30 @@
 import os
 import cv2
 import numpy as np
-from typing import Optional, Tuple  # Dodaj Tuple do importów
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from functools import lru_cache
+from typing import Dict, Optional, Tuple  # Dodaj Tuple do importów
 
+@lru_cache(maxsize=1)
 def get_screen_size():
+    """Rozmiar ekranu z Tk - odpytywany raz, dopiero przy pierwszym skalowaniu obrazu"""
     import tkinter as tk
     root = tk.Tk()
     root.withdraw()
-    return root.winfo_screenwidth(), root.winfo_screenheight()
+    size = root.winfo_screenwidth(), root.winfo_screenheight()
+    root.destroy()
+    return size
 
 class ImageLoader:
-    def __init__(self, image_dir):
+    """Wczytywanie tabliczek z katalogu z podglądem przeskalowanym do ekranu.
+
+    Ostatnio oglądane zdjęcia (oryginał + podgląd) trzymane są w LRU o rozmiarze cache_size,
+    a prefetch() dekoduje sąsiednie zdjęcia w tle - next_image(), previous_image() i goto()
+    korzystają z obu, więc powrót lub skok do przygotowanego zdjęcia nie dekoduje go ponownie.
+    """
+
+    def __init__(self, image_dir, screen_size: Optional[Tuple[int, int]] = None, cache_size: int = 3):
         if not os.path.exists(image_dir):
             raise FileNotFoundError(f"Katalog '{image_dir}' nie istnieje. Program zostaje przerwany.")
 
@@ -19,41 +33,116 @@ class ImageLoader:
         self.current_index = 0
         self.image = None
         self.original_image = None
-        self.screen_width, self.screen_height = get_screen_size()
+        # screen_size pozwala działać bez Tk (benchmarki, testy bez ekranu)
+        self._screen_size = screen_size
         self.scale = 1.0  # Domyślna wartość
         self.original_size = (0, 0)  # Inicjalizacja
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[int, tuple]" = OrderedDict()  # indeks -> (oryginał, podgląd, skala)
+        self._prefetched: Dict[int, Future] = {}
+        self._executor = None  # Tworzony przy pierwszym prefetch()
 
     def load_image(self):
         if self.current_index >= len(self.image_files):
             return None
 
-        image_path = os.path.join(self.image_dir, self.image_files[self.current_index])
-        self.original_image = cv2.imread(image_path)
-        if self.original_image is None:
-            raise ValueError(f"Nie udało się załadować obrazu: {image_path}")
-        self.image = self._resize_to_screen(self.original_image)
+        entry = self._cache.get(self.current_index)
+        if entry is None:
+            future = self._prefetched.pop(self.current_index, None)
+            entry = future.result() if future is not None and not future.cancelled() else None
+        if entry is None:
+            entry = self._decode(self.current_index)
+
+        self._cache[self.current_index] = entry
+        self._cache.move_to_end(self.current_index)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+        self.original_image, self.image, self.scale = entry
+        h, w = self.original_image.shape[:2]
+        self.original_size = (w, h)
         return self.image
 
+    def _decode(self, index: int) -> tuple:
+        """Dekoduje zdjęcie i przygotowuje podgląd (bez zmiany stanu - wywoływane też w tle)"""
+        image_path = os.path.join(self.image_dir, self.image_files[index])
+        original = cv2.imread(image_path)
+        if original is None:
+            raise ValueError(f"Nie udało się załadować obrazu: {image_path}")
+        preview, scale = self._preview(original)
+        return original, preview, scale
+
+    def _preview(self, image) -> Tuple[np.ndarray, float]:
+        h, w = image.shape[:2]
+        scale = min(self.screen_width / w, self.screen_height / h) * 0.9
+        new_size = (int(w * scale), int(h * scale))
+        return cv2.resize(image, new_size, interpolation=cv2.INTER_AREA), scale
+
+    def prefetch(self, *indices: int) -> None:
+        """Dekoduje wskazane zdjęcia w tle (np. sąsiednie albo wskazane na pasku miniatur)"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+        self.screen_size  # Rozmiar ekranu (Tk) musi zostać ustalony w wątku głównym
+        for index in indices:
+            if 0 <= index < len(self.image_files) and index not in self._cache and index not in self._prefetched:
+                self._prefetched[index] = self._executor.submit(self._decode, index)
+        # Ograniczenie pamięci - porzucenie najstarszych zleceń
+        while len(self._prefetched) > self.cache_size:
+            index = next(iter(self._prefetched))
+            self._prefetched.pop(index).cancel()
+
+    def goto(self, index: int):
+        """Przejście do dowolnego zdjęcia; zwraca podgląd albo None dla indeksu spoza zakresu"""
+        if not 0 <= index < len(self.image_files):
+            return None
+        self.current_index = index
+        image = self.load_image()
+        self.prefetch(index + 1, index - 1)
+        return image
+
+    def previous_image(self):
+        if self.current_index > 0:
+            return self.goto(self.current_index - 1)
+        return None
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def screen_width(self) -> int:
+        return self.screen_size[0]
+
+    @property
+    def screen_height(self) -> int:
+        return self.screen_size[1]
+
+    @property
+    def screen_size(self) -> Tuple[int, int]:
+        if self._screen_size is None:
+            self._screen_size = get_screen_size()
+        return self._screen_size
+
     def next_image(self):
         if self.current_index < len(self.image_files) - 1:
-            self.current_index += 1
-            return self.load_image()
+            return self.goto(self.current_index + 1)
         return None
 
     def _resize_to_screen(self, image):
         h, w = image.shape[:2]
-        self.scale = min(self.screen_width / w, self.screen_height / h) * 0.9
+        resized, self.scale = self._preview(image)
         self.original_size = (w, h)
-        new_size = (int(w * self.scale), int(h * self.scale))
-        return cv2.resize(image, new_size, interpolation=cv2.INTER_AREA)
+        return resized
 
-    def get_original_image(self) -> Optional[np.ndarray]:
-        """Zwraca oryginalny, nieprzeskalowany obraz"""
-        return self.original_image.copy() if self.original_image is not None else None
+    def get_original_image(self, copy: bool = True) -> Optional[np.ndarray]:
+        """Zwraca oryginalny, nieprzeskalowany obraz (copy=False - bez kopiowania, tylko do odczytu)"""
+        if self.original_image is None:
+            return None
+        return self.original_image.copy() if copy else self.original_image
 
-    def get_current_original_image(self) -> Optional[np.ndarray]:
+    def get_current_original_image(self, copy: bool = True) -> Optional[np.ndarray]:
         """Alias dla get_original_image() dla spójności interfejsu"""
-        return self.get_original_image()
+        return self.get_original_image(copy)
 
     def scale_coords_to_original(self, x1: int, y1: int, x2: int, y2: int) -> Tuple[int, int, int, int]:
         """Przelicza współrzędne z przeskalowanego podglądu na oryginalny obraz"""
@@ -65,6 +154,15 @@ class ImageLoader:
             int(y2 * scale_factor)
         )
 
+    def scale_coords_to_display(self, x1: float, y1: float, x2: float, y2: float) -> Tuple[int, int, int, int]:
+        """Przelicza współrzędne z oryginalnego obrazu na przeskalowany podgląd"""
+        return (
+            int(x1 * self.scale),
+            int(y1 * self.scale),
+            int(x2 * self.scale),
+            int(y2 * self.scale)
+        )
+
     @property
     def current_image_path(self) -> Optional[str]:
         """Zwraca ścieżkę do aktualnie załadowanego obrazu"""
@@ -1,23 +1,50 @@
 import cv2
 import os
 import sys
+import time
 from input_handler import Mode
 from bounding_box_manager import BoundingBoxManager
 from row_detector import RowDetector, RowEditMode
 from image_cropper import ImageCropper
+from detection_worker import DetectionWorker
+from edit_journal import EditJournal, BoxesAdded, BoxRemoved, BoxChanged, RowEdited, RowsChanged, line_state
+from profiler import SessionProfiler
+from filmstrip import Filmstrip
 
 
 class ImageWindow:
-    def __init__(self, image_loader, bbox_manager, input_handler):
+    def __init__(self, image_loader, bbox_manager, input_handler, yolo_model=None, image_cropper=None,
+                 session_store=None, project_store=None, profiler=None, thumbnail_cache=None):
         self.image_loader = image_loader
         self.bbox_manager = bbox_manager
         self.input_handler = input_handler
+        self.yolo_model = yolo_model
         self.current_image = None
         self.temp_image = None
         self.row_detector = RowDetector(bbox_manager)
         self.input_handler.row_detector = self.row_detector
         self.window_name = "Otolith Annotation Tool"
-        self.image_cropper = ImageCropper(image_loader=image_loader)
+        self.image_cropper = image_cropper or ImageCropper(image_loader=image_loader)
+        self.detection_worker = DetectionWorker(yolo_model, image_loader) if yolo_model is not None else None
+        self._pending_detection = None  # Indeks zdjęcia oczekującego na wynik detekcji
+        self._last_progress_refresh = 0.0
+        self._crop_future = None
+        self._crop_progress = (0, 0)  # (zapisane, wszystkie) - aktualizowane z wątku zapisu
+        self._crop_plate_name = None
+        self.session_store = session_store
+        self.project_store = project_store
+        # Historia edycji (z/y) - rekordy zmian zasilają też autozapis sesji
+        self.edit_journal = EditJournal(on_change=self._on_journal_change)
+        self.input_handler.edit_journal = self.edit_journal
+        self._rows_before_edit = None
+        self._row_edit = None  # (wiersz, stan linii przed przeciągnięciem)
+        # Profiler (P lub --profile) - raport oznaczany nazwą tabliczki i liczbą boxów
+        self.profiler = profiler or SessionProfiler()
+        self.profiler.context = lambda: (self._current_plate_name(), len(self.bbox_manager.boxes))
+        self.input_handler.profiler = self.profiler
+        # Pasek miniatur (g) do skakania między zdjęciami
+        self.thumbnail_cache = thumbnail_cache
+        self.filmstrip = Filmstrip(image_loader, thumbnail_cache) if thumbnail_cache is not None else None
 
     def _prepare_display_image(self):
         """Przygotowanie obrazu do wyświetlenia"""
@@ -42,6 +69,17 @@ class ImageWindow:
         if self.row_detector.edit_mode != RowEditMode.NONE:
             mode_text += f" | Linie: {self.row_detector.edit_mode.name}"
 
+        # Postęp detekcji w tle
+        if self._pending_detection is not None:
+            spinner = "|/-\\"[int(time.time() * 4) % 4]
+            queued = self.detection_worker.queued_count()
+            mode_text += f" | Detekcja {spinner} (w kolejce: {queued})"
+
+        # Postęp zapisu wycinków
+        if self._crop_future is not None:
+            done, total = self._crop_progress
+            mode_text += f" | Wycinanie: {done}/{total}"
+
         # Tło dla tekstu
         (text_width, text_height), _ = cv2.getTextSize(
             mode_text, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)
@@ -82,9 +120,12 @@ class ImageWindow:
         self._draw_mode_info(display_image)
         cv2.imshow(self.window_name, display_image)
 
-    def show_image(self):
+    def show_image(self, on_first_frame=None):
         """Główna pętla wyświetlania obrazu z poprawioną reaktywnością"""
-        self.current_image = self.image_loader.load_image()
+        # Obraz mógł zostać już wczytany w main.py - bez ponownego dekodowania
+        self.current_image = self.image_loader.image
+        if self.current_image is None:
+            self.current_image = self.image_loader.load_image()
         if self.current_image is None:
             print("Brak zdjęć do wyświetlenia.")
             return
@@ -93,10 +134,20 @@ class ImageWindow:
 
         cv2.namedWindow(self.window_name, cv2.WINDOW_NORMAL)
         cv2.setMouseCallback(self.window_name, self._handle_mouse_event)
+        if not self._restore_session() and self.detection_worker is not None:
+            self._auto_detect_objects()
         self.update_display()
+        self.image_loader.prefetch(self.image_loader.current_index + 1)
+        if on_first_frame is not None:
+            cv2.waitKey(1)  # Okno jest faktycznie rysowane dopiero w waitKey
+            on_first_frame()
 
         while True:
             key = cv2.waitKey(1) & 0xFF
+            self._poll_detection()
+            self._poll_crop_boxes()
+            self._poll_session()
+            self._poll_filmstrip()
 
             # Warunki wyjścia
             if (key == ord('q') or
@@ -112,6 +163,16 @@ class ImageWindow:
             if key == ord('n'):
                 self._handle_next_image()
                 continue
+            if key == ord('p'):
+                self._handle_previous_image()
+                continue
+            if key == ord('g'):
+                if self.filmstrip is not None:
+                    self.filmstrip.toggle()
+                continue
+            if self.filmstrip is not None and self.filmstrip.is_open and key in (ord(','), ord('.')):
+                self.filmstrip.scroll(-1 if key == ord(',') else 1)
+                continue
 
             # Obsługa pozostałych klawiszy
             if self.input_handler.keyboard_callback(key):
@@ -120,6 +181,18 @@ class ImageWindow:
                 cv2.waitKey(1)
                 cv2.waitKey(1)
 
+        if self.detection_worker is not None:
+            self.detection_worker.shutdown()
+        self._save_session_now()
+        if self.session_store is not None:
+            self.session_store.shutdown()
+        if self.thumbnail_cache is not None:
+            self.thumbnail_cache.shutdown()
+        self.image_loader.shutdown()
+        self.profiler.stop()
+        # Dokończ zapis zleconych wycinków przed wyjściem
+        self.image_cropper.shutdown()
+        self._poll_crop_boxes()
         cv2.destroyAllWindows()
         sys.exit()
 
@@ -136,13 +209,24 @@ class ImageWindow:
         if self.row_detector.edit_mode != RowEditMode.NONE:
             if self.row_detector.handle_mouse_event(event, x, y):
                 self.update_display()
+            if event == cv2.EVENT_LBUTTONDOWN and self.row_detector.selected_row is not None:
+                # Wybrana (lub właśnie dodana) linia - zapamiętujemy jej stan sprzed przeciągnięcia
+                row = self.row_detector.selected_row
+                added = self.row_detector.edit_mode == RowEditMode.ADD
+                self._row_edit = (row, None if added else line_state(row))
+            if event == cv2.EVENT_LBUTTONUP:
+                self._record_row_edit()
             return
 
         # Następnie sprawdź tryby związane z bounding boxami
         if self.input_handler.mode == Mode.DELETE and event == cv2.EVENT_LBUTTONDOWN:
             box = self.bbox_manager.get_box_at(x, y, tolerance=5)
             if box:
-                self.bbox_manager.remove_box(box)
+                # Box znika też ze swojego wiersza - inaczej trafiałby dalej do wycinków
+                delta = BoxRemoved.capture(self, box)
+                delta.redo(self)
+                self.edit_journal.record(delta)
+                print(f"Usunięto box: {box}")
                 self.update_display()
             return
 
@@ -182,8 +266,11 @@ class ImageWindow:
                 dx = x - self.input_handler.start_pos[0]
                 dy = y - self.input_handler.start_pos[1]
                 box = self.input_handler.selected_box
+                old_coords = box.get_coordinates()
                 box.move(dx, dy)
                 self.input_handler.selected_box = None
+                self.row_detector.rows.update_box(box)
+                self.edit_journal.record(BoxChanged(box, old_coords, box.get_coordinates()))
                 self.update_display()
             return
 
@@ -231,8 +318,11 @@ class ImageWindow:
             elif event == cv2.EVENT_LBUTTONUP and self.input_handler.selected_box:
                 box = self.input_handler.selected_box
                 corner = self.input_handler.drag_corner
+                old_coords = box.get_coordinates()
                 box.resize(corner, x, y)
                 self.input_handler.selected_box = None
+                self.row_detector.rows.update_box(box)
+                self.edit_journal.record(BoxChanged(box, old_coords, box.get_coordinates()))
                 self.update_display()
             return
 
@@ -252,7 +342,8 @@ class ImageWindow:
                 x1, x2 = sorted([self.input_handler.start_pos[0], x])
                 y1, y2 = sorted([self.input_handler.start_pos[1], y])
                 if abs(x2 - x1) > 10 and abs(y2 - y1) > 10:  # Minimalny rozmiar
-                    self.bbox_manager.add_box(x1, y1, x2, y2)
+                    box = self.bbox_manager.add_box(x1, y1, x2, y2)
+                    self.edit_journal.record(BoxesAdded([box]))
                 self.input_handler.drawing = False
                 self.update_display()
 
@@ -260,32 +351,73 @@ class ImageWindow:
         if event == cv2.EVENT_RBUTTONDOWN:
             if self.input_handler.mode == Mode.MANUAL:
                 try:
+                    self._rows_before_edit = RowsChanged.capture(self.row_detector.rows)
                     self.row_detector.detect_rows()
+                    self._record_rows_change()
                     self.update_display()
                 except Exception as e:
                     print(f"Błąd wykrywania wierszy: {e}")
 
     def _handle_next_image(self):
         """Obsługa przejścia do następnego obrazu z resetem do trybu AUTO"""
-        next_image = self.image_loader.next_image()
-        if next_image is not None:
-            self.current_image = next_image
+        self._save_session_now()
+        if not self._show_loaded_image(self.image_loader.next_image()):
+            print("To już ostatnie zdjęcie.")
+
+    def _handle_previous_image(self):
+        self._save_session_now()
+        if not self._show_loaded_image(self.image_loader.previous_image()):
+            print("To jest pierwsze zdjęcie.")
+
+    def _goto_image(self, index):
+        """Skok do zdjęcia wybranego na pasku miniatur"""
+        if index == self.image_loader.current_index:
+            return
+        self._save_session_now()
+        self._show_loaded_image(self.image_loader.goto(index))
+
+    def _poll_filmstrip(self):
+        if self.filmstrip is None:
+            return
+        self.filmstrip.poll()
+        index = self.filmstrip.take_selection()
+        if index is not None:
+            self._goto_image(index)
+            if self.filmstrip.is_open:
+                self.filmstrip.render()
+
+    def _show_loaded_image(self, image):
+        """Wyświetla zdjęcie właśnie wczytane przez ImageLoader; przywraca jego sesję albo uruchamia detekcję"""
+        if image is not None:
+            self.current_image = image
             self.bbox_manager = BoundingBoxManager(self.current_image.shape)
             self.input_handler.bbox_manager = self.bbox_manager
+            self.row_detector.bbox_manager = self.bbox_manager
+            self.row_detector.rows = []
+            self.edit_journal.clear()
             self.input_handler.set_mode(Mode.AUTO)  # Reset do trybu AUTO
 
             print(f"Nowy obraz - kształt: {self.current_image.shape}, typ: {self.current_image.dtype}")
 
-            # Tutaj dodaj automatyczne wykrywanie obiektów w trybie AUTO
-            self._auto_detect_objects()
+            # Zapisana sesja zastępuje detekcję - boxy i wiersze wracają bez ponownego liczenia
+            if not self._restore_session():
+                self._auto_detect_objects()
 
             self.update_display()
-        else:
-            print("To już ostatnie zdjęcie.")
+        return image is not None
 
     def _auto_detect_objects(self):
         """Automatyczne wykrywanie obiektów w trybie AUTO"""
         if self.input_handler.mode == Mode.AUTO:
+            if self.detection_worker is not None:
+                # Detekcja w tle - obraz wyświetla się od razu, boxy dochodzą w _poll_detection
+                index = self.image_loader.current_index
+                self.detection_worker.cancel_stale(index)
+                self.detection_worker.request(index, self.image_loader.original_image)
+                self.detection_worker.prefetch(index)
+                self._pending_detection = index
+                return
+
             # Tutaj implementacja automatycznego wykrywania obiektów
             # Przykładowe wykrywanie - w rzeczywistości użyj swojego algorytmu
             height, width = self.current_image.shape[:2]
@@ -301,6 +433,42 @@ class ImageWindow:
 
             print(f"Automatycznie wykryto {len(sample_boxes)} obiektów")
 
+    def _poll_detection(self):
+        """Przenosi gotowe wyniki detekcji do BoundingBoxManager i odświeża wskaźnik postępu"""
+        if self._pending_detection is None:
+            return
+
+        try:
+            detections = self.detection_worker.poll(self._pending_detection)
+        except Exception as e:
+            print(f"Błąd detekcji YOLO: {e}")
+            self._pending_detection = None
+            self.update_display()
+            return
+
+        if detections is None:
+            if not self.detection_worker.is_pending(self._pending_detection):
+                self._pending_detection = None
+                self.update_display()
+            elif time.time() - self._last_progress_refresh > 0.25:
+                self._last_progress_refresh = time.time()
+                self.update_display()
+            return
+
+        added = []
+        for x1, y1, x2, y2, _ in detections:
+            dx1, dy1, dx2, dy2 = self.image_loader.scale_coords_to_display(x1, y1, x2, y2)
+            if dx1 != dx2 and dy1 != dy2:
+                added.append(self.bbox_manager.add_box(dx1, dy1, dx2, dy2))
+
+        print(f"Automatycznie wykryto {len(detections)} obiektów")
+        if added:
+            self.edit_journal.record(BoxesAdded(added))
+        if self.yolo_model.cache is not None:
+            print(f"Cache detekcji: trafienia {self.yolo_model.cache.hit_rate:.0%}")
+        self._pending_detection = None
+        self.update_display()
+
     def _handle_crop_boxes(self):
         """Obsługa wycinania boxów po naciśnięciu Enter"""
         try:
@@ -309,26 +477,136 @@ class ImageWindow:
                 return
 
 
-            original_image = self.image_loader.get_current_original_image()
+            if self._crop_future is not None:
+                print("Poprzednie wycinanie jeszcze trwa")
+                return
+
+            original_image = self.image_loader.get_current_original_image(copy=False)
             if original_image is None:
                 print("Nie można załadować oryginalnego obrazu")
                 return
 
             print("Rozpoczynanie procesu wycinania boxów...")
-            results = self.image_cropper.crop_and_save(
+            self._save_project()
+            self._crop_progress = (0, 0)
+            self._crop_plate_name = self._current_plate_name()
+            self._crop_future = self.image_cropper.crop_and_save_async(
                 original_image,
                 self.row_detector.rows,
-                self.bbox_manager.boxes
+                self.bbox_manager.boxes,
+                progress_callback=self._on_crop_progress,
+                plate_name=self._crop_plate_name
             )
+            self.update_display()
+
+        except Exception as e:
+            print(f"Błąd podczas wycinania boxów: {str(e)}")
+
+    def _current_plate_name(self):
+        """Nazwa tabliczki (nazwa pliku bez rozszerzenia) - rozdziela wycinki różnych zdjęć"""
+        image_path = self.image_loader.current_image_path
+        return os.path.splitext(os.path.basename(image_path))[0] if image_path else None
+
+    def _on_crop_progress(self, done, total):
+        """Wywoływane z wątku zapisu - tylko zapamiętuje postęp"""
+        self._crop_progress = (done, total)
+
+    def _poll_crop_boxes(self):
+        """Raportuje zakończenie wycinania zleconego klawiszem Enter"""
+        if self._crop_future is None:
+            return
+
+        if not self._crop_future.done():
+            if time.time() - self._last_progress_refresh > 0.25:
+                self._last_progress_refresh = time.time()
+                self.update_display()
+            return
 
+        future, self._crop_future = self._crop_future, None
+        try:
+            results = future.result()
             if results:
-                print(f"\nPomyślnie wycięto i zapisano {len(results)} boxów:")
+                skipped = sum(1 for result in results if result.skipped)
+                print(f"\nPomyślnie wycięto i zapisano {len(results)} boxów (bez zmian, pominięto: {skipped}):")
                 for result in results:
                     print(f"- {result.filename} (wiersz {result.row_index}, box {result.box_index})")
-                print(f"Pliki zapisano w: {os.path.abspath(self.image_cropper.output_dir)}\n")
+                location = self.image_cropper.output_location(self._crop_plate_name)
+                print(f"Pliki zapisano w: {os.path.abspath(location)}\n")
             else:
                 print("Nie udało się wyciąć żadnych boxów")
-
         except Exception as e:
             print(f"Błąd podczas wycinania boxów: {str(e)}")
+        self.update_display()
 
+    def _on_journal_change(self, records):
+        """Zmiana z dziennika edycji - zapis nastąpi w tle po chwili bez kolejnych zmian"""
+        if self.session_store is not None:
+            self.session_store.record(self._current_plate_name(), records, self.image_loader.scale)
+
+    def _record_row_edit(self):
+        """Zapisuje w dzienniku zmianę linii przeciąganej od ostatniego kliknięcia"""
+        if self._row_edit is None:
+            return
+        row, old = self._row_edit
+        self._row_edit = None
+        delta = RowEdited(row, old, line_state(row) if row in self.row_detector.rows else None)
+        if delta.changed():
+            self.edit_journal.record(delta)
+
+    def _record_rows_change(self):
+        """Zapisuje w dzienniku zmianę linii wierszy od ostatniego RowsChanged.capture()"""
+        if self._rows_before_edit is None:
+            return
+        delta = RowsChanged(self._rows_before_edit, RowsChanged.capture(self.row_detector.rows))
+        self._rows_before_edit = None
+        if delta.changed():
+            self.edit_journal.record(delta)
+
+    def _poll_session(self):
+        if self.session_store is not None:
+            self.session_store.poll(self._current_plate_name(), self.bbox_manager.boxes,
+                                    self.row_detector.rows, self.image_loader.scale)
+
+    def _save_session_now(self):
+        """Zapis niezapisanych zmian przed zmianą zdjęcia lub wyjściem"""
+        self._save_project()
+        if self.session_store is not None:
+            self.session_store.flush(self._current_plate_name(), self.bbox_manager.boxes,
+                                     self.row_detector.rows, self.image_loader.scale)
+
+    def _restore_session(self):
+        """Wczytuje zapisaną sesję bieżącej tabliczki; zwraca True, jeśli istniała"""
+        if self.session_store is None:
+            return False
+        plate = self._current_plate_name()
+        try:
+            session = self.session_store.load(plate, self.image_loader.scale)
+        except Exception as e:
+            print(f"Błąd odczytu sesji {plate}: {e}")
+            return False
+        if session is None:
+            return False
+
+        self.bbox_manager.boxes = session.boxes
+        self.row_detector.rows = session.rows
+        self.edit_journal.clear()
+        self._pending_detection = None
+        print(f"Przywrócono sesję {plate}: {len(session.boxes)} boxów, {len(session.rows)} wierszy")
+        return True
+
+    def _save_project(self):
+        """Zapisuje boxy i wiersze bieżącej tabliczki w bazie projektu"""
+        if self.project_store is None or self.image_loader.original_image is None:
+            return
+        try:
+            h, w = self.image_loader.original_image.shape[:2]
+            self.project_store.save_annotations(
+                self._current_plate_name(),
+                self.bbox_manager.boxes,
+                self.row_detector.rows,
+                scale=self.image_loader.scale,
+                path=self.image_loader.current_image_path,
+                size=(w, h)
+            )
+        except Exception as e:
+            print(f"Błąd zapisu do bazy projektu: {e}")
@@ -22,6 +22,8 @@ class InputHandler:
         self.drawing = False
         self.selected_box = None
         self.drag_offset = None
+        self.edit_journal = None  # EditJournal ustawiany przez ImageWindow
+        self.profiler = None  # SessionProfiler ustawiany przez ImageWindow
         self._show_initial_status()  # Pokaz status tylko raz przy starcie
 
     def _show_initial_status(self):
@@ -36,6 +38,8 @@ class InputHandler:
             "[1] - Edycja istniejących linii",
             "[2] - Dodawanie nowej linii",
             "[0] - Wyłącz edycję linii",
+            "[z] - Cofnij, [y] - Ponów",
+            "[P] - Profilowanie (start/stop)",
             "[ESC] - Wyjście",
             "=" * 50
         ]
@@ -70,7 +74,10 @@ class InputHandler:
             27: lambda: ([cv2.destroyAllWindows(), sys.exit()], False),
             ord('1'): lambda: (self.row_detector.set_edit_mode(RowEditMode.EDIT), True),
             ord('2'): lambda: (self.row_detector.set_edit_mode(RowEditMode.ADD), True),
-            ord('0'): lambda: (self.row_detector.set_edit_mode(RowEditMode.NONE), True)
+            ord('0'): lambda: (self.row_detector.set_edit_mode(RowEditMode.NONE), True),
+            ord('z'): lambda: (None, self._undo()),
+            ord('y'): lambda: (None, self._redo()),
+            ord('P'): lambda: (self._toggle_profiler(), False)
         }
 
         if key in key_actions:
@@ -80,6 +87,23 @@ class InputHandler:
             return action_result
         return False
 
+    def _undo(self):
+        """Cofa ostatnią edycję boxów lub wierszy; zwraca True, jeśli coś się zmieniło"""
+        if self.edit_journal is None or not self.edit_journal.undo(self):
+            print("Brak zmian do cofnięcia")
+            return False
+        return True
+
+    def _redo(self):
+        if self.edit_journal is None or not self.edit_journal.redo(self):
+            print("Brak zmian do ponowienia")
+            return False
+        return True
+
+    def _toggle_profiler(self):
+        if self.profiler is not None:
+            self.profiler.toggle()
+
     def _set_row_edit_mode(self, mode):
         """Ustawia tryb edycji linii"""
         self.row_detector.set_edit_mode(mode)
@@ -136,6 +160,8 @@ class InputHandler:
             self._format_option("[v]", "Przesuwanie boxów", Mode.MOVE),
             self._format_option("[r]", "Zmiana rozmiaru boxów", Mode.RESIZE),
             self._format_option("[d]", "Usuwanie boxów/linii", Mode.DELETE),
+            "[z] Cofnij, [y] Ponów",
+            "[P] Profilowanie (start/stop)",
             "[ESC] Wyjście",
             "=" * 50
         ]
@@ -1,18 +1,78 @@
+import time
+_START = time.perf_counter()  # Przed pozostałymi importami - raport startu obejmuje też importy
+
+import os
+import sys
+import argparse
 from image_loader import ImageLoader
 from bounding_box_manager import BoundingBoxManager
 from row_detector import RowDetector
 from image_window import ImageWindow
 from input_handler import InputHandler
-import cv2
-import sys
+from image_cropper import ImageCropper
+from session_store import SessionStore
+from project_store import ProjectStore
+from profiler import SessionProfiler
+from thumbnail_cache import ThumbnailCache
+
+
+class StartupTimer:
+    """Czasy kolejnych etapów uruchomienia (licząc od początku importów main.py)"""
+
+    def __init__(self, start: float = _START):
+        self.start = start
+        self.marks = []
+
+    def mark(self, stage: str) -> None:
+        self.marks.append((stage, time.perf_counter()))
+
+    def report(self) -> None:
+        print("\nRaport startu:")
+        previous = self.start
+        for stage, moment in self.marks:
+            print(f"  {stage:<28}{(moment - previous) * 1000:>8.1f} ms  (łącznie {(moment - self.start) * 1000:.1f} ms)")
+            previous = moment
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Narzędzie do oznaczania otolitów",
+        epilog="Szczegółowe czasy importów modułów: python -X importtime main.py")
+    parser.add_argument("--images", type=str, default="test_images", help="Katalog z tabliczkami")
+    parser.add_argument("--model", type=str,
+                        default=os.path.join("YOLO", "runs", "detect", "turbot_results", "weights", "best.pt"),
+                        help="Wagi modelu YOLO")
+    parser.add_argument("--detector", choices=["auto", "yolo", "classical"], default="auto",
+                        help="auto - YOLO, jeśli są wagi, w przeciwnym razie szybki detektor klasyczny (CPU)")
+    parser.add_argument("--yolo-roi", action="store_true",
+                        help="Zawężaj obraz dla YOLO do obszaru wskazanego przez detektor klasyczny")
+    parser.add_argument("--screen", type=str, default=None,
+                        help="Rozmiar ekranu SZERxWYS (pomija odpytywanie Tk przy starcie)")
+    parser.add_argument("--startup-report", action="store_true", help="Wypisz czasy etapów uruchomienia")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profiluj pętlę główną od startu (raport w katalogu profiles/, P - przełączanie)")
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
     try:
-        image_dir = "test_images"
+        timer = StartupTimer()
+        timer.mark("importy")
+        args = parse_args()
+        image_dir = args.images
+        model_path = args.model
+        cache_path = "detection_cache.sqlite"
+        crop_archive_dir = None  # np. "output_crops_archive" - zapis wycinków do shardów tar zamiast plików
+        normalized_dir = None  # np. "normalized_crops" - dodatkowo tablice .npy 224x224 do treningu
+        session_dir = "sessions"  # Boxy i wiersze zapisywane osobno dla każdego zdjęcia
+        project_db = "project.sqlite"  # Baza projektu: tabliczki, boxy, wiersze i wycinki
+        thumbnail_dir = "thumbnails"  # Miniatury paska nawigacji (g)
         print(f"\nŁadowanie obrazów z: {image_dir}")
 
-        image_loader = ImageLoader(image_dir)
+        screen_size = tuple(map(int, args.screen.lower().split("x"))) if args.screen else None
+        image_loader = ImageLoader(image_dir, screen_size=screen_size)
         first_image = image_loader.load_image()
+        timer.mark("wczytanie pierwszego obrazu")
 
         if first_image is None:
             raise FileNotFoundError(f"Nie znaleziono obrazów w {image_dir}")
@@ -25,18 +85,61 @@ if __name__ == "__main__":
         row_detector = RowDetector(bbox_manager)
         input_handler = InputHandler(bbox_manager, row_detector)
 
+        # Moduły opcjonalnych funkcji importowane dopiero, gdy są używane
+        yolo_model = None
+        use_yolo = args.detector == "yolo" or (args.detector == "auto" and os.path.exists(model_path))
+        if use_yolo:
+            from model_yolo import YOLOModel
+            from detection_cache import DetectionCache
+            roi_detector = None
+            if args.yolo_roi:
+                from classical_detector import ClassicalDetector
+                roi_detector = ClassicalDetector()
+            yolo_model = YOLOModel(model_path, cache=DetectionCache(cache_path), roi_detector=roi_detector)
+            print(f"Model YOLO: {model_path}")
+        else:
+            # Ten sam interfejs co YOLOModel - detekcja w tle przez DetectionWorker
+            from classical_detector import ClassicalDetector
+            yolo_model = ClassicalDetector()
+            print(f"Detektor klasyczny (brak wag modelu {model_path} lub --detector classical)")
+
         print("\nSterowanie:")
         print("m - tryb manualny (dodawanie boxów)")
         print("v - tryb przesuwania boxów")
         print("r - tryb zmiany rozmiaru")
         print("d - tryb usuwania boxów")
-        print("n - następny obraz")
+        print("n - następny obraz, p - poprzedni obraz")
+        print("g - miniatury tabliczek (kółko myszy lub , . - przewijanie, klik - przejście)")
         print("PRAWY KLIK - wykryj wiersze")
         print("q - wyjście")
 
-        ImageWindow(image_loader, bbox_manager, input_handler).show_image()
+        sink = None
+        if crop_archive_dir:
+            from crop_archive import CropArchiveWriter
+            sink = CropArchiveWriter(crop_archive_dir)
+        normalizer = None
+        if normalized_dir:
+            from crop_normalizer import CropNormalizer
+            normalizer = CropNormalizer(normalized_dir)
+        project_store = ProjectStore(project_db)
+        image_cropper = ImageCropper(image_loader=image_loader, sink=sink, normalizer=normalizer,
+                                     project_store=project_store)
+
+        session_store = SessionStore(session_dir)
+        timer.mark("inicjalizacja")
+
+        def on_first_frame():
+            timer.mark("pierwsza klatka")
+            if args.startup_report:
+                timer.report()
+
+        profiler = SessionProfiler()
+        if args.profile:
+            profiler.start()
+
+        ImageWindow(image_loader, bbox_manager, input_handler, yolo_model, image_cropper,
+                    session_store, project_store, profiler, ThumbnailCache(thumbnail_dir)).show_image(on_first_frame)
 
     except Exception as e:
         print(f"\nBłąd: {str(e)}")
         sys.exit(1)
-
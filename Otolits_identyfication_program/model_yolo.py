@@ -1,6 +1,59 @@
+import numpy as np
+
+
 class YOLOModel:
-    def __init__(self, model_path):
+    def __init__(self, model_path, imgsz=640, conf=0.25, iou=0.7, device='cpu', cache=None, roi_detector=None):
         self.model_path = model_path
+        self.imgsz = imgsz
+        self.conf = conf
+        self.iou = iou
+        self.device = device
+        self.cache = cache
+        # Opcjonalny szybki detektor (np. ClassicalDetector) zawężający obraz do obszaru z otolitami
+        self.roi_detector = roi_detector
+        self._model = None
+
+    def _load_model(self):
+        """Leniwe ładowanie modelu (ultralytics importowany dopiero przy pierwszej detekcji)"""
+        if self._model is None:
+            from ultralytics import YOLO
+            self._model = YOLO(self.model_path)
+        return self._model
+
+    def inference_params(self):
+        """Parametry inferencji wpływające na wynik detekcji"""
+        params = {'imgsz': self.imgsz, 'conf': self.conf, 'iou': self.iou}
+        if self.roi_detector is not None:
+            params['roi'] = self.roi_detector.inference_params()
+        return params
 
     def detect_objects(self, image):
-        pass
\ No newline at end of file
+        """Zwraca tablicę (N, 5) z boxami [x1, y1, x2, y2, conf] we współrzędnych obrazu"""
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(image, self.model_path, self.inference_params())
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        offset_x = offset_y = 0
+        if self.roi_detector is not None:
+            roi = self.roi_detector.region_of_interest(image)
+            if roi is not None:
+                # Puste brzegi tabliczki nie zajmują rozdzielczości wejścia sieci (imgsz)
+                offset_x, offset_y, x2, y2 = roi
+                image = image[offset_y:y2, offset_x:x2]
+
+        results = self._load_model()(image, imgsz=self.imgsz, conf=self.conf, iou=self.iou,
+                                     device=self.device, verbose=False)
+        boxes = results[0].boxes
+        detections = np.hstack([
+            boxes.xyxy.cpu().numpy().reshape(-1, 4),
+            boxes.conf.cpu().numpy().reshape(-1, 1)
+        ]).astype(np.float32)
+        detections[:, [0, 2]] += offset_x
+        detections[:, [1, 3]] += offset_y
+
+        if key is not None:
+            self.cache.put(key, detections)
+        return detections
@@ -0,0 +1,72 @@
+import os
+import io
+import atexit
+import time
+import pstats
+import cProfile
+from typing import Callable, Optional, Tuple
+
+REPORT_LINES = 40  # Liczba funkcji w raporcie tekstowym
+
+
+class SessionProfiler:
+    """Profiler cProfile pętli głównej, włączany klawiszem P lub flagą --profile.
+
+    Po zatrzymaniu zapisuje <czas>_<tabliczka>_<boxy>b.prof (do snakeviz / gprof2dot / pstats)
+    oraz .txt z funkcjami posortowanymi po czasie skumulowanym. Profilowany jest tylko wątek
+    główny - zapis wycinków i detekcja w wątkach tła nie są uwzględniane.
+    """
+
+    def __init__(self, report_dir: str = "profiles", context: Optional[Callable[[], Tuple[str, int]]] = None):
+        self.report_dir = report_dir
+        # context() zwraca (nazwa tabliczki, liczba boxów) - ustawiane przez ImageWindow
+        self.context = context
+        self._profile: Optional[cProfile.Profile] = None
+        self._started_at = 0.0
+        self._atexit_registered = False
+
+    @property
+    def active(self) -> bool:
+        return self._profile is not None
+
+    def start(self) -> None:
+        if self._profile is not None:
+            return
+        self._profile = cProfile.Profile()
+        self._started_at = time.perf_counter()
+        self._profile.enable()
+        if not self._atexit_registered:
+            # ESC kończy program przez sys.exit() - raport i tak zostanie zapisany
+            atexit.register(self.stop)
+            self._atexit_registered = True
+        print("Profilowanie włączone (P - zatrzymaj i zapisz raport)")
+
+    def stop(self) -> Optional[str]:
+        """Zatrzymuje profilowanie i zapisuje raport; zwraca ścieżkę pliku .prof"""
+        if self._profile is None:
+            return None
+        self._profile.disable()
+        profile, self._profile = self._profile, None
+        elapsed = time.perf_counter() - self._started_at
+
+        plate, box_count = self.context() if self.context is not None else (None, 0)
+        os.makedirs(self.report_dir, exist_ok=True)
+        stem = f"{time.strftime('%Y%m%d_%H%M%S')}_{plate or 'brak'}_{box_count}b"
+        path = os.path.join(self.report_dir, stem + ".prof")
+        profile.dump_stats(path)
+
+        summary = io.StringIO()
+        summary.write(f"Tabliczka: {plate}, boxów: {box_count}, czas profilowania: {elapsed:.1f} s\n\n")
+        pstats.Stats(profile, stream=summary).sort_stats("cumulative").print_stats(REPORT_LINES)
+        with open(os.path.join(self.report_dir, stem + ".txt"), "w", encoding="utf-8") as f:
+            f.write(summary.getvalue())
+        print(f"Zapisano profil: {path}")
+        return path
+
+    def toggle(self) -> bool:
+        """Włącza lub wyłącza profilowanie; zwraca True, gdy profiler działa"""
+        if self.active:
+            self.stop()
+        else:
+            self.start()
+        return self.active
@@ -0,0 +1,322 @@
+import re
+import time
+import sqlite3
+import argparse
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from bounding_box import BoundingBox
+    from row_detector import RowLine
+    from image_cropper import CropResult
+
+# Nazwy zdjęć w stylu TUR_BITS_2016_Q1_1 - rok i kwartał trafiają do osobnych kolumn
+PLATE_NAME_PATTERN = re.compile(r"(?P<year>(19|20)\d{2})_Q(?P<quarter>[1-4])")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS plates (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    path TEXT,
+    year INTEGER,
+    quarter INTEGER,
+    width INTEGER,
+    height INTEGER,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_plates_year ON plates(year, quarter);
+
+CREATE TABLE IF NOT EXISTS rows (
+    id INTEGER PRIMARY KEY,
+    plate_id INTEGER NOT NULL REFERENCES plates(id) ON DELETE CASCADE,
+    row_index INTEGER NOT NULL,
+    uid TEXT,
+    slope REAL,
+    intercept REAL,
+    locked INTEGER NOT NULL DEFAULT 0,
+    box_count INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (plate_id, row_index)
+);
+CREATE INDEX IF NOT EXISTS idx_rows_box_count ON rows(box_count);
+
+CREATE TABLE IF NOT EXISTS boxes (
+    id INTEGER PRIMARY KEY,
+    plate_id INTEGER NOT NULL REFERENCES plates(id) ON DELETE CASCADE,
+    uid TEXT,
+    row_index INTEGER,
+    x1 REAL NOT NULL, y1 REAL NOT NULL, x2 REAL NOT NULL, y2 REAL NOT NULL,
+    label TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_boxes_plate_row ON boxes(plate_id, row_index);
+
+CREATE TABLE IF NOT EXISTS crops (
+    id INTEGER PRIMARY KEY,
+    plate_id INTEGER NOT NULL REFERENCES plates(id) ON DELETE CASCADE,
+    row_index INTEGER NOT NULL,
+    box_index INTEGER NOT NULL,
+    x1 INTEGER, y1 INTEGER, x2 INTEGER, y2 INTEGER,
+    filename TEXT NOT NULL,
+    location TEXT,
+    created_at REAL,
+    UNIQUE (plate_id, row_index, box_index)
+);
+
+CREATE TABLE IF NOT EXISTS dataset_splits (
+    dataset TEXT NOT NULL,
+    plate_id INTEGER NOT NULL REFERENCES plates(id) ON DELETE CASCADE,
+    split TEXT NOT NULL,
+    PRIMARY KEY (dataset, plate_id)
+);
+"""
+
+RTREE_SCHEMA = "CREATE VIRTUAL TABLE IF NOT EXISTS boxes_rtree USING rtree(id, min_x, max_x, min_y, max_y)"
+# Bez modułu R*Tree w SQLite - zwykły indeks złożony po współrzędnych
+FALLBACK_SPATIAL_INDEX = "CREATE INDEX IF NOT EXISTS idx_boxes_extent ON boxes(plate_id, x1, y1)"
+
+
+def parse_plate_name(name: str):
+    """Zwraca (rok, kwartał) z nazwy tabliczki albo (None, None)"""
+    match = PLATE_NAME_PATTERN.search(name)
+    if not match:
+        return None, None
+    return int(match.group('year')), int(match.group('quarter'))
+
+
+class ProjectStore:
+    """Baza projektu (SQLite, WAL): tabliczki, boxy, wiersze i wycinki z indeksami.
+
+    Boxy i wycinki zapisywane są we współrzędnych oryginalnego zdjęcia. Każda operacja
+    zapisu to jedna transakcja z executemany; batch() łączy wiele operacji w jedną.
+    Połączenie współdzielą wątki (wycinanie w tle), dostęp chroni blokada.
+    """
+
+    def __init__(self, db_path: str = "project.sqlite"):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        try:
+            self._conn.execute(RTREE_SCHEMA)
+            self.has_rtree = True
+        except sqlite3.OperationalError:
+            self._conn.execute(FALLBACK_SPATIAL_INDEX)
+            self.has_rtree = False
+        self._depth = 0
+
+    @contextmanager
+    def batch(self):
+        """Transakcja obejmująca wszystkie operacje w bloku (zagnieżdżone bloki dołączają do zewnętrznej)"""
+        with self._lock:
+            if self._depth == 0:
+                self._conn.execute("BEGIN IMMEDIATE")
+            self._depth += 1
+            try:
+                yield self._conn
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._conn.execute("ROLLBACK")
+                raise
+            self._depth -= 1
+            if self._depth == 0:
+                self._conn.execute("COMMIT")
+
+    def upsert_plate(self, name: str, path: Optional[str] = None,
+                     width: Optional[int] = None, height: Optional[int] = None) -> int:
+        year, quarter = parse_plate_name(name)
+        with self.batch() as conn:
+            conn.execute("""
+                INSERT INTO plates (name, path, year, quarter, width, height, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET
+                    path = COALESCE(excluded.path, path),
+                    width = COALESCE(excluded.width, width),
+                    height = COALESCE(excluded.height, height),
+                    updated_at = excluded.updated_at
+            """, (name, path, year, quarter, width, height, time.time()))
+            return conn.execute("SELECT id FROM plates WHERE name = ?", (name,)).fetchone()[0]
+
+    def save_annotations(self, plate: str, boxes: Sequence['BoundingBox'], rows: Sequence['RowLine'],
+                         scale: float = 1.0, path: Optional[str] = None,
+                         size: Optional[tuple] = None) -> None:
+        """Zastępuje boxy i wiersze tabliczki (rows w kolejności indeksów wierszy, jak przy wycinaniu).
+
+        Współrzędne podglądu dzielone są przez scale, więc w bazie są współrzędne oryginału.
+        """
+        factor = 1.0 / scale if scale else 1.0
+        row_of = {}
+        row_records = []
+        for row_index, row in enumerate(rows):
+            for box in row.boxes:
+                row_of[id(box)] = row_index
+            row_records.append((row_index, row.id, float(row.slope), float(row.intercept) * factor,
+                                int(row.locked), len(row.boxes)))
+
+        box_records = [(box.id, row_of.get(id(box)), box.x1 * factor, box.y1 * factor,
+                        box.x2 * factor, box.y2 * factor, box.label) for box in boxes]
+
+        width, height = size if size else (None, None)
+        with self.batch() as conn:
+            plate_id = self.upsert_plate(plate, path, width, height)
+            if self.has_rtree:
+                conn.execute("DELETE FROM boxes_rtree WHERE id IN (SELECT id FROM boxes WHERE plate_id = ?)",
+                             (plate_id,))
+            conn.execute("DELETE FROM boxes WHERE plate_id = ?", (plate_id,))
+            conn.execute("DELETE FROM rows WHERE plate_id = ?", (plate_id,))
+            conn.executemany(
+                "INSERT INTO rows (plate_id, row_index, uid, slope, intercept, locked, box_count) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(plate_id, *record) for record in row_records])
+            conn.executemany(
+                "INSERT INTO boxes (plate_id, uid, row_index, x1, y1, x2, y2, label) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(plate_id, *record) for record in box_records])
+            if self.has_rtree:
+                conn.execute("""
+                    INSERT INTO boxes_rtree (id, min_x, max_x, min_y, max_y)
+                    SELECT id, x1, x2, y1, y2 FROM boxes WHERE plate_id = ?
+                """, (plate_id,))
+
+    def record_crops(self, plate: Optional[str], crops: Sequence['CropResult'], sink=None) -> None:
+        """Zastępuje listę wycinków tabliczki (wywoływane przez ImageCropper po zapisie)"""
+        plate = plate or "plate"
+        now = time.time()
+        records = [(crop.row_index, crop.box_index, *crop.original_coords, crop.filename,
+                    sink.location(plate, crop.filename) if sink is not None else None, now)
+                   for crop in crops]
+        with self.batch() as conn:
+            plate_id = self.upsert_plate(plate)
+            conn.execute("DELETE FROM crops WHERE plate_id = ?", (plate_id,))
+            conn.executemany(
+                "INSERT INTO crops (plate_id, row_index, box_index, x1, y1, x2, y2, filename, location, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(plate_id, *record) for record in records])
+
+    def record_splits(self, dataset: str, splits: Dict[str, str], paths: Optional[Dict[str, str]] = None) -> None:
+        """Zastępuje przydział tabliczek do podzbiorów (train/val/test) zbioru danych dataset"""
+        paths = paths or {}
+        now = time.time()
+        plates = [(name, paths.get(name), *parse_plate_name(name), now) for name in splits]
+        with self.batch() as conn:
+            conn.executemany("""
+                INSERT INTO plates (name, path, year, quarter, updated_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET path = COALESCE(excluded.path, path)
+            """, plates)
+            conn.execute("DELETE FROM dataset_splits WHERE dataset = ?", (dataset,))
+            conn.executemany(
+                "INSERT INTO dataset_splits (dataset, plate_id, split) SELECT ?, id, ? FROM plates WHERE name = ?",
+                [(dataset, split, name) for name, split in splits.items()])
+
+    def dataset_splits(self, dataset: str) -> Dict[str, str]:
+        """Przydział tabliczek do podzbiorów zapisany przez record_splits (nazwa -> podzbiór)"""
+        with self._lock:
+            return {row['name']: row['split'] for row in self._conn.execute("""
+                SELECT p.name, s.split FROM dataset_splits s JOIN plates p ON p.id = s.plate_id
+                WHERE s.dataset = ?
+            """, (dataset,))}
+
+    def plate_names(self, year: Optional[int] = None, quarter: Optional[int] = None) -> List[str]:
+        """Nazwy tabliczek z danego roku i kwartału (indeks idx_plates_year)"""
+        conditions, params = [], []
+        if year is not None:
+            conditions.append("year = ?")
+            params.append(year)
+        if quarter is not None:
+            conditions.append("quarter = ?")
+            params.append(quarter)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            return [row[0] for row in self._conn.execute(f"SELECT name FROM plates {where} ORDER BY name", params)]
+
+    def query_crops(self, year: Optional[int] = None, quarter: Optional[int] = None,
+                    min_row_boxes: Optional[int] = None, plate: Optional[str] = None) -> List[Dict]:
+        """Wycinki spełniające warunki, np. rok 2016, Q1, wiersze z więcej niż 10 boxami"""
+        conditions, params = [], []
+        if year is not None:
+            conditions.append("p.year = ?")
+            params.append(year)
+        if quarter is not None:
+            conditions.append("p.quarter = ?")
+            params.append(quarter)
+        if plate is not None:
+            conditions.append("p.name = ?")
+            params.append(plate)
+        if min_row_boxes is not None:
+            conditions.append("r.box_count > ?")
+            params.append(min_row_boxes)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        join = "JOIN" if min_row_boxes is not None else "LEFT JOIN"
+        sql = f"""
+            SELECT p.name AS plate, c.row_index, c.box_index, c.x1, c.y1, c.x2, c.y2,
+                   c.filename, c.location, r.box_count AS row_box_count
+            FROM crops c
+            JOIN plates p ON p.id = c.plate_id
+            {join} rows r ON r.plate_id = c.plate_id AND r.row_index = c.row_index
+            {where}
+            ORDER BY p.name, c.row_index, c.box_index
+        """
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def boxes_in_region(self, plate: str, x1: float, y1: float, x2: float, y2: float) -> List[Dict]:
+        """Boxy tabliczki przecinające prostokąt (współrzędne oryginału)"""
+        with self._lock:
+            if self.has_rtree:
+                sql = """
+                    SELECT b.* FROM boxes_rtree t
+                    JOIN boxes b ON b.id = t.id
+                    JOIN plates p ON p.id = b.plate_id
+                    WHERE t.max_x >= ? AND t.min_x <= ? AND t.max_y >= ? AND t.min_y <= ? AND p.name = ?
+                """
+            else:
+                sql = """
+                    SELECT b.* FROM boxes b JOIN plates p ON p.id = b.plate_id
+                    WHERE b.x2 >= ? AND b.x1 <= ? AND b.y2 >= ? AND b.y1 <= ? AND p.name = ?
+                """
+            return [dict(row) for row in self._conn.execute(sql, (x1, x2, y1, y2, plate))]
+
+    def plates(self) -> List[Dict]:
+        """Tabliczki z liczbą boxów, wierszy i wycinków"""
+        with self._lock:
+            return [dict(row) for row in self._conn.execute("""
+                SELECT p.*,
+                       (SELECT COUNT(*) FROM boxes b WHERE b.plate_id = p.id) AS boxes,
+                       (SELECT COUNT(*) FROM rows r WHERE r.plate_id = p.id) AS rows,
+                       (SELECT COUNT(*) FROM crops c WHERE c.plate_id = p.id) AS crops
+                FROM plates p ORDER BY p.name
+            """)]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Zapytania do bazy projektu")
+    parser.add_argument("--db", type=str, default="project.sqlite", help="Plik bazy projektu")
+    parser.add_argument("--year", type=int, default=None, help="Rok (z nazwy zdjęcia)")
+    parser.add_argument("--quarter", type=int, default=None, help="Kwartał (z nazwy zdjęcia)")
+    parser.add_argument("--min-row-boxes", type=int, default=None, help="Tylko wiersze z większą liczbą boxów")
+    parser.add_argument("--plates", action="store_true", help="Lista tabliczek zamiast wycinków")
+    args = parser.parse_args()
+
+    store = ProjectStore(args.db)
+    start = time.perf_counter()
+    if args.plates:
+        results = store.plates()
+    else:
+        results = store.query_crops(args.year, args.quarter, args.min_row_boxes)
+    elapsed = (time.perf_counter() - start) * 1000
+    for row in results:
+        print(row)
+    print(f"{len(results)} wyników w {elapsed:.1f} ms")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ from typing import List, Optional, Tuple, Set
 from dataclasses import dataclass
 import uuid
 from enum import Enum, auto
+from row_manager import RowManager
 
 
 class RowEditMode(Enum):
@@ -38,7 +39,7 @@ class RowLine:
 class RowDetector:
     def __init__(self, bbox_manager):
         self.bbox_manager = bbox_manager
-        self.rows: List[RowLine] = []
+        self.row_manager = RowManager()  # Wiersze od góry do dołu, wspólne z rysowaniem i ImageCropper
         self.edit_mode = RowEditMode.NONE
         self.selected_row: Optional[RowLine] = None
         self.drag_start: Optional[Tuple[int, int]] = None
@@ -52,6 +53,14 @@ class RowDetector:
         self.x_grouping_threshold = 1.5  # 1.5 szerokości boxu
         self.debug_mode = False  # Tryb debugowania
 
+    @property
+    def rows(self) -> RowManager:
+        return self.row_manager
+
+    @rows.setter
+    def rows(self, rows) -> None:
+        self.row_manager.reset(rows)
+
     def set_edit_mode(self, mode: RowEditMode) -> bool:
         """Ustawia tryb edycji linii. Zwraca True jeśli zmiana się powiodła."""
         if isinstance(mode, RowEditMode):
@@ -60,7 +69,7 @@ class RowDetector:
             return True
         return False
 
-    def detect_rows(self) -> List[RowLine]:
+    def detect_rows(self) -> RowManager:
         """
         Główna metoda wykrywająca wiersze. Algorytm:
         1. Sortuje boxy od góry do dołu obrazu
@@ -161,7 +170,7 @@ class RowDetector:
             )
 
             if closest_row:
-                closest_row.boxes.append(box)
+                self.row_manager.add_box(closest_row, box)
                 self._update_line_endpoints(closest_row)
                 if self.debug_mode:
                     print(f"Debug: Przypisano box {box.id} do wiersza {closest_row.id}")
@@ -248,6 +257,7 @@ class RowDetector:
         if self.selected_row:
             self.selected_row.locked = True
             self._update_line_from_points()
+            self.row_manager.update_row(self.selected_row)
             self._reset_selection()
             return True
         return False
@@ -263,7 +273,7 @@ class RowDetector:
             p2=(x + 100, y),
             color=(0, 255, 255)  # Żółty dla nowo dodanych linii
         )
-        self.rows.append(new_row)
+        self.row_manager.add_row(new_row)
         self.selected_row = new_row
         self.drag_type = 'p2'
         self.drag_start = (x, y)
@@ -378,7 +388,7 @@ class RowDetector:
 
         # Sprawdź przecięcia z istniejącymi liniami
         if not self._check_line_intersections(new_row, [r for r in self.rows if r.locked]):
-            self.rows.append(new_row)
+            self.row_manager.add_row(new_row)
         elif self.debug_mode:
             print(f"Debug: Odrzucono linię z powodu przecięcia (ID: {new_row.id})")
 
@@ -1,10 +1,139 @@
+import bisect
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from row_detector import RowLine
+    from bounding_box import BoundingBox
+
+
+def row_sort_key(row: 'RowLine') -> float:
+    """Klucz kolejności wierszy od góry do dołu (indeks wiersza wycinków i bazy projektu)"""
+    return row.intercept if abs(row.slope) < 0.01 else min((b.y1 for b in row.boxes), default=row.intercept)
+
+
+def box_sort_key(box: 'BoundingBox') -> float:
+    """Klucz kolejności boxów w wierszu - od lewej do prawej po środku boxa"""
+    return (box.x1 + box.x2) / 2
+
+
 class RowManager:
-    def __init__(self):
-        self.rows = []
+    """Uporządkowany zbiór wierszy: od góry do dołu, a boxy w każdym wierszu od lewej do prawej.
+
+    Obok listy wierszy trzymana jest równoległa lista kluczy row_sort_key, więc pozycję
+    wiersza wyznacza bisect. RowDetector, rysowanie, ImageCropper i baza projektu korzystają
+    z tej samej kolejności i nie sortują już wierszy ani boxów. Po zmianie linii lub boxów
+    w miejscu należy wywołać update_row() / update_box().
+
+    Słownik id boxa -> wiersz pozwala znaleźć wiersz boxa w O(1) przy przesunięciu, zmianie
+    rozmiaru, cofaniu i ponawianiu.
+    """
+
+    def __init__(self, rows: Optional[Iterable['RowLine']] = None):
+        self._rows: List['RowLine'] = []
+        self._keys: List[float] = []
+        self._box_rows: Dict[str, 'RowLine'] = {}
+        self.reset(rows or [])
+
+    def reset(self, rows: Iterable['RowLine']) -> None:
+        """Zastępuje zawartość (np. po odtworzeniu sesji) - jedno sortowanie zamiast n wstawień"""
+        rows = list(rows)
+        for row in rows:
+            row.boxes.sort(key=box_sort_key)
+        pairs = sorted(((row_sort_key(row), i) for i, row in enumerate(rows)))
+        self._keys = [key for key, _ in pairs]
+        self._rows = [rows[i] for _, i in pairs]
+        self._box_rows = {box.id: row for row in self._rows for box in row.boxes}
+
+    def add_row(self, row: 'RowLine') -> int:
+        """Wstawia wiersz na właściwą pozycję; zwraca jego indeks"""
+        row.boxes.sort(key=box_sort_key)
+        key = row_sort_key(row)
+        index = bisect.bisect_right(self._keys, key)
+        self._keys.insert(index, key)
+        self._rows.insert(index, row)
+        self._box_rows.update((box.id, row) for box in row.boxes)
+        return index
+
+    def remove_row(self, row: 'RowLine') -> bool:
+        index = self._find(row)
+        if index is None:
+            return False
+        del self._keys[index]
+        del self._rows[index]
+        for box in row.boxes:
+            if self._box_rows.get(box.id) is row:
+                del self._box_rows[box.id]
+        return True
+
+    def update_row(self, row: 'RowLine') -> None:
+        """Przesuwa wiersz na właściwą pozycję po zmianie linii lub jego boxów"""
+        if self.remove_row(row):
+            self.add_row(row)
+
+    def add_box(self, row: 'RowLine', box: 'BoundingBox') -> None:
+        """Dodaje box do wiersza z zachowaniem kolejności od lewej do prawej"""
+        bisect.insort(row.boxes, box, key=box_sort_key)
+        self._box_rows[box.id] = row
+        self.update_row(row)
+
+    def update_box(self, box: 'BoundingBox') -> None:
+        """Przywraca kolejność po przesunięciu lub zmianie rozmiaru boxa"""
+        found = self.find_box(box)
+        if found is not None:
+            row = found[0]
+            row.boxes.sort(key=box_sort_key)
+            self.update_row(row)
+
+    def find_box(self, box: 'BoundingBox') -> Optional[Tuple['RowLine', int]]:
+        """Wiersz zawierający box i pozycja boxa w tym wierszu; None - box poza wierszami"""
+        row = self._box_rows.get(box.id)
+        if row is None:
+            return None
+        for i, b in enumerate(row.boxes):
+            if b is box:
+                return row, i
+        # Box usunięty z wiersza w miejscu (update_row przeindeksował tylko pozostałe boxy)
+        del self._box_rows[box.id]
+        return None
+
+    def index(self, row: 'RowLine') -> int:
+        index = self._find(row)
+        if index is None:
+            raise ValueError("Wiersz nie należy do RowManager")
+        return index
+
+    def clear(self) -> None:
+        self._rows.clear()
+        self._keys.clear()
+        self._box_rows.clear()
+
+    @property
+    def rows(self) -> List['RowLine']:
+        """Wiersze od góry do dołu (lista tylko do odczytu - zmiany przez add_row/remove_row)"""
+        return self._rows
+
+    def _find(self, row: 'RowLine') -> Optional[int]:
+        # RowLine to dataclass (== porównuje wartości) - wiersz wyszukiwany po tożsamości
+        key = row_sort_key(row)
+        lo = bisect.bisect_left(self._keys, key)
+        hi = bisect.bisect_right(self._keys, key, lo)
+        for i in range(lo, hi):
+            if self._rows[i] is row:
+                return i
+        # Klucz nieaktualny (wiersz zmieniony w miejscu bez update_row)
+        for i, candidate in enumerate(self._rows):
+            if candidate is row:
+                return i
+        return None
+
+    def __iter__(self) -> Iterator['RowLine']:
+        return iter(self._rows)
 
+    def __len__(self) -> int:
+        return len(self._rows)
 
-    def add_row(self, row):
-        pass
+    def __getitem__(self, index):
+        return self._rows[index]
 
-    def remove_row(self, row):
-        pass
\ No newline at end of file
+    def __contains__(self, row) -> bool:
+        return self._find(row) is not None
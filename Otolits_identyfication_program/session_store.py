@@ -0,0 +1,265 @@
+import os
+import json
+import time
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from bounding_box import BoundingBox
+from row_detector import RowLine
+
+SESSION_VERSION = 1
+COMPACT_AFTER = 1000  # Liczba wpisów dziennika, po której zapisywany jest pełny zrzut
+
+
+@dataclass
+class Session:
+    boxes: List[BoundingBox]
+    rows: List[RowLine]
+
+
+def snapshot(boxes: List[BoundingBox], rows: List[RowLine], scale: float) -> Dict[str, np.ndarray]:
+    """Kolumnowy zrzut stanu tabliczki (wywoływany w wątku głównym, zapis odbywa się w tle).
+
+    Boxy to tablica (N, 4); przynależność do wierszy zapisana jest jak w macierzy CSR:
+    row_boxes zawiera indeksy boxów kolejnych wierszy, a row_offsets ich granice.
+    """
+    box_index = {id(box): i for i, box in enumerate(boxes)}
+    coords = np.array([(b.x1, b.y1, b.x2, b.y2) for b in boxes], dtype=np.float32).reshape(-1, 4)
+
+    row_params = np.full((len(rows), 6), np.nan, dtype=np.float64)
+    row_boxes = []
+    row_offsets = [0]
+    for i, row in enumerate(rows):
+        row_params[i, :2] = (row.slope, row.intercept)
+        if row.p1 and row.p2:
+            row_params[i, 2:] = (*row.p1, *row.p2)
+        row_boxes.extend(box_index[id(b)] for b in row.boxes if id(b) in box_index)
+        row_offsets.append(len(row_boxes))
+
+    meta = {
+        'version': SESSION_VERSION,
+        'scale': scale,
+        'box_ids': [b.id for b in boxes],
+        'labels': [b.label for b in boxes] if any(b.label is not None for b in boxes) else None,
+        'row_ids': [row.id for row in rows],
+    }
+    return {
+        'boxes': coords,
+        'row_params': row_params,
+        'row_locked': np.array([row.locked for row in rows], dtype=np.bool_),
+        'row_colors': np.array([row.color for row in rows], dtype=np.uint8).reshape(-1, 3),
+        'row_boxes': np.array(row_boxes, dtype=np.int32),
+        'row_offsets': np.array(row_offsets, dtype=np.int32),
+        'meta': np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8),
+    }
+
+
+class SessionStore:
+    """Zapis i odczyt sesji (boxy i wiersze) osobno dla każdej tabliczki.
+
+    Pliki <plate>.npz zapisywane są atomowo (plik tymczasowy + os.replace) w wątku tła.
+    mark_dirty() tylko zapamiętuje zmianę, a poll() wywoływany w pętli głównej zleca zapis
+    dopiero po debounce sekundach bez kolejnych zmian.
+
+    Drobne edycje (rekordy z EditJournal) dopisywane są do <plate>.journal zamiast
+    ponownego zapisu całego zrzutu; load() odtwarza zrzut i dogrywa dziennik.
+    """
+
+    def __init__(self, session_dir: str = "sessions", debounce: float = 1.0):
+        self.session_dir = session_dir
+        self.debounce = debounce
+        os.makedirs(session_dir, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session")
+        self._lock = threading.Lock()
+        self._dirty: Dict[str, float] = {}  # tabliczka -> czas ostatniej zmiany
+        self._pending: Dict[str, List[dict]] = {}  # rekordy dziennika czekające na dopisanie
+        self._pending_since: Dict[str, float] = {}
+        self._journal_lines: Dict[str, int] = {}
+        self._last_write: Optional[Future] = None
+
+    def path_for(self, plate: str) -> str:
+        return os.path.join(self.session_dir, f"{plate}.npz")
+
+    def journal_path_for(self, plate: str) -> str:
+        return os.path.join(self.session_dir, f"{plate}.journal")
+
+    def exists(self, plate: Optional[str]) -> bool:
+        return plate is not None and os.path.exists(self.path_for(plate))
+
+    def record(self, plate: Optional[str], records: Optional[List[dict]], scale: float) -> None:
+        """Przyjmuje zmianę z EditJournal; bez zwartego zapisu (None) lub bez zrzutu bazowego - pełny zapis"""
+        if plate is None:
+            return
+        if records is None or plate in self._dirty or not self.exists(plate):
+            self.mark_dirty(plate)
+            return
+        self._pending.setdefault(plate, []).extend(dict(record, s=scale) for record in records)
+        self._pending_since[plate] = time.monotonic()
+
+    def mark_dirty(self, plate: Optional[str]) -> None:
+        if plate is not None:
+            self._dirty[plate] = time.monotonic()
+
+    def is_dirty(self, plate: Optional[str]) -> bool:
+        return plate in self._dirty or plate in self._pending
+
+    def poll(self, plate: Optional[str], boxes: List[BoundingBox], rows: List[RowLine], scale: float) -> bool:
+        """Zleca zapis, jeśli od ostatniej zmiany minęło debounce sekund; zwraca True po zleceniu"""
+        changed_at = self._dirty.get(plate, self._pending_since.get(plate))
+        if changed_at is None or time.monotonic() - changed_at < self.debounce:
+            return False
+        if plate in self._dirty:
+            self.save_async(plate, boxes, rows, scale)
+        else:
+            self._append_pending(plate)
+        return True
+
+    def _append_pending(self, plate: str) -> None:
+        records = self._pending.pop(plate, [])
+        self._pending_since.pop(plate, None)
+        if not records:
+            return
+        self._journal_lines[plate] = self._journal_lines.get(plate, 0) + len(records)
+        if self._journal_lines[plate] > COMPACT_AFTER:
+            # Zbyt długi dziennik - następny zapis będzie pełnym zrzutem
+            self.mark_dirty(plate)
+        self._last_write = self._executor.submit(self._append, plate, records)
+
+    def save_async(self, plate: str, boxes: List[BoundingBox], rows: List[RowLine], scale: float) -> Future:
+        """Robi zrzut od razu (wątek główny), a kodowanie i zapis na dysk wykonuje w tle"""
+        self._dirty.pop(plate, None)
+        # Zrzut obejmuje też niezapisane rekordy dziennika
+        self._pending.pop(plate, None)
+        self._pending_since.pop(plate, None)
+        self._journal_lines[plate] = 0
+        arrays = snapshot(boxes, rows, scale)
+        self._last_write = self._executor.submit(self._write, plate, arrays)
+        return self._last_write
+
+    def flush(self, plate: Optional[str], boxes: List[BoundingBox], rows: List[RowLine], scale: float) -> None:
+        """Natychmiastowy zapis niezapisanych zmian (zmiana zdjęcia, wyjście) i czekanie na zakończenie"""
+        if plate in self._dirty:
+            self.save_async(plate, boxes, rows, scale)
+        elif plate in self._pending:
+            self._append_pending(plate)
+        if self._last_write is not None:
+            self._last_write.result()
+
+    def _write(self, plate: str, arrays: Dict[str, np.ndarray]) -> str:
+        path = self.path_for(plate)
+        tmp_path = path + ".tmp"
+        with self._lock:
+            # Bez kompresji - zapis i odczyt 2000 boxów to ułamek milisekundy
+            with open(tmp_path, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, path)
+            # Dziennik zawiera wyłącznie zmiany już ujęte w nowym zrzucie
+            try:
+                os.remove(self.journal_path_for(plate))
+            except FileNotFoundError:
+                pass
+        return path
+
+    def _append(self, plate: str, records: List[dict]) -> None:
+        with self._lock, open(self.journal_path_for(plate), "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(record, separators=(',', ':')) + "\n" for record in records))
+
+    def load(self, plate: Optional[str], scale: float = 1.0) -> Optional[Session]:
+        """Odtwarza boxy i wiersze tabliczki; współrzędne przeliczane są do bieżącej skali podglądu"""
+        if not self.exists(plate):
+            return None
+        with self._lock:
+            with np.load(self.path_for(plate)) as data:
+                arrays = {key: data[key] for key in data.files}
+            journal = []
+            if os.path.exists(self.journal_path_for(plate)):
+                with open(self.journal_path_for(plate), "r", encoding="utf-8") as f:
+                    journal = [json.loads(line) for line in f if line.strip()]
+
+        meta = json.loads(arrays['meta'].tobytes().decode('utf-8'))
+        factor = scale / meta['scale'] if meta['scale'] else 1.0
+        coords = arrays['boxes'].astype(np.float64) * factor
+        labels = meta['labels'] or [None] * len(coords)
+
+        box_ids = meta.get('box_ids') or [None] * len(coords)
+
+        boxes = []
+        for (x1, y1, x2, y2), label, box_id in zip(coords.tolist(), labels, box_ids):
+            try:
+                boxes.append(BoundingBox(x1, y1, x2, y2, label))
+                if box_id is not None:
+                    boxes[-1].id = box_id
+            except ValueError:
+                # Box zdegenerowany po przeskalowaniu - pomijamy, ale zachowujemy indeksy
+                boxes.append(None)
+
+        rows = []
+        offsets = arrays['row_offsets']
+        for i, row_id in enumerate(meta['row_ids']):
+            slope, intercept, p1x, p1y, p2x, p2y = arrays['row_params'][i].tolist()
+            members = [boxes[j] for j in arrays['row_boxes'][offsets[i]:offsets[i + 1]] if boxes[j] is not None]
+            has_points = not np.isnan(p1x)
+            rows.append(RowLine(
+                slope=slope,
+                intercept=intercept * factor,
+                boxes=members,
+                id=row_id,
+                p1=(p1x * factor, p1y * factor) if has_points else None,
+                p2=(p2x * factor, p2y * factor) if has_points else None,
+                locked=bool(arrays['row_locked'][i]),
+                color=tuple(int(c) for c in arrays['row_colors'][i]),
+            ))
+        session = Session(boxes=[b for b in boxes if b is not None], rows=rows)
+        self._replay(session, journal, scale)
+        self._journal_lines[plate] = len(journal)
+        return session
+
+    @staticmethod
+    def _replay(session: Session, journal: List[dict], scale: float) -> None:
+        """Dogrywa rekordy dziennika (add/del/set po id boxa, row/row_del po id wiersza) na odtworzony zrzut"""
+        by_id = {box.id: box for box in session.boxes}
+        for record in journal:
+            factor = scale / record['s'] if record.get('s') else 1.0
+            op = record['op']
+            if op == 'add':
+                added = []
+                for box_id, x1, y1, x2, y2, *label in record['boxes']:
+                    # Dzienniki sprzed zapisu etykiety mają 5 pól
+                    box = BoundingBox(x1 * factor, y1 * factor, x2 * factor, y2 * factor, label[0] if label else None)
+                    box.id = box_id
+                    by_id[box_id] = box
+                    added.append(box)
+                at = record.get('at', len(session.boxes))
+                session.boxes[at:at] = added
+                if record.get('row') is not None:
+                    # Cofnięte usunięcie - box wraca na swoje miejsce w wierszu
+                    row = next((r for r in session.rows if r.id == record['row']), None)
+                    if row is not None:
+                        row_at = record.get('row_at', len(row.boxes))
+                        row.boxes[row_at:row_at] = added
+            elif op == 'del' and record['id'] in by_id:
+                box = by_id.pop(record['id'])
+                session.boxes.remove(box)
+                for row in session.rows:
+                    if box in row.boxes:
+                        row.boxes.remove(box)
+            elif op == 'set' and record['id'] in by_id:
+                by_id[record['id']].update(*(value * factor for value in record['c']))
+            elif op == 'row':
+                slope, intercept, p1, p2, locked = record['line']
+                row = next((r for r in session.rows if r.id == record['id']), None)
+                if row is None:
+                    # Linia dodana ręcznie - bez boxów
+                    row = RowLine(slope=slope, intercept=0.0, boxes=[], id=record['id'],
+                                  color=tuple(record.get('color', (0, 0, 255))))
+                    session.rows.append(row)
+                row.slope, row.intercept, row.locked = slope, intercept * factor, locked
+                row.p1 = (p1[0] * factor, p1[1] * factor) if p1 else None
+                row.p2 = (p2[0] * factor, p2[1] * factor) if p2 else None
+            elif op == 'row_del':
+                session.rows[:] = [r for r in session.rows if r.id != record['id']]
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,52 @@
+import cv2
+import numpy as np
+import pytest
+
+from Otolits_identyfication_program.YOLO.benchmark import (
+    match_detections, detection_metrics, mark_pareto, load_eval_images)
+
+
+def test_match_detections_is_greedy_by_score():
+    truth = np.array([[0, 0, 10, 10], [20, 0, 30, 10]], dtype=np.float32)
+    detections = np.array([
+        [0, 0, 10, 10, 0.5],    # Trafia pierwszy obiekt
+        [1, 0, 11, 10, 0.9],    # Wyższy wynik - zabiera pierwszy obiekt
+        [50, 50, 60, 60, 0.7],  # Fałszywy alarm
+    ], dtype=np.float32)
+    scores, tp = match_detections(detections, truth)
+    assert scores.tolist() == pytest.approx([0.9, 0.7, 0.5])
+    assert tp.tolist() == [True, False, False]
+
+    scores, tp = match_detections(np.zeros((0, 5), dtype=np.float32), truth)
+    assert len(scores) == 0 and len(tp) == 0
+
+def test_detection_metrics_precision_recall_and_ap():
+    scores = np.array([0.9, 0.8, 0.6, 0.1])
+    tp = np.array([True, False, True, True])
+    metrics = detection_metrics(scores, tp, n_truth=4, report_conf=0.5)
+    assert metrics["precision"] == pytest.approx(2 / 3)
+    assert metrics["recall"] == pytest.approx(0.5)
+    # Obwiednia precyzji: 1.0 do recall 0.25, potem 3/4 do recall 0.75
+    assert metrics["map50"] == pytest.approx(0.25 * 1.0 + 0.5 * 0.75)
+
+    perfect = detection_metrics(np.array([0.9, 0.8]), np.array([True, True]), n_truth=2)
+    assert perfect == {"precision": 1.0, "recall": 1.0, "map50": pytest.approx(1.0)}
+
+def test_mark_pareto_keeps_only_non_dominated_candidates():
+    reports = [
+        {"weights": "fast", "map50": 0.80, "latency_ms": {"p50": 10}},
+        {"weights": "accurate", "map50": 0.90, "latency_ms": {"p50": 40}},
+        {"weights": "dominated", "map50": 0.80, "latency_ms": {"p50": 20}},
+        {"weights": "tie", "map50": 0.80, "latency_ms": {"p50": 10}},
+    ]
+    mark_pareto(reports)
+    assert [r["weights"] for r in reports if r["pareto"]] == ["fast", "accurate", "tie"]
+
+def test_load_eval_images_skips_unreadable_and_fails_when_empty(tmp_path):
+    (tmp_path / "broken.jpg").write_bytes(b"not an image")
+    with pytest.raises(ValueError):
+        load_eval_images(str(tmp_path))
+
+    cv2.imwrite(str(tmp_path / "ok.png"), np.zeros((8, 8, 3), dtype=np.uint8))
+    images = load_eval_images(str(tmp_path))
+    assert [path.endswith("ok.png") for path, _ in images] == [True]
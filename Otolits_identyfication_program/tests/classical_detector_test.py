@@ -0,0 +1,60 @@
+import time
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+from Otolits_identyfication_program.classical_detector import ClassicalDetector
+from Otolits_identyfication_program.model_yolo import YOLOModel
+
+
+def _plate(bright=True, shape=(3000, 4000), rows=4, per_row=10):
+    rng = np.random.default_rng(0)
+    # Jasne otolity na ciemnym tle albo odwrotnie
+    low, high, foreground = (0, 60, 220) if bright else (190, 250, 30)
+    image = rng.integers(low, high, (*shape, 3), dtype=np.uint8)
+    boxes = []
+    for r in range(rows):
+        for c in range(per_row):
+            cx, cy = 800 + c * 280, 700 + r * 500
+            cv2.ellipse(image, (cx, cy), (100, 70), 0, 0, 360, (foreground,) * 3, -1)
+            boxes.append((cx - 100, cy - 70, cx + 100, cy + 70))
+    return image, np.array(boxes, dtype=np.float32)
+
+def _matched(detections, boxes, tolerance=40):
+    centers = (detections[:, :2] + detections[:, 2:4]) / 2
+    truth = (boxes[:, :2] + boxes[:, 2:]) / 2
+    distance = np.linalg.norm(centers[:, None] - truth[None], axis=2)
+    return int((distance.min(axis=0) < tolerance).sum())
+
+def test_detects_bright_and_dark_otoliths_fast():
+    detector = ClassicalDetector()
+    for bright in (True, False):
+        image, boxes = _plate(bright)
+        start = time.perf_counter()
+        detections = detector.detect_objects(image)
+        elapsed = time.perf_counter() - start
+
+        assert detections.shape == (len(boxes), 5) and detections.dtype == np.float32
+        assert _matched(detections, boxes) == len(boxes)
+        assert np.all((detections[:, 4] > 0) & (detections[:, 4] <= 1))
+        assert elapsed < 0.5
+
+def test_roi_prefilter_crops_yolo_input_and_offsets_results():
+    image, boxes = _plate()
+    seen_shapes = []
+
+    def fake_model(crop, **kwargs):
+        seen_shapes.append(crop.shape)
+        xyxy = np.array([[10, 20, 110, 160]], dtype=np.float32)
+        tensor = lambda a: SimpleNamespace(cpu=lambda: SimpleNamespace(numpy=lambda: a))
+        return [SimpleNamespace(boxes=SimpleNamespace(xyxy=tensor(xyxy), conf=tensor(np.array([0.9]))))]
+
+    model = YOLOModel("best.pt", roi_detector=ClassicalDetector())
+    model._model = fake_model
+    detections = model.detect_objects(image)
+
+    x1, y1, x2, y2 = ClassicalDetector().region_of_interest(image)
+    assert seen_shapes == [(y2 - y1, x2 - x1, 3)]
+    assert x2 - x1 < image.shape[1] and y2 - y1 < image.shape[0]
+    assert detections[0, :4].tolist() == [x1 + 10, y1 + 20, x1 + 110, y1 + 160]
@@ -0,0 +1,45 @@
+import numpy as np
+
+from Otolits_identyfication_program.bounding_box import BoundingBox
+from Otolits_identyfication_program.crop_archive import CropArchive, CropArchiveWriter
+from Otolits_identyfication_program.image_cropper import ImageCropper
+from Otolits_identyfication_program.row_detector import RowLine
+
+
+def _crop_plate(cropper, plate_name, seed):
+    image = np.random.RandomState(seed).randint(0, 255, (120, 200, 3), dtype=np.uint8)
+    rows = [RowLine(slope=0.0, intercept=30.0,
+                    boxes=[BoundingBox(10, 10, 50, 50), BoundingBox(100, 10, 150, 60)], id="r")]
+    return image, cropper.crop_and_save(image, rows, [], plate_name=plate_name)
+
+def test_archive_random_access_and_iteration(tmp_path):
+    writer = CropArchiveWriter(str(tmp_path), shard_size=1)  # każdy wycinek w osobnym shardzie
+    cropper = ImageCropper(str(tmp_path / "unused"), sink=writer)
+    image_a, results_a = _crop_plate(cropper, "plate_a", 0)
+    _crop_plate(cropper, "plate_b", 1)
+    cropper.shutdown()
+
+    archive = CropArchive(str(tmp_path))
+    assert len(archive) == 4
+    assert archive.keys()[0] == "plate_a/row_00_box_00"
+
+    record = archive.record("plate_a/row_00_box_01")
+    assert record.original_coords == results_a[1].original_coords
+    x1, y1, x2, y2 = record.original_coords
+    assert np.array_equal(archive.get("plate_a/row_00_box_01"), image_a[y1:y2, x1:x2])
+
+    assert [r.plate for r, _ in archive] == ["plate_a", "plate_a", "plate_b", "plate_b"]
+    assert len(archive.records("plate_b")) == 2
+    archive.close()
+
+def test_writer_appends_to_existing_archive(tmp_path):
+    for plate, seed in (("plate_a", 0), ("plate_b", 1)):
+        writer = CropArchiveWriter(str(tmp_path))
+        cropper = ImageCropper(str(tmp_path / "unused"), sink=writer)
+        _crop_plate(cropper, plate, seed)
+        cropper.shutdown()
+
+    archive = CropArchive(str(tmp_path))
+    assert len(archive) == 4
+    assert archive.get("plate_a/row_00_box_00").shape == (40, 40, 3)
+    archive.close()
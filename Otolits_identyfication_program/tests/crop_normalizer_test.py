@@ -0,0 +1,58 @@
+import os
+
+import numpy as np
+
+from Otolits_identyfication_program.bounding_box import BoundingBox
+from Otolits_identyfication_program.crop_normalizer import CropNormalizer, NormalizedCropDataset
+from Otolits_identyfication_program.image_cropper import ImageCropper
+from Otolits_identyfication_program.row_detector import RowLine
+
+
+def test_letterbox_keeps_aspect_ratio(tmp_path):
+    normalizer = CropNormalizer(str(tmp_path), size=32)
+    boxed = normalizer.letterbox(np.full((10, 40, 3), 200, dtype=np.uint8))
+
+    assert boxed.shape == (32, 32, 3)
+    assert (boxed[:12] == 0).all()
+    assert (boxed[12:20] == 200).all()
+    assert (boxed[20:] == 0).all()
+
+def test_cropper_writes_normalized_arrays(tmp_path):
+    normalizer = CropNormalizer(str(tmp_path / "npy"), size=16, dtype="float16", mean=(0.5,) * 3, std=(0.5,) * 3)
+    cropper = ImageCropper(str(tmp_path / "png"), normalizer=normalizer)
+    image = np.full((100, 200, 3), 255, dtype=np.uint8)
+    rows = [RowLine(slope=0.0, intercept=30.0, boxes=[BoundingBox(10, 10, 50, 50), BoundingBox(60, 10, 90, 70)], id="r")]
+    for plate in ("plate_a", "plate_b"):
+        cropper.crop_and_save(image, rows, [], plate_name=plate)
+    cropper.shutdown()
+
+    dataset = NormalizedCropDataset(str(tmp_path / "npy"))
+    assert len(dataset) == 4
+    crop, meta = dataset[3]
+    assert crop.dtype == np.float16
+    assert crop.shape == (16, 16, 3)
+    assert crop[8, 8, 0] == 1.0
+    assert meta['plate'] == "plate_b"
+    assert meta['box_index'] == "1"
+
+def test_unchanged_plate_is_not_normalized_again(tmp_path):
+    normalizer = CropNormalizer(str(tmp_path / "npy"), size=16)
+    cropper = ImageCropper(str(tmp_path / "png"), normalizer=normalizer)
+    image = np.full((100, 200, 3), 255, dtype=np.uint8)
+    boxes = [BoundingBox(10, 10, 50, 50), BoundingBox(60, 10, 90, 70)]
+    cropper.crop_and_save(image, [RowLine(slope=0.0, intercept=30.0, boxes=list(boxes), id="r")], [],
+                          plate_name="plate")
+    array_path = normalizer.array_path("plate")
+    mtime = os.stat(array_path).st_mtime_ns
+
+    os.utime(array_path, ns=(mtime - 10 ** 9, mtime - 10 ** 9))
+    results = cropper.crop_and_save(image, [RowLine(slope=0.0, intercept=30.0, boxes=list(boxes), id="r")], [],
+                                    plate_name="plate")
+    assert all(crop.skipped for crop in results)
+    assert os.stat(array_path).st_mtime_ns == mtime - 10 ** 9
+
+    # Usunięty box zmienia zawartość tablicy, mimo że pozostały wycinek jest aktualny
+    cropper.crop_and_save(image, [RowLine(slope=0.0, intercept=30.0, boxes=boxes[:1], id="r")], [],
+                          plate_name="plate")
+    cropper.shutdown()
+    assert np.load(array_path).shape[0] == 1
@@ -0,0 +1,41 @@
+import numpy as np
+
+from Otolits_identyfication_program.detection_cache import DetectionCache
+
+
+def test_cache_miss_then_hit(tmp_path):
+    cache = DetectionCache(str(tmp_path / "cache.sqlite"))
+    image = np.zeros((20, 30, 3), dtype=np.uint8)
+    key = cache.make_key(image, "yolo11l.pt", {'imgsz': 640})
+
+    assert cache.get(key) is None
+    boxes = np.array([[1, 2, 3, 4, 0.9]], dtype=np.float32)
+    cache.put(key, boxes)
+
+    cached = cache.get(key)
+    assert np.array_equal(cached, boxes)
+    assert cache.hits == 1
+    assert cache.misses == 1
+    assert cache.hit_rate == 0.5
+
+def test_key_depends_on_image_and_params(tmp_path):
+    cache = DetectionCache(str(tmp_path / "cache.sqlite"))
+    image = np.zeros((20, 30, 3), dtype=np.uint8)
+    key = cache.make_key(image, "yolo11l.pt", {'imgsz': 640})
+
+    assert key != cache.make_key(image + 1, "yolo11l.pt", {'imgsz': 640})
+    assert key != cache.make_key(image, "yolo11l.pt", {'imgsz': 1280})
+    assert key != cache.make_key(image, "yolo11n.pt", {'imgsz': 640})
+
+def test_eviction_removes_least_recently_used(tmp_path):
+    # Jeden wpis z 3 boxami zajmuje 60 bajtów
+    cache = DetectionCache(str(tmp_path / "cache.sqlite"), max_bytes=130)
+    boxes = np.ones((3, 5), dtype=np.float32)
+    for key in ("a", "b"):
+        cache.put(key, boxes)
+    cache.get("a")
+    cache.put("c", boxes)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
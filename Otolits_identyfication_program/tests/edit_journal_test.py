@@ -0,0 +1,91 @@
+from types import SimpleNamespace
+
+from Otolits_identyfication_program.bounding_box import BoundingBox
+from Otolits_identyfication_program.row_detector import RowDetector, RowLine
+from Otolits_identyfication_program.edit_journal import (
+    EditJournal, BoxesAdded, BoxRemoved, BoxChanged, RowEdited, RowsChanged, line_state)
+
+
+def _target(n_boxes=3):
+    boxes = [BoundingBox(i * 30, 0, i * 30 + 20, 20) for i in range(n_boxes)]
+    bbox_manager = SimpleNamespace(boxes=boxes)
+    row_detector = RowDetector(bbox_manager)
+    row_detector.rows = [RowLine(slope=0.0, intercept=10.0, boxes=list(boxes), id="r0")]
+    return SimpleNamespace(bbox_manager=bbox_manager, row_detector=row_detector)
+
+def test_undo_redo_box_edits_and_records():
+    target = _target()
+    seen = []
+    journal = EditJournal(on_change=seen.append)
+
+    box = target.bbox_manager.boxes[1]
+    target.bbox_manager.boxes.remove(box)
+    journal.record(BoxRemoved(box, 1))
+    moved = target.bbox_manager.boxes[0]
+    old = moved.get_coordinates()
+    moved.move(5, 5)
+    journal.record(BoxChanged(moved, old, moved.get_coordinates()))
+
+    assert journal.undo(target) and moved.get_coordinates() == old
+    assert journal.undo(target) and target.bbox_manager.boxes[1] is box
+    assert not journal.undo(target)
+    assert seen[-1] == [{'op': 'add', 'boxes': [[box.id, 30, 0, 50, 20, None]], 'at': 1}]
+
+    assert journal.redo(target) and box not in target.bbox_manager.boxes
+    assert seen[-1] == [{'op': 'del', 'id': box.id}]
+    assert journal.can_redo()
+
+    added = BoundingBox(200, 0, 220, 20)
+    target.bbox_manager.boxes.append(added)
+    journal.record(BoxesAdded([added]))
+    assert not journal.can_redo()
+
+def test_rows_change_restores_line_and_members():
+    target = _target()
+    row = target.row_detector.rows[0]
+    before = RowsChanged.capture(target.row_detector.rows)
+    row.intercept = 50.0
+    row.boxes.pop()
+    target.row_detector.rows.add_row(RowLine(slope=0.0, intercept=80.0, boxes=[], id="r1"))
+    delta = RowsChanged(before, RowsChanged.capture(target.row_detector.rows))
+    assert delta.changed() and delta.records(True) is None
+
+    delta.undo(target)
+    assert len(target.row_detector.rows) == 1 and target.row_detector.rows[0] is row
+    assert row.intercept == 10.0 and len(row.boxes) == 3
+    delta.redo(target)
+    assert len(target.row_detector.rows) == 2 and len(row.boxes) == 2
+
+def test_row_edit_records_only_the_edited_line():
+    target = _target()
+    row = target.row_detector.rows[0]
+    old = line_state(row)
+    row.p1, row.p2, row.intercept, row.locked = (0.0, 30.0), (100.0, 30.0), 30.0, True
+    delta = RowEdited(row, old, line_state(row))
+    assert delta.records(True) == [{'op': 'row', 'id': "r0", 'line': [0.0, 30.0, (0.0, 30.0), (100.0, 30.0), True],
+                                    'color': [0, 0, 255]}]
+    delta.undo(target)
+    assert row.intercept == 10.0 and not row.locked and len(row.boxes) == 3
+
+    added = RowLine(slope=0.0, intercept=80.0, boxes=[], id="r1", p1=(0.0, 80.0), p2=(50.0, 80.0))
+    target.row_detector.rows.add_row(added)
+    delta = RowEdited(added, None, line_state(added))
+    delta.undo(target)
+    assert added not in target.row_detector.rows and delta.records(False) == [{'op': 'row_del', 'id': "r1"}]
+    delta.redo(target)
+    assert target.row_detector.rows[1] is added
+
+def test_history_is_bounded():
+    target = _target(1)
+    box = target.bbox_manager.boxes[0]
+    journal = EditJournal(max_entries=10)
+    for _ in range(100):
+        old = box.get_coordinates()
+        box.move(1, 0)
+        journal.record(BoxChanged(box, old, box.get_coordinates()))
+
+    undone = 0
+    while journal.undo(target):
+        undone += 1
+    assert undone == 10
+    assert box.x1 == 90
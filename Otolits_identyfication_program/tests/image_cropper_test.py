@@ -0,0 +1,98 @@
+import os
+import cv2
+import numpy as np
+import pytest
+
+from Otolits_identyfication_program.bounding_box import BoundingBox
+from Otolits_identyfication_program.image_cropper import ImageCropper
+from Otolits_identyfication_program.row_detector import RowLine
+
+
+@pytest.fixture
+def plate():
+    image = np.random.randint(0, 255, (200, 300, 3), dtype=np.uint8)
+    rows = [
+        RowLine(slope=0.0, intercept=130.0, boxes=[BoundingBox(10, 100, 60, 160)], id="dolny"),
+        RowLine(slope=0.0, intercept=35.0,
+                boxes=[BoundingBox(100, 10, 150, 60), BoundingBox(10, 10, 60, 60)], id="gorny"),
+    ]
+    return image, rows
+
+def test_crops_are_ordered_by_row_and_x(tmp_path, plate):
+    image, rows = plate
+    cropper = ImageCropper(str(tmp_path))
+    results = cropper.crop_and_save(image, rows, [])
+
+    assert [r.filename for r in results] == ["row_00_box_00.png", "row_00_box_01.png", "row_01_box_00.png"]
+    assert results[0].original_coords == (10, 10, 60, 60)
+    assert sorted(os.listdir(tmp_path)) == ["manifest.json"] + [r.filename for r in results]
+    cropper.shutdown()
+
+def test_async_crop_reports_progress(tmp_path, plate):
+    image, rows = plate
+    cropper = ImageCropper(str(tmp_path), image_format="jpeg", jpeg_quality=80)
+    progress = []
+    results = cropper.crop_and_save_async(image, rows, [],
+                                          progress_callback=lambda done, total: progress.append((done, total))).result()
+
+    assert len(results) == 3
+    assert all(r.filename.endswith(".jpg") for r in results)
+    assert progress[-1] == (3, 3)
+    cropper.shutdown()
+
+def test_iter_crops_is_lazy_and_writes_only_on_request(tmp_path, plate):
+    image, rows = plate
+    cropper = ImageCropper(str(tmp_path))
+
+    stream = cropper.iter_crops(image, rows)
+    first = next(stream)
+    assert (first.row_index, first.box_index) == (0, 0)
+    assert np.shares_memory(first.image, image)
+    assert len(list(stream)) == 2
+    assert os.listdir(tmp_path) == []
+
+    written = list(cropper.iter_crops(image, rows, plate_name="plate", write=True))
+    assert sorted(os.listdir(tmp_path / "plate")) == sorted(c.filename for c in written)
+    cropper.shutdown()
+
+def test_recrop_skips_unchanged_and_removes_orphans(tmp_path, plate):
+    image, rows = plate
+    cropper = ImageCropper(str(tmp_path))
+    cropper.crop_and_save(image, rows, [], plate_name="plate")
+
+    results = cropper.crop_and_save(image, rows, [], plate_name="plate")
+    assert all(r.skipped for r in results)
+
+    # Przesunięcie jednego boxa i usunięcie wiersza z jednym boxem
+    rows[1].boxes[0].move(5, 0)
+    results = cropper.crop_and_save(image, rows[1:], [], plate_name="plate")
+    assert [r.skipped for r in results] == [True, False]
+    assert sorted(os.listdir(tmp_path / "plate")) == ["manifest.json", "row_00_box_00.png", "row_00_box_01.png"]
+
+    # Zmiana obrazu źródłowego wymusza ponowne kodowanie wszystkiego
+    results = cropper.crop_and_save(255 - image, rows[1:], [], plate_name="plate")
+    assert not any(r.skipped for r in results)
+    cropper.shutdown()
+
+def test_deskew_produces_tighter_crops(tmp_path):
+    slope = 0.2
+    image = np.zeros((400, 600, 3), dtype=np.uint8)
+    boxes = []
+    for cx in (100, 250, 400):
+        corners = cv2.boxPoints(((cx, 100 + slope * cx), (80, 40), np.degrees(np.arctan(slope)))).astype(np.int32)
+        cv2.fillPoly(image, [corners], (255, 255, 255))
+        x, y, w, h = cv2.boundingRect(corners)
+        boxes.append(BoundingBox(x, y, x + w, y + h))
+    rows = [RowLine(slope=slope, intercept=100.0, boxes=boxes, id="pochylony")]
+
+    cropper = ImageCropper(str(tmp_path), deskew=True)
+    results = cropper.crop_and_save(image, rows, [])
+    assert len(results) == 3
+    for result in results:
+        assert result.image.shape[:2] == (40, 82)
+        assert (result.image[..., 0] > 127).mean() > 0.95
+    cropper.shutdown()
+
+def test_unknown_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ImageCropper(str(tmp_path), image_format="bmp")
@@ -84,6 +84,27 @@ class TestImageLoader(unittest.TestCase):
         print(f"\n✅ Przeskalowanie obrazu: {original_w}x{original_h} -> {resized_w}x{resized_h}")
         print(f"📏 Oczekiwana skala: {expected_scale:.3f}, Zapisana skala: {actual_scale:.3f}")
 
+    def test_goto_and_previous_reuse_cached_images(self):
+        """ Sprawdza, czy powrót i skok korzystają z LRU i prefetch zamiast ponownego dekodowania """
+        plates_dir = os.path.join(self.TEST_DIR, "plates")
+        os.makedirs(plates_dir, exist_ok=True)
+        for i in range(5):
+            cv2.imwrite(os.path.join(plates_dir, f"plate_{i}.png"), cv2.UMat(60, 80, cv2.CV_8UC3, (i * 40,) * 3).get())
+
+        loader = ImageLoader(plates_dir, screen_size=(800, 600), cache_size=3)
+        first = loader.load_image()
+        loader.prefetch(1)
+        loader._prefetched[1].result()
+        self.assertIsNotNone(loader.next_image())
+        self.assertEqual(loader.current_index, 1)
+        self.assertIs(loader.previous_image(), first, "Poprzednie zdjęcie powinno pochodzić z LRU")
+
+        self.assertEqual(int(loader.goto(4)[0, 0, 0]), 160)
+        self.assertIsNone(loader.goto(5))
+        self.assertEqual(loader.current_index, 4)
+        self.assertLessEqual(len(loader._cache), 3)
+        loader.shutdown()
+
 
 if __name__ == "__main__":
     unittest.main()
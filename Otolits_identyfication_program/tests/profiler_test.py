@@ -0,0 +1,18 @@
+import os
+
+from Otolits_identyfication_program.profiler import SessionProfiler
+
+
+def test_toggle_writes_tagged_report(tmp_path):
+    profiler = SessionProfiler(str(tmp_path), context=lambda: ("TUR_BITS_2016_Q1_1", 42))
+    assert profiler.stop() is None
+
+    assert profiler.toggle()
+    sorted(range(10000), key=lambda v: -v)
+    assert not profiler.toggle()
+
+    names = sorted(os.listdir(tmp_path))
+    assert len(names) == 2
+    assert all("_TUR_BITS_2016_Q1_1_42b." in name for name in names)
+    with open(tmp_path / names[1], encoding="utf-8") as f:
+        assert "boxów: 42" in f.read()
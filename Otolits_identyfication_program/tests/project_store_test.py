@@ -0,0 +1,62 @@
+import pytest
+
+from Otolits_identyfication_program.bounding_box import BoundingBox
+from Otolits_identyfication_program.image_cropper import CropResult
+from Otolits_identyfication_program.project_store import ProjectStore, parse_plate_name
+from Otolits_identyfication_program.row_detector import RowLine
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ProjectStore(str(tmp_path / "project.sqlite"))
+    yield store
+    store.close()
+
+def _annotate(store, plate, counts):
+    boxes, rows = [], []
+    for row_index, count in enumerate(counts):
+        row_boxes = [BoundingBox(10 + 30 * i, 10 + 50 * row_index, 35 + 30 * i, 40 + 50 * row_index)
+                     for i in range(count)]
+        boxes.extend(row_boxes)
+        rows.append(RowLine(slope=0.0, intercept=25.0 + 50 * row_index, boxes=row_boxes, id=f"{plate}-{row_index}"))
+    store.save_annotations(plate, boxes, rows, scale=0.5)
+
+    crops = [CropResult(None, box_index, row_index, (0, 0, 1, 1), f"row_{row_index:02d}_box_{box_index:02d}.png")
+             for row_index, count in enumerate(counts) for box_index in range(count)]
+    store.record_crops(plate, crops)
+
+def test_plate_name_parsing():
+    assert parse_plate_name("TUR_BITS_2016_Q1_1") == (2016, 1)
+    assert parse_plate_name("plate") == (None, None)
+
+def test_query_crops_by_year_quarter_and_row_size(store):
+    _annotate(store, "TUR_BITS_2016_Q1_1", [12, 3])
+    _annotate(store, "TUR_BITS_2016_Q3_1", [15])
+    _annotate(store, "TUR_BITS_2017_Q1_1", [11])
+
+    crops = store.query_crops(year=2016, quarter=1, min_row_boxes=10)
+    assert len(crops) == 12
+    assert {c["plate"] for c in crops} == {"TUR_BITS_2016_Q1_1"}
+    assert all(c["row_index"] == 0 and c["row_box_count"] == 12 for c in crops)
+    assert len(store.query_crops(year=2016)) == 30
+
+def test_resave_replaces_and_region_query_uses_original_coords(store):
+    _annotate(store, "TUR_BITS_2016_Q1_1", [5, 5])
+    _annotate(store, "TUR_BITS_2016_Q1_1", [2])
+
+    plate = store.plates()[0]
+    assert (plate["boxes"], plate["rows"], plate["crops"]) == (2, 1, 2)
+    # Podgląd w skali 0.5 - w bazie współrzędne oryginału (x2)
+    found = store.boxes_in_region("TUR_BITS_2016_Q1_1", 0, 0, 30, 30)
+    assert [(b["x1"], b["y1"], b["x2"], b["y2"]) for b in found] == [(20.0, 20.0, 70.0, 80.0)]
+
+def test_dataset_splits_and_plate_names(store):
+    _annotate(store, "TUR_BITS_2016_Q1_1", [2])
+    store.record_splits("turbot_dataset", {"TUR_BITS_2016_Q1_1": "train", "TUR_BITS_2016_Q2_7": "val"},
+                        {"TUR_BITS_2016_Q2_7": "/data/TUR_BITS_2016_Q2_7.jpg"})
+    assert store.dataset_splits("turbot_dataset") == {"TUR_BITS_2016_Q1_1": "train", "TUR_BITS_2016_Q2_7": "val"}
+    assert store.plate_names(year=2016, quarter=2) == ["TUR_BITS_2016_Q2_7"]
+
+    store.record_splits("turbot_dataset", {"TUR_BITS_2016_Q1_1": "test"})
+    assert store.dataset_splits("turbot_dataset") == {"TUR_BITS_2016_Q1_1": "test"}
+    assert len(store.query_crops(plate="TUR_BITS_2016_Q1_1")) == 2
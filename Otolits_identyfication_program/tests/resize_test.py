@@ -0,0 +1,51 @@
+import os
+import numpy as np
+from PIL import Image
+
+from Picks_modification_scripts import Resize
+
+
+def _photo(tmp_path, width=1200, height=800):
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    pixels = (128 + 60 * np.sin(x / 40) + 40 * np.cos(y / 30))[..., None] + rng.normal(0, 8, (height, width, 3))
+    path = str(tmp_path / "plate.png")
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(path)
+    return path
+
+def _best_quality(path, max_size):
+    # Przegląd liniowy co QUALITY_STEP - wynik, który wyszukiwanie ma odtworzyć
+    with Image.open(path) as img:
+        for quality in range(Resize.MAX_QUALITY, Resize.MIN_QUALITY - 1, -Resize.QUALITY_STEP):
+            if len(Resize._encode(img, 1.0, quality)) <= max_size:
+                return quality
+
+def test_quality_search_matches_linear_scan_with_few_encodes(tmp_path):
+    path = _photo(tmp_path)
+    output = str(tmp_path / "out.jpg")
+    full = os.path.getsize(path)
+    for max_size in (full // 8, full // 12, full // 20):
+        quality, scale, encodes = Resize.resize_image(path, output, max_size)
+        assert scale == 1.0 and quality == _best_quality(path, max_size)
+        assert os.path.getsize(output) <= max_size
+        assert encodes <= 6  # Przegląd liniowy to do 14 kodowań
+
+def test_scale_is_predicted_without_blind_bisection(tmp_path):
+    path = _photo(tmp_path)
+    output = str(tmp_path / "out.jpg")
+    quality, scale, encodes = Resize.resize_image(path, output, 20_000)
+    assert quality == Resize.SCALE_SEARCH_QUALITY and Resize.MIN_SCALE < scale < 1.0
+    assert os.path.getsize(output) <= 20_000
+    assert encodes <= 8
+
+def test_output_over_limit_is_final_and_skipped(tmp_path):
+    path = _photo(tmp_path)
+    output = str(tmp_path / "out.jpg")
+    Resize.resize_image(path, output, 100)
+    assert os.path.getsize(output) > 100
+    assert Resize.is_up_to_date(path, output, 100)
+    assert not Resize.is_up_to_date(path, output, 200)  # Inny limit - plik trzeba zakodować ponownie
+
+    Resize.resize_image(path, output, 20_000)
+    assert not os.path.exists(output + Resize.OVERSIZE_SUFFIX)
+    assert Resize.is_up_to_date(path, output, 20_000)
@@ -0,0 +1,57 @@
+import random
+
+from Otolits_identyfication_program.bounding_box import BoundingBox
+from Otolits_identyfication_program.row_detector import RowLine
+from Otolits_identyfication_program.row_manager import RowManager, row_sort_key
+
+
+def _row(y, xs, row_id):
+    return RowLine(slope=0.0, intercept=float(y), id=row_id,
+                   boxes=[BoundingBox(x, y - 10, x + 20, y + 10) for x in xs])
+
+def test_rows_and_boxes_stay_ordered():
+    manager = RowManager()
+    rows = [_row(y, random.Random(y).sample(range(0, 500, 25), 5), f"r{y}") for y in range(20, 420, 20)]
+    random.Random(0).shuffle(rows)
+    for row in rows:
+        manager.add_row(row)
+
+    assert [row_sort_key(r) for r in manager] == sorted(row_sort_key(r) for r in rows)
+    assert all([b.x1 for b in r.boxes] == sorted(b.x1 for b in r.boxes) for r in manager)
+
+    manager.add_box(manager[0], BoundingBox(12, 10, 30, 30))
+    assert [b.x1 for b in manager[0].boxes] == sorted(b.x1 for b in manager[0].boxes)
+
+    middle = manager[5]
+    assert manager.remove_row(middle) and middle not in manager
+    assert not manager.remove_row(middle)
+    assert len(manager) == len(rows) - 1
+
+def test_update_row_repositions_edited_row():
+    top, bottom = _row(20, [0, 50], "top"), _row(200, [0, 50], "bottom")
+    manager = RowManager([bottom, top])
+    assert manager.rows == [top, bottom]
+
+    top.intercept = 300.0
+    manager.update_row(top)
+    assert manager.index(top) == 1
+
+    top.boxes[0].move(100, 0)
+    manager.update_box(top.boxes[0])
+    assert [b.x1 for b in top.boxes] == [50, 100]
+
+def test_find_box_follows_row_membership():
+    top, bottom = _row(20, [0, 50], "top"), _row(200, [0, 50], "bottom")
+    manager = RowManager([bottom, top])
+    box = bottom.boxes[1]
+    assert manager.find_box(box) == (bottom, 1)
+
+    added = BoundingBox(100, 190, 120, 210)
+    manager.add_box(top, added)
+    assert manager.find_box(added) == (top, 2)
+
+    bottom.boxes.remove(box)
+    manager.update_row(bottom)
+    assert manager.find_box(box) is None
+    assert manager.remove_row(top) and manager.find_box(added) is None
+    assert manager.find_box(BoundingBox(0, 0, 5, 5)) is None
@@ -0,0 +1,122 @@
+import os
+import time
+import numpy as np
+
+from Otolits_identyfication_program.bounding_box import BoundingBox
+from Otolits_identyfication_program.row_detector import RowLine
+from Otolits_identyfication_program.session_store import SessionStore
+from Otolits_identyfication_program.row_detector import RowDetector
+from Otolits_identyfication_program.edit_journal import EditJournal, BoxRemoved, RowEdited, line_state
+from types import SimpleNamespace
+
+
+def _plate(n_boxes=2000, per_row=50):
+    rng = np.random.default_rng(0)
+    boxes = []
+    for i in range(n_boxes):
+        x, y = (i % per_row) * 30 + rng.uniform(0, 3), (i // per_row) * 40 + rng.uniform(0, 3)
+        boxes.append(BoundingBox(x, y, x + 25, y + 30))
+    rows = [RowLine(slope=0.01, intercept=r * 40.0 + 15, boxes=boxes[r * per_row:(r + 1) * per_row], id=f"r{r}",
+                    p1=(0.0, r * 40.0 + 15), p2=(1500.0, r * 40.0 + 30), locked=r % 2 == 0)
+            for r in range(n_boxes // per_row)]
+    return boxes, rows
+
+def _float32_coords(boxes):
+    # Współrzędne zapisywane są jako float32
+    return [tuple(float(np.float32(v)) for v in b.get_coordinates()) for b in boxes]
+
+def test_roundtrip_preserves_boxes_rows_and_locks(tmp_path):
+    boxes, rows = _plate()
+    store = SessionStore(str(tmp_path))
+    store.save_async("plate", boxes, rows, scale=0.5).result()
+    assert os.listdir(tmp_path) == ["plate.npz"]
+
+    start = time.perf_counter()
+    session = store.load("plate", scale=0.5)
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.5
+    assert [b.get_coordinates() for b in session.boxes] == _float32_coords(boxes)
+    assert [r.id for r in session.rows] == [r.id for r in rows]
+    assert [r.locked for r in session.rows] == [r.locked for r in rows]
+    restored_row = session.rows[3]
+    assert len(restored_row.boxes) == 50
+    assert restored_row.boxes[0] is session.boxes[150]
+    assert restored_row.p2 == rows[3].p2
+    store.shutdown()
+
+def test_load_rescales_to_current_preview(tmp_path):
+    store = SessionStore(str(tmp_path))
+    box = BoundingBox(10, 20, 30, 40)
+    row = RowLine(slope=0.0, intercept=30.0, boxes=[box], id="r", p1=(0.0, 30.0), p2=(50.0, 30.0))
+    store.save_async("plate", [box], [row], scale=0.5).result()
+
+    session = store.load("plate", scale=1.0)
+    assert session.boxes[0].get_coordinates() == (20, 40, 60, 80)
+    assert session.rows[0].intercept == 60.0
+    assert session.rows[0].p2 == (100.0, 60.0)
+    store.shutdown()
+
+def test_poll_is_debounced(tmp_path):
+    store = SessionStore(str(tmp_path), debounce=0.05)
+    boxes, rows = _plate(10, 5)
+    assert store.load("plate") is None
+
+    store.mark_dirty("plate")
+    assert not store.poll("plate", boxes, rows, 1.0)
+    time.sleep(0.06)
+    assert store.poll("plate", boxes, rows, 1.0)
+    assert not store.is_dirty("plate")
+    store.flush("plate", boxes, rows, 1.0)
+    assert len(store.load("plate").boxes) == 10
+    store.shutdown()
+
+def test_journal_replay_restores_deleted_box_into_its_row(tmp_path):
+    store = SessionStore(str(tmp_path), debounce=0)
+    boxes, rows = _plate(6, 3)
+    bbox_manager = SimpleNamespace(boxes=boxes)
+    target = SimpleNamespace(bbox_manager=bbox_manager, row_detector=RowDetector(bbox_manager))
+    target.row_detector.rows = rows
+    store.save_async("plate", boxes, rows, scale=1.0).result()
+    journal = EditJournal(on_change=lambda records: store.record("plate", records, 1.0))
+
+    deleted = boxes[4]
+    deleted.label = "otolit"
+    delta = BoxRemoved.capture(target, deleted)
+    delta.redo(target)
+    journal.record(delta)
+    assert len(rows[1].boxes) == 2 and len(boxes) == 5
+
+    journal.undo(target)
+    store.flush("plate", boxes, rows, 1.0)
+    session = store.load("plate", scale=1.0)
+
+    live = target.row_detector.rows[1]
+    restored = next(r for r in session.rows if r.id == live.id)
+    assert [b.id for b in restored.boxes] == [b.id for b in live.boxes] and len(live.boxes) == 3
+    assert [b.id for b in session.boxes] == [b.id for b in boxes]
+    assert next(b for b in session.boxes if b.id == deleted.id).label == "otolit"
+    store.shutdown()
+
+def test_row_edit_is_journaled_without_full_snapshot(tmp_path):
+    store = SessionStore(str(tmp_path), debounce=0)
+    boxes, rows = _plate(6, 3)
+    store.save_async("plate", boxes, rows, scale=1.0).result()
+    snapshot_mtime = os.stat(store.path_for("plate")).st_mtime_ns
+
+    row = rows[0]
+    old = line_state(row)
+    row.p2, row.intercept, row.locked = (1500.0, 60.0), 20.0, True
+    store.record("plate", RowEdited(row, old, line_state(row)).records(True), 1.0)
+    added = RowLine(slope=0.0, intercept=200.0, boxes=[], id="new", p1=(0.0, 200.0), p2=(90.0, 200.0))
+    store.record("plate", RowEdited(added, None, line_state(added)).records(True), 1.0)
+    store.flush("plate", boxes, rows, 1.0)
+    assert os.stat(store.path_for("plate")).st_mtime_ns == snapshot_mtime
+
+    session = store.load("plate", scale=2.0)
+    restored = next(r for r in session.rows if r.id == row.id)
+    assert restored.intercept == 40.0 and restored.p2 == (3000.0, 120.0) and restored.locked
+    assert len(restored.boxes) == 3
+    new_row = next(r for r in session.rows if r.id == "new")
+    assert new_row.boxes == [] and new_row.p1 == (0.0, 400.0)
+    store.shutdown()
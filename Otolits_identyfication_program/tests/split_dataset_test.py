@@ -0,0 +1,57 @@
+import argparse
+import os
+
+from Otolits_identyfication_program.YOLO.datasets import split_dataset
+
+
+def _files(n):
+    return [f"TUR_BITS_2016_Q1_{i}.jpg" for i in range(n)]
+
+def _args(folder, dest, **overrides):
+    args = dict(train=80, validation=10, test=10, folder=str(folder), dest=str(dest), salt="", mode="copy",
+                workers=4, db=None, year=None, quarter=None)
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
+def test_split_depends_only_on_filename_and_salt():
+    files = _files(1000)
+    base = {file: split_dataset.assign_split(file, 80, 10) for file in files}
+    assert {split for split in base.values()} == {0, 1, 2}
+
+    # Dodanie i usunięcie innych plików nie przenosi istniejących między podzbiorami
+    grown = split_dataset.get_split_data(files[500:] + _files(1500)[1000:], 80, 10)
+    for split, split_files in enumerate(grown):
+        assert all(base[file] == split for file in split_files if file in base)
+
+    salted = {file: split_dataset.assign_split(file, 80, 10, salt="v2") for file in files}
+    assert salted != base
+
+def test_rerun_writes_nothing(tmp_path, capsys):
+    folder = tmp_path / "images"
+    folder.mkdir()
+    for file in _files(30):
+        (folder / file).write_bytes(file.encode())
+        (folder / (os.path.splitext(file)[0] + ".txt")).write_text("0 0.5 0.5 0.1 0.1\n")
+
+    split_dataset.main(_args(folder, tmp_path / "dataset"))
+    assert "Files written: 60, unchanged: 0" in capsys.readouterr().out
+    split_dataset.main(_args(folder, tmp_path / "dataset"))
+    assert "Files written: 0, unchanged: 60, stale removed: 0" in capsys.readouterr().out
+
+def test_hardlink_fallback_copy_is_kept(tmp_path, monkeypatch):
+    source, destination = tmp_path / "a.jpg", tmp_path / "b.jpg"
+    source.write_bytes(b"plate")
+    assert split_dataset.materialize(str(source), str(destination), "copy")
+    assert not split_dataset.materialize(str(source), str(destination), "copy")
+
+    def refuse(*args):
+        raise PermissionError("no hardlinks here")
+    monkeypatch.setattr(split_dataset.os, "link", refuse)
+    # Link niemożliwy - aktualna kopia zostaje i nie jest kopiowana ponownie
+    assert not split_dataset.materialize(str(source), str(destination), "hardlink")
+    assert not destination.samefile(source)
+
+    monkeypatch.undo()
+    assert split_dataset.materialize(str(source), str(destination), "hardlink")
+    assert destination.samefile(source)
+    assert not split_dataset.materialize(str(source), str(destination), "hardlink")
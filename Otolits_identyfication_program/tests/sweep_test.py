@@ -0,0 +1,10 @@
+from Otolits_identyfication_program.YOLO.sweep import parse_grid, trial_cpus
+
+
+def test_parse_grid_casts_numbers_and_literals():
+    grid = parse_grid(["imgsz=480,640", "lr0=0.01", "amp=False,true", "cache=None,disk"])
+    assert grid == {"imgsz": [480, 640], "lr0": [0.01], "amp": [False, True], "cache": [None, "disk"]}
+
+def test_trial_cpus_counts_dataloader_workers():
+    assert trial_cpus({}, 4, 2) == 6
+    assert trial_cpus({"workers": 0}, 4, 2) == 4
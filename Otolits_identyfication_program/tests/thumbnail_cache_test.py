@@ -0,0 +1,67 @@
+import os
+import time
+import cv2
+import numpy as np
+
+from Otolits_identyfication_program.thumbnail_cache import ThumbnailCache
+
+
+def _wait_for(cache, path, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        thumbnail = cache.get(path)
+        if thumbnail is not None:
+            return thumbnail
+        time.sleep(0.01)
+    raise AssertionError("Miniatura nie powstała")
+
+def test_thumbnails_are_reduced_and_cached_by_mtime(tmp_path):
+    image_path = str(tmp_path / "TUR_BITS_2016_Q1_1.jpg")
+    cv2.imwrite(image_path, np.random.randint(0, 255, (1200, 1600, 3), dtype=np.uint8))
+    cache = ThumbnailCache(str(tmp_path / "thumbs"), size=160)
+
+    assert cache.get(image_path) is None
+    cache.request([image_path])
+    thumbnail = _wait_for(cache, image_path)
+    assert max(thumbnail.shape[:2]) == 160
+    cached_files = os.listdir(tmp_path / "thumbs")
+    assert cached_files == [os.path.basename(cache.path_for(image_path))]
+
+    # Zmiana pliku (mtime) daje nowy klucz i nową miniaturę
+    cv2.imwrite(image_path, np.zeros((600, 800, 3), dtype=np.uint8))
+    os.utime(image_path, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+    fresh = ThumbnailCache(str(tmp_path / "thumbs"), size=160)
+    fresh.request([image_path])
+    assert _wait_for(fresh, image_path).max() < 10
+    assert len(os.listdir(tmp_path / "thumbs")) == 2
+    cache.shutdown()
+    fresh.shutdown()
+
+def test_reexported_image_replaces_its_thumbnail(tmp_path):
+    image_path = str(tmp_path / "TUR_BITS_2016_Q1_1.jpg")
+    cv2.imwrite(image_path, np.full((400, 400, 3), 255, dtype=np.uint8))
+    cache = ThumbnailCache(str(tmp_path / "thumbs"), size=64)
+    cache.request([image_path])
+    assert _wait_for(cache, image_path).min() > 245
+    old_thumbnail = cache.path_for(image_path)
+
+    # Ta sama ścieżka, nowa zawartość - w tej samej sesji nie wolno zwrócić starej miniatury
+    cv2.imwrite(image_path, np.zeros((400, 400, 3), dtype=np.uint8))
+    os.utime(image_path, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+    assert cache.get(image_path) is None
+    cache.request([image_path])
+    assert _wait_for(cache, image_path).max() < 10
+    assert os.listdir(tmp_path / "thumbs") == [os.path.basename(cache.path_for(image_path))]
+    assert not os.path.exists(old_thumbnail)
+    cache.shutdown()
+
+def test_prune_keeps_most_recently_used(tmp_path):
+    thumbs = tmp_path / "thumbs"
+    thumbs.mkdir()
+    for i in range(4):
+        (thumbs / f"{i}.jpg").write_bytes(b"")
+        os.utime(thumbs / f"{i}.jpg", ns=(i * 10 ** 9, i * 10 ** 9))
+
+    cache = ThumbnailCache(str(thumbs), max_files=2)
+    assert sorted(os.listdir(thumbs)) == ["2.jpg", "3.jpg"]
+    cache.shutdown()
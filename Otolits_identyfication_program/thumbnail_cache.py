@@ -0,0 +1,164 @@
+import os
+import hashlib
+import cv2
+import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Iterable, Optional
+
+# IMREAD_REDUCED_* dekoduje JPEG od razu w 1/2, 1/4 lub 1/8 rozdzielczości (DCT scaling)
+REDUCED_FLAGS = [(8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2)]
+
+
+def thumbnail_key(path: str, size: int) -> str:
+    """Klucz miniatury: ścieżka, mtime i rozmiar pliku - zmiana zdjęcia unieważnia miniaturę"""
+    stat = os.stat(path)
+    raw = f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}|{size}"
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def decode_reduced(path: str, max_side: int) -> Optional[np.ndarray]:
+    """Dekoduje obraz w najmniejszej rozdzielczości nie mniejszej niż max_side i skaluje do max_side"""
+    image = None
+    for factor, flag in REDUCED_FLAGS:
+        image = cv2.imread(path, flag)
+        if image is None or max(image.shape[:2]) >= max_side:
+            break
+        image = None  # Za mała redukcja dla tego zdjęcia - spróbuj mniejszego czynnika
+    if image is None:
+        image = cv2.imread(path)
+        if image is None:
+            return None
+    h, w = image.shape[:2]
+    scale = max_side / max(h, w)
+    if scale < 1:
+        image = cv2.resize(image, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+    return image
+
+
+class ThumbnailCache:
+    """Miniatury tabliczek generowane w tle i zapisywane na dysku (<cache_dir>/<klucz>.jpg).
+
+    request() zleca przygotowanie miniatur (odczyt z dysku albo zredukowane dekodowanie),
+    a get() zwraca miniaturę tylko, jeśli jest gotowa - pętla OpenCV nigdy na nią nie czeka.
+    W pamięci trzymane jest max_memory ostatnio używanych miniatur, a na dysku max_files
+    (nadmiarowe, najdawniej używane pliki usuwane są przy starcie).
+    """
+
+    def __init__(self, cache_dir: str = "thumbnails", size: int = 160, workers: int = 2, max_memory: int = 512,
+                 max_files: int = 5000):
+        self.cache_dir = cache_dir
+        self.size = size
+        self.max_memory = max_memory
+        os.makedirs(cache_dir, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="miniatury")
+        # Pamięć i zadania indeksowane kluczem miniatury - ponownie wyeksportowane zdjęcie dostaje nowy klucz
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._futures: Dict[str, Future] = {}
+        self._keys: Dict[str, str] = {}  # ścieżka zdjęcia -> ostatni klucz
+        self.prune(max_files)
+
+    def _key(self, image_path: str) -> Optional[str]:
+        try:
+            return thumbnail_key(image_path, self.size)
+        except OSError:
+            return None
+
+    def _cached_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".jpg")
+
+    def path_for(self, image_path: str) -> str:
+        return self._cached_path(thumbnail_key(image_path, self.size))
+
+    def request(self, image_paths: Iterable[str]) -> None:
+        """Zleca przygotowanie miniatur, których nie ma jeszcze w pamięci"""
+        for image_path in image_paths:
+            key = self._key(image_path)
+            if key is None or key in self._memory or key in self._futures:
+                continue
+            self._forget_superseded(image_path, key)
+            self._futures[key] = self._executor.submit(self._load_or_build, image_path, key)
+
+    def get(self, image_path: str) -> Optional[np.ndarray]:
+        """Zwraca gotową miniaturę albo None (wtedy należy ją zlecić przez request())"""
+        key = self._key(image_path)
+        if key is None:
+            return None
+        thumbnail = self._memory.get(key)
+        if thumbnail is not None:
+            self._memory.move_to_end(key)
+            return thumbnail
+
+        future = self._futures.get(key)
+        if future is None or not future.done():
+            return None
+        del self._futures[key]
+        try:
+            thumbnail = future.result()
+        except Exception as e:
+            print(f"Błąd miniatury {image_path}: {e}")
+            return None
+        if thumbnail is not None:
+            self._memory[key] = thumbnail
+            while len(self._memory) > self.max_memory:
+                self._memory.popitem(last=False)
+        return thumbnail
+
+    def cancel_except(self, image_paths: Iterable[str]) -> None:
+        """Anuluje oczekujące zadania dla miniatur, które zniknęły z widoku"""
+        keep = {self._key(image_path) for image_path in image_paths}
+        for key in list(self._futures):
+            if key not in keep and self._futures[key].cancel():
+                del self._futures[key]
+
+    def _forget_superseded(self, image_path: str, key: str) -> None:
+        """Usuwa z pamięci i z dysku miniaturę poprzedniej wersji zdjęcia"""
+        old_key = self._keys.get(image_path)
+        self._keys[image_path] = key
+        if old_key is None or old_key == key:
+            return
+        self._memory.pop(old_key, None)
+        future = self._futures.pop(old_key, None)
+        if future is not None:
+            future.cancel()
+        try:
+            os.remove(self._cached_path(old_key))
+        except OSError:
+            pass
+
+    def prune(self, max_files: int) -> int:
+        """Usuwa najdawniej używane miniatury ponad max_files; zwraca liczbę usuniętych plików"""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".jpg") and not entry.name.endswith(".tmp.jpg"):
+                entries.append((entry.stat().st_mtime_ns, entry.path))
+        entries.sort(reverse=True)
+        removed = 0
+        for _, path in entries[max_files:]:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def _load_or_build(self, image_path: str, key: str) -> Optional[np.ndarray]:
+        cached_path = self._cached_path(key)
+        if os.path.exists(cached_path):
+            thumbnail = cv2.imread(cached_path)
+            if thumbnail is not None:
+                os.utime(cached_path)  # mtime = ostatnie użycie, według niego działa prune()
+                return thumbnail
+
+        thumbnail = decode_reduced(image_path, self.size)
+        if thumbnail is None:
+            return None
+        tmp_path = cached_path + ".tmp.jpg"
+        if cv2.imwrite(tmp_path, thumbnail, [cv2.IMWRITE_JPEG_QUALITY, 85]):
+            os.replace(tmp_path, cached_path)
+        return thumbnail
+
+    def shutdown(self) -> None:
+        for future in self._futures.values():
+            future.cancel()
+        self._executor.shutdown(wait=True)
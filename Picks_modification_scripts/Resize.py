@@ -1,4 +1,9 @@
+import io
 import os
+import math
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from PIL import Image
 Image.MAX_IMAGE_PIXELS = None
 
@@ -7,41 +12,230 @@ INPUT_DIR = "C:\\Users\\kswitek\\Documents\\Turbot\\TUR_images"
 OUTPUT_DIR = "TUR_resized"
 MAX_FILE_SIZE = 1 * 1024 * 1024  # 1 MB
 
-# Tworzenie katalogu wyjściowego, jeśli nie istnieje
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+# Zakresy wyszukiwania
+MIN_QUALITY = 30
+MAX_QUALITY = 95
+QUALITY_STEP = 5
+SCALE_SEARCH_QUALITY = 75  # Jakość JPG używana przy wyszukiwaniu skali
+MIN_SCALE = 0.05
+SCALE_TOLERANCE = 0.02  # Dokładność wyszukiwania skali
+SCALE_MARGIN = 0.97  # Zapas przy przewidywaniu skali (rozmiar nie rośnie dokładnie z polem obrazu)
+MAX_SCALE_STEPS = 6
+OVERSIZE_SUFFIX = ".oversize"  # Znacznik: wynik przekracza limit, ale mniejszego nie da się uzyskać
 
+# Typowy rozmiar JPG przy danej jakości względem jakości MAX_QUALITY (zdjęcia tabliczek);
+# służy tylko do wyboru pierwszej próby, właściwą jakość ustalają kolejne kodowania
+TYPICAL_SIZE_RATIO = {30: 0.14, 35: 0.17, 40: 0.18, 45: 0.21, 50: 0.23, 55: 0.25, 60: 0.27,
+                      65: 0.30, 70: 0.33, 75: 0.37, 80: 0.43, 85: 0.51, 90: 0.66, 95: 1.0}
 
-def resize_image(input_path, output_path):
+
+def _encode(img, scale, quality):
+    """Koduje obraz do JPG w pamięci (bez zapisu na dysk)"""
+    if scale < 1.0:
+        img = img.resize((max(1, int(img.width * scale)), max(1, int(img.height * scale))), Image.LANCZOS)
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def _estimate_size(sizes, quality):
+    """Szacuje rozmiar przy pełnej rozdzielczości i danej jakości z najbliższej wykonanej próby"""
+    known = min(sizes, key=lambda q: abs(q - quality))
+    return sizes[known] * TYPICAL_SIZE_RATIO[quality] / TYPICAL_SIZE_RATIO[known]
+
+
+def _guess_quality(quality, size, max_size):
+    """Najwyższa jakość poniżej quality, przy której typowo zmieści się max_size (z próby o rozmiarze size)"""
+    ratio = max_size / size * TYPICAL_SIZE_RATIO[quality]
+    return max((q for q, r in TYPICAL_SIZE_RATIO.items() if r <= ratio and q < quality), default=MIN_QUALITY)
+
+
+def _search_quality(img, max_size):
+    """Najwyższa jakość (co QUALITY_STEP) mieszcząca się w max_size przy pełnej rozdzielczości.
+
+    Dopóki żadna próba się nie mieści, kolejna jakość wybierana jest z TYPICAL_SIZE_RATIO na
+    podstawie zmierzonego rozmiaru; potem przedział między jakością mieszczącą się a za dużą
+    dzielony jest na pół. Zwraca (dane, jakość, liczba kodowań, rozmiary prób {jakość: bajty});
+    dane = None, jeśli nawet MIN_QUALITY jest za duża.
+    """
+    data = _encode(img, 1.0, MAX_QUALITY)
+    sizes = {MAX_QUALITY: len(data)}
+    if len(data) <= max_size:
+        return data, MAX_QUALITY, 1, sizes
+
+    best, low, high = None, None, MAX_QUALITY  # low mieści się, high jest za duża
+    while True:
+        if low is None:
+            if high <= MIN_QUALITY:
+                break  # Nawet MIN_QUALITY jest za duża
+            quality = _guess_quality(high, sizes[high], max_size)
+        elif high - low > QUALITY_STEP:
+            quality = low + (high - low) // (2 * QUALITY_STEP) * QUALITY_STEP
+        else:
+            break
+        data = _encode(img, 1.0, quality)
+        sizes[quality] = len(data)
+        if len(data) <= max_size:
+            best, low = data, quality
+        else:
+            high = quality
+    return best, low, len(sizes), sizes
+
+
+def _search_scale(img, max_size, full_size=None):
+    """Największa skala mieszcząca się w max_size przy SCALE_SEARCH_QUALITY.
+
+    Rozmiar JPG rośnie w przybliżeniu z polem obrazu, więc skala przewidywana jest jako
+    sqrt(max_size / rozmiar) i poprawiana na podstawie zmierzonego rozmiaru. full_size to
+    (szacowany) rozmiar przy pełnej rozdzielczości - bez niego wykonywane jest dodatkowe
+    kodowanie. Zwraca (dane, skala, jakość, liczba kodowań).
+    """
+    encodes = 0
+    if full_size is None:
+        full_size = len(_encode(img, 1.0, SCALE_SEARCH_QUALITY))
+        encodes += 1
+
+    best, best_scale = None, MIN_SCALE
+    scale, size = 1.0, full_size
+    for _ in range(MAX_SCALE_STEPS):
+        predicted = max(MIN_SCALE, min(1.0, scale * math.sqrt(max_size / size) * SCALE_MARGIN))
+        if best is not None and predicted - best_scale < SCALE_TOLERANCE:
+            break  # Większa skala nie da już zauważalnie lepszego wyniku
+        if best is None and predicted == scale == MIN_SCALE:
+            break  # Nawet najmniejsza skala jest za duża
+        scale = predicted
+        data = _encode(img, scale, SCALE_SEARCH_QUALITY)
+        encodes += 1
+        size = len(data)
+        if size <= max_size and (best is None or scale > best_scale):
+            best, best_scale = data, scale
+
+    if best is None:
+        # Nawet najmniejsza skala jest za duża - zapisujemy najmniejszy możliwy wynik
+        best = _encode(img, MIN_SCALE, MIN_QUALITY)
+        encodes += 1
+        return best, MIN_SCALE, MIN_QUALITY, encodes
+    return best, best_scale, SCALE_SEARCH_QUALITY, encodes
+
+
+def resize_image(input_path, output_path, max_size=MAX_FILE_SIZE):
+    """Zapisuje obraz jako JPG nie większy niż max_size; plik wynikowy zapisywany jest raz.
+
+    Najpierw wyszukiwana jest jakość przy pełnej rozdzielczości, a skala dopiero wtedy,
+    gdy sama jakość nie wystarcza. Zwraca (jakość, skala, liczba kodowań).
+    """
     with Image.open(input_path) as img:
-        quality = 95  # Początkowa jakość JPG
-        scale_factor = 1.0  # Początkowy współczynnik skalowania
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+
+        data, quality, encodes, sizes = _search_quality(img, max_size)
+        scale = 1.0
+        if data is None:
+            # Rozmiar przy jakości wyszukiwania skali szacowany z prób jakości - bez kolejnego kodowania
+            full_size = _estimate_size(sizes, SCALE_SEARCH_QUALITY)
+            data, scale, quality, scale_encodes = _search_scale(img, max_size, full_size)
+            encodes += scale_encodes
+
+    # Zapis atomowy - przerwany zapis nie zostawia pliku uznanego później za aktualny
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, output_path)
+
+    marker_path = output_path + OVERSIZE_SUFFIX
+    if len(data) > max_size:
+        # Nawet MIN_SCALE i MIN_QUALITY przekraczają limit - wynik jest ostateczny dla tego limitu,
+        # więc kolejne uruchomienia nie powinny kodować pliku od nowa
+        with open(marker_path, "w", encoding="utf-8") as f:
+            f.write(str(max_size))
+    elif os.path.exists(marker_path):
+        os.remove(marker_path)
+    return quality, scale, encodes
+
+
+def _oversize_accepted(output_path, max_size):
+    """Czy plik ponad limitem został zapisany jako najmniejszy możliwy wynik dla tego samego limitu"""
+    try:
+        with open(output_path + OVERSIZE_SUFFIX, "r", encoding="utf-8") as f:
+            return f.read().strip() == str(max_size)
+    except OSError:
+        return False
+
+
+def is_up_to_date(input_path, output_path, max_size=MAX_FILE_SIZE):
+    """Plik wynikowy jest aktualny, jeśli jest nowszy od źródła i mieści się w limicie rozmiaru
+    (albo jest oznaczony jako najmniejszy możliwy wynik dla tego limitu)"""
+    if not os.path.exists(output_path):
+        return False
+    output_stat = os.stat(output_path)
+    if output_stat.st_mtime < os.stat(input_path).st_mtime or output_stat.st_size == 0:
+        return False
+    return output_stat.st_size <= max_size or _oversize_accepted(output_path, max_size)
+
+
+def _process_one(input_path, output_path, max_size):
+    """Zadanie dla procesu roboczego: zwraca (rozmiar wejścia, czas, jakość, skala, kodowania)"""
+    start = time.perf_counter()
+    quality, scale, encodes = resize_image(input_path, output_path, max_size)
+    return os.path.getsize(input_path), time.perf_counter() - start, quality, scale, encodes
+
 
-        while True:
-            img_resized = img.resize(
-                (int(img.width * scale_factor), int(img.height * scale_factor)),
-                Image.LANCZOS
-            )
+def process_images(input_dir=INPUT_DIR, output_dir=OUTPUT_DIR, max_size=MAX_FILE_SIZE, workers=None):
+    """Przetwarza katalog w puli procesów, pomijając pliki już aktualne"""
+    # Tworzenie katalogu wyjściowego, jeśli nie istnieje
+    os.makedirs(output_dir, exist_ok=True)
 
-            img_resized.save(output_path, "JPEG", quality=quality)
+    jobs = []
+    skipped = 0
+    for filename in sorted(os.listdir(input_dir)):
+        if not filename.lower().endswith((".jpg", ".jpeg", ".png")):
+            continue
+        input_path = os.path.join(input_dir, filename)
+        output_path = os.path.join(output_dir, filename)
+        if is_up_to_date(input_path, output_path, max_size):
+            skipped += 1
+            continue
+        jobs.append((filename, input_path, output_path))
 
-            # Jeśli plik jest mniejszy niż 1MB lub jakość spadła za bardzo, przerywamy
-            if os.path.getsize(output_path) <= MAX_FILE_SIZE or quality < 30:
-                break
+    print(f"Do przetworzenia: {len(jobs)}, aktualnych (pominięto): {skipped}")
+    if not jobs:
+        return
 
-            # Zmniejszamy jakość i współczynnik skalowania
-            quality -= 5
-            scale_factor *= 0.95
+    start = time.perf_counter()
+    total_bytes = 0
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_process_one, input_path, output_path, max_size): filename
+                   for filename, input_path, output_path in jobs}
+        for future in as_completed(futures):
+            filename = futures[future]
+            try:
+                size, elapsed, quality, scale, encodes = future.result()
+            except Exception as e:
+                print(f"Błąd: {filename}: {e}")
+                continue
+            done += 1
+            total_bytes += size
+            if _oversize_accepted(os.path.join(output_dir, filename), max_size):
+                print(f"Uwaga: {filename} przekracza limit nawet przy najmniejszej skali i jakości")
+            print(f"Przetworzono: {filename} (jakość {quality}, skala {scale:.2f}, kodowań: {encodes}, "
+                  f"{elapsed:.2f} s, {size / (1024 * 1024) / max(elapsed, 1e-9):.1f} MB/s)")
 
+    elapsed = time.perf_counter() - start
+    print(f"\nGotowe: {done}/{len(jobs)} plików w {elapsed:.1f} s - "
+          f"{done / max(elapsed, 1e-9):.2f} plików/s, {total_bytes / (1024 * 1024) / max(elapsed, 1e-9):.1f} MB/s")
 
-def process_images():
-    for filename in os.listdir(INPUT_DIR):
-        input_path = os.path.join(INPUT_DIR, filename)
-        output_path = os.path.join(OUTPUT_DIR, filename)
 
-        if filename.lower().endswith((".jpg", ".jpeg", ".png")):
-            resize_image(input_path, output_path)
-            print(f"Przetworzono: {filename}")
+def parse_args():
+    parser = argparse.ArgumentParser(description="Zmniejsza zdjęcia do zadanego rozmiaru pliku")
+    parser.add_argument("--input", type=str, default=INPUT_DIR, help="Katalog ze zdjęciami źródłowymi")
+    parser.add_argument("--output", type=str, default=OUTPUT_DIR, help="Katalog wynikowy")
+    parser.add_argument("--max-size", type=float, default=MAX_FILE_SIZE / (1024 * 1024),
+                        help="Maksymalny rozmiar pliku wynikowego w MB")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Liczba procesów roboczych")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    process_images()
+    args = parse_args()
+    process_images(args.input, args.output, int(args.max_size * 1024 * 1024), args.workers)